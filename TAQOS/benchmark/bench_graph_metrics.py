@@ -0,0 +1,87 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Compare the networkx implementation of the graph metrics with the CSR
+    metric engine on the instances of a group
+
+    python -m TAQOS.benchmark.bench_graph_metrics Advantage_system6.1 -n 3
+=========
+"""
+
+# third party import
+import argparse
+import timeit
+
+# local import
+from TAQOS.instance_metrics.graph_metrics import get_csr_metrics, \
+    get_metrics_nx
+from TAQOS.problem.max_cut.db_manager import iter_maxcut_instances
+
+
+def bench_graph_metrics(group_name, nb_instance, processes=None):
+    """
+    Time both metric implementations on the first instances of a group
+
+    Parameters
+    ----------
+    group_name : string
+        name of the group
+    nb_instance : int
+        number of instances being benchmarked
+    processes : int
+        number of processes used by the CSR engine
+
+    Returns
+    -------
+        list<dict>: timings (in seconds) and largest metric difference for
+        each instance
+    """
+    results = []
+
+    for instance in iter_maxcut_instances(group_name):
+        if len(results) == nb_instance:
+            break
+
+        start_time = timeit.default_timer()
+        csr_metrics = get_csr_metrics(*instance.csr, instance.num_edges,
+                                      processes)
+        csr_time = timeit.default_timer() - start_time
+
+        start_time = timeit.default_timer()
+        nx_metrics = get_metrics_nx(instance.graph)
+        nx_time = timeit.default_timer() - start_time
+
+        results.append({
+            'id': instance.id,
+            'networkx_time': nx_time,
+            'csr_time': csr_time,
+            'max_difference': max(abs(nx_metrics[k] - csr_metrics[k])
+                                  for k in nx_metrics)
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('group_name', nargs='?', default='Advantage_system6.1')
+    parser.add_argument('-n', '--nb-instance', type=int, default=3)
+    parser.add_argument('-p', '--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    results = bench_graph_metrics(args.group_name, args.nb_instance,
+                                  args.processes)
+
+    print(f'{"id":>4} {"networkx (s)":>14} {"csr (s)":>10} {"speedup":>9} {"max diff":>10}')
+    for res in results:
+        print(f'{res["id"]:>4} {res["networkx_time"]:>14.3f} '
+              f'{res["csr_time"]:>10.3f} '
+              f'{res["networkx_time"] / res["csr_time"]:>9.1f} '
+              f'{res["max_difference"]:>10.2e}')
+
+
+if __name__ == '__main__':
+    main()
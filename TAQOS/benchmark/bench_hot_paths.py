@@ -0,0 +1,547 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Time and peak memory of the hot paths of the library (loading, metrics,
+    coverage, Ising conversion, evaluation of the solutions, formatting of
+    the D-Wave results) on the bundled groups and on instances scaled up
+    from them. Each run is appended to a JSON history, and two runs of the
+    history can be compared to flag regressions. The D-Wave results are
+    mocked by sample sets drawn around a local minimum, no solver is
+    called.
+
+    python -m TAQOS.benchmark.bench_hot_paths run --label before -n 3
+    python -m TAQOS.benchmark.bench_hot_paths compare --threshold 0.2
+=========
+"""
+
+# third party import
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import dimod
+import numpy as np
+
+# local import
+from TAQOS.env import DW_AN_TIME, DW_NUM_READS, PROJECT_PATH
+from TAQOS.heuristic.dw_heuristic import format_dwave_results
+from TAQOS.heuristic.post_processing import steepest_descent
+from TAQOS.logger.instrumentation import PhaseTimer, \
+    configure_instrumentation, get_instrumentation_config
+from TAQOS.problem.max_cut.db_manager import iter_maxcut_instances, \
+    load_maxcut_instance_list, write_maxcut_instance_binary
+from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance
+from TAQOS.problem.max_cut.maxcut_instance_list import MaxcutInstanceList
+
+# Groups bundled with the library
+BENCH_GROUPS = ['Advantage_system6.1', 'Advantage2_prototype1.1']
+
+# Factors by which the instances of the groups are scaled up, 1 being the
+# bundled instances themselves
+BENCH_SCALES = [1, 4]
+
+# Copies of a scaled instance are linked through one node out of
+# SCALE_LINK_STRIDE, so that the scaled graph stays connected
+SCALE_LINK_STRIDE = 16
+
+# JSON file storing the runs of the benchmark
+BENCH_HISTORY_FILE = os.path.join(PROJECT_PATH, 'db', 'bench_history.json')
+
+# Relative increase of the time or of the peak memory of a case flagged as
+# a regression
+REGRESSION_THRESHOLD = 0.2
+
+# Coverage factor of the coverage case
+BENCH_EPSILON = 0.05
+
+# Fraction of the spins of the mocked samples flipped from a local minimum
+MOCK_FLIP_RATE = 0.02
+
+# QPU timing attached to the mocked sample sets, in micro seconds
+MOCK_QPU_TIMING = {
+    'qpu_access_time': 0.,
+    'qpu_anneal_time_per_sample': DW_AN_TIME,
+    'qpu_sampling_time': 0.
+}
+
+
+def scale_instance(instance, factor, rng):
+    """
+    Scale an instance up by copying its graph: node i of each copy is
+    linked to node i of the next copy, for one node out of
+    SCALE_LINK_STRIDE, the links being given weights drawn from the weights
+    of the instance
+
+    Parameters
+    ----------
+    instance : MaxCutInstance
+        instance being scaled up
+    factor : int
+        number of copies
+    rng : numpy Generator
+        draws the weights of the links
+
+    Returns
+    -------
+        MaxCutInstance
+    """
+    if factor == 1:
+        return instance
+
+    num_nodes = instance.num_nodes
+    copies = np.arange(factor)[:, np.newaxis]
+
+    node_ids = (instance.node_ids[np.newaxis, :]
+                + copies * (int(instance.node_ids.max()) + 1)).ravel()
+    link_u = (np.arange(0, num_nodes, SCALE_LINK_STRIDE)[np.newaxis, :]
+              + copies[:-1] * num_nodes).ravel()
+
+    edge_u = np.concatenate([(instance.edge_u[np.newaxis, :] + copies * num_nodes).ravel(),
+                             link_u])
+    edge_v = np.concatenate([(instance.edge_v[np.newaxis, :] + copies * num_nodes).ravel(),
+                             link_u + num_nodes])
+    weights = np.concatenate([np.tile(instance.weights, factor),
+                              rng.choice(instance.weights, size=len(link_u))])
+
+    return MaxCutInstance.from_arrays(instance.id, node_ids, edge_u.astype(np.int32),
+                                      edge_v.astype(np.int32), weights)
+
+
+def _copy_instance(instance):
+    """
+    Copy of an instance sharing its arrays, without the structures derived
+    from them (CSR adjacency, Ising model, metrics...)
+    """
+    return MaxCutInstance.from_arrays(instance.id, instance.node_ids, instance.edge_u,
+                                      instance.edge_v, instance.weights)
+
+
+def get_mock_sample_set(instance, num_reads, rng):
+    """
+    Sample set standing in for the result of a D-Wave solver: as the
+    samples of an annealer, the samples are close to a local minimum, a
+    fraction MOCK_FLIP_RATE of its spins being flipped in each sample
+
+    Parameters
+    ----------
+    instance : MaxCutInstance
+        instance being solved
+    num_reads : int
+        number of samples
+    rng : numpy Generator
+        draws the local minimum and the flipped spins
+
+    Returns
+    -------
+        dimod SampleSet of the unique samples, with their energy and number
+        of occurrences
+    """
+    start = rng.choice(np.array([-1, 1], dtype=np.int8), size=(1, instance.num_nodes))
+    local_minimum = steepest_descent(*instance.csr, start)[0]
+
+    flips = rng.random((num_reads, instance.num_nodes)) < MOCK_FLIP_RATE
+    spins = np.where(flips, -local_minimum, local_minimum).astype(np.int8)
+    spins, occurrences = np.unique(spins, axis=0, return_counts=True)
+
+    return dimod.SampleSet.from_samples(
+        (spins, instance.node_ids.tolist()), dimod.SPIN,
+        energy=instance.compute_energies(spins), num_occurrences=occurrences,
+        info={'timing': dict(MOCK_QPU_TIMING)}
+    )
+
+
+def _get_random_solutions(instances, rng):
+    """
+    Random partition of each instance, as given to compute_energy
+    """
+    return [dict(zip([str(i) for i in instance.node_ids.tolist()],
+                     rng.choice([-1, 1], size=instance.num_nodes).tolist()))
+            for instance in instances]
+
+
+def _get_cases(dataset, instances, metric_mode, rng):
+    """
+    Cases benchmarked on a set of instances
+
+    Parameters
+    ----------
+    dataset : dict
+        'group_name' and 'scale' of the instances, 'name' of the group
+        written in the 'path' database directory, holding the instances
+    instances : list<MaxCutInstance>
+        instances of the dataset
+    metric_mode : string
+        'exact' or 'approx' metrics, see MaxCutInstance.get_metrics
+    rng : numpy Generator
+        draws the solutions and samples
+
+    Returns
+    -------
+        dict<string, (callable, callable)>: function preparing the arguments
+        of each case, and function being measured. The coverage case
+        includes the computation of the metrics of the instances.
+    """
+    def load():
+        return load_maxcut_instance_list(dataset['name'], path=dataset['path'])
+
+    def get_metrics(instance_list):
+        return [instance.get_metrics(None, metric_mode) for instance in instance_list]
+
+    def get_coverage(instance_list):
+        return instance_list.get_coverage(BENCH_EPSILON, metric_mode)
+
+    def get_coverage_setup():
+        instance_list = MaxcutInstanceList(dataset['name'])
+        instance_list.extend(_copy_instance(instance) for instance in instances)
+        return (instance_list,)
+
+    def to_ising(instance_list):
+        return [instance.to_ising() for instance in instance_list]
+
+    def compute_energy(solutions):
+        return [instance.compute_energy(solution)
+                for instance, solution in zip(instances, solutions)]
+
+    def get_cut_size(solutions):
+        return [instance.get_cut_size(solution)
+                for instance, solution in zip(instances, solutions)]
+
+    def format_setup():
+        return ([(get_mock_sample_set(instance, DW_NUM_READS, rng),
+                  {int(v): [int(v)] for v in instance.node_ids.tolist()})
+                 for instance in instances],)
+
+    def format_results(jobs, post_processing=False):
+        return [format_dwave_results('LOCAL_SA', instance, sample_set, DW_AN_TIME,
+                                     DW_NUM_READS, 0., embedding, 0.,
+                                     post_processing=post_processing)
+                for instance, (sample_set, embedding) in zip(instances, jobs)]
+
+    def format_results_post_processed(jobs):
+        return format_results(jobs, post_processing=True)
+
+    def fresh_instances():
+        return ([_copy_instance(instance) for instance in instances],)
+
+    def solutions():
+        return (_get_random_solutions(instances, rng),)
+
+    return {
+        'load_maxcut_instance_list': (tuple, load),
+        'get_metrics': (fresh_instances, get_metrics),
+        'get_coverage': (get_coverage_setup, get_coverage),
+        'to_ising': (fresh_instances, to_ising),
+        'compute_energy': (solutions, compute_energy),
+        'get_cut_size': (solutions, get_cut_size),
+        'format_dwave_results': (format_setup, format_results),
+        'format_dwave_results[post_processing]': (format_setup,
+                                                  format_results_post_processed)
+    }
+
+
+def measure(setup, func, nb_run):
+    """
+    Time a function over several runs and measure its peak memory in an
+    additional run, tracemalloc slowing the function down
+
+    Parameters
+    ----------
+    setup : callable
+        function returning the arguments of func, not measured
+    func : callable
+        function being measured
+    nb_run : int
+        number of timed runs
+
+    Returns
+    -------
+        dict: smallest and median time (in seconds), and peak memory (in
+        bytes)
+    """
+    times = []
+    for _ in range(nb_run):
+        args = setup()
+        timer = PhaseTimer()
+        with timer.phase('case'):
+            func(*args)
+        times.append(timer.times['case'])
+
+    instrumentation = get_instrumentation_config()
+    configure_instrumentation(**dict(instrumentation, memory=True))
+    try:
+        args = setup()
+        timer = PhaseTimer()
+        with timer.phase('case'):
+            func(*args)
+    finally:
+        configure_instrumentation(**instrumentation)
+
+    return {
+        'time': min(times),
+        'median_time': statistics.median(times),
+        'peak_memory': timer.peak_memory['case']
+    }
+
+
+def bench_hot_paths(group_names=None, scales=None, nb_instance=3, nb_run=3,
+                    metric_mode='approx', cases=None, seed=0):
+    """
+    Measure the hot paths on the first instances of groups, scaled up by
+    several factors
+
+    Parameters
+    ----------
+    group_names : list<string>
+        names of the groups, BENCH_GROUPS if None
+    scales : list<int>
+        scale factors of the instances, BENCH_SCALES if None
+    nb_instance : int
+        number of instances of each group
+    nb_run : int
+        number of timed runs of each case
+    metric_mode : string
+        'exact' or 'approx' metrics, the exact eccentricities of the scaled
+        instances being slow to compute
+    cases : list<string>
+        names of the cases being run, all of them if None
+    seed : int
+        seed of the scaled instances, solutions and samples
+
+    Returns
+    -------
+        dict<string, dict>: measures of each case, keyed by
+        '<group name>x<scale>/<case>'
+    """
+    group_names = BENCH_GROUPS if group_names is None else group_names
+    scales = BENCH_SCALES if scales is None else scales
+    rng = np.random.default_rng(seed)
+
+    results = {}
+    for group_name in group_names:
+        bundled = list(itertools.islice(iter_maxcut_instances(group_name), nb_instance))
+
+        for scale in scales:
+            instances = [scale_instance(instance, scale, rng) for instance in bundled]
+
+            with tempfile.TemporaryDirectory() as path:
+                # The instances of every scale are loaded from a group of
+                # binary files holding the same number of instances
+                dataset = {'group_name': group_name, 'scale': scale, 'path': path,
+                           'name': f'{group_name}x{scale}'}
+                os.makedirs(os.path.join(path, dataset['name']))
+                for instance in instances:
+                    write_maxcut_instance_binary(
+                        os.path.join(path, dataset['name'], f'{instance.id}_MaxcutInstance.bin'),
+                        *instance.to_arrays()
+                    )
+
+                for case, (setup, func) in _get_cases(dataset, instances, metric_mode,
+                                                      rng).items():
+                    if cases is not None and case not in cases:
+                        continue
+                    measures = measure(setup, func, nb_run)
+                    measures.update(num_nodes=sum(i.num_nodes for i in instances),
+                                    num_edges=sum(i.num_edges for i in instances))
+                    results[f'{group_name}x{scale}/{case}'] = measures
+
+    return results
+
+
+def load_bench_history(history_file=BENCH_HISTORY_FILE):
+    """
+    Load the runs of the benchmark
+
+    Parameters
+    ----------
+    history_file : string
+        JSON file storing the runs
+
+    Returns
+    -------
+        list<dict>: runs, from the oldest to the latest
+    """
+    if not os.path.exists(history_file):
+        return []
+
+    with open(history_file, 'r') as fi:
+        return json.load(fi)
+
+
+def save_bench_run(results, label=None, history_file=BENCH_HISTORY_FILE, **settings):
+    """
+    Append a run of the benchmark to the history
+
+    Parameters
+    ----------
+    results : dict
+        measures of the run, see bench_hot_paths
+    label : string
+        name of the run (a version, a commit...), its date if None
+    history_file : string
+        JSON file storing the runs
+    settings:
+        parameters of the run, stored with it
+
+    Returns
+    -------
+        dict: the run
+    """
+    date = datetime.datetime.now().isoformat(timespec='seconds')
+    run = {
+        'label': date if label is None else label,
+        'date': date,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'settings': settings,
+        'results': results
+    }
+
+    history = load_bench_history(history_file)
+    history.append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(history_file)), exist_ok=True)
+    with open(history_file, 'w') as fo:
+        json.dump(history, fo, indent=1)
+
+    return run
+
+
+def _find_run(history, label):
+    """
+    Run of the history with the given label (the latest one if several runs
+    share it), or at the given position if label is an integer
+    """
+    if isinstance(label, int):
+        return history[label]
+
+    for run in reversed(history):
+        if run['label'] == label:
+            return run
+
+    raise ValueError(f'Unknown benchmark run {label}')
+
+
+def compare_bench_runs(base_run, new_run, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare the measures of two runs, case by case
+
+    Parameters
+    ----------
+    base_run : dict
+        reference run
+    new_run : dict
+        run being checked
+    threshold : float
+        relative increase of the time or of the peak memory flagged as a
+        regression (and relative decrease flagged as an improvement)
+
+    Returns
+    -------
+        list<dict>: for each case measured by both runs, ratio of the new
+        time and peak memory to the reference ones and status ('regression',
+        'improvement' or 'ok')
+    """
+    comparison = []
+    for case, base in base_run['results'].items():
+        if case not in new_run['results']:
+            continue
+        new = new_run['results'][case]
+
+        ratios = {
+            measure: new[measure] / base[measure] if base[measure] > 0 else 1.
+            for measure in ('time', 'peak_memory')
+        }
+        if any(ratio > 1 + threshold for ratio in ratios.values()):
+            status = 'regression'
+        elif any(ratio < 1 / (1 + threshold) for ratio in ratios.values()):
+            status = 'improvement'
+        else:
+            status = 'ok'
+
+        comparison.append({
+            'case': case,
+            'base_time': base['time'],
+            'new_time': new['time'],
+            'time_ratio': ratios['time'],
+            'memory_ratio': ratios['peak_memory'],
+            'status': status
+        })
+
+    return comparison
+
+
+def _run_command(args):
+    results = bench_hot_paths(args.groups, args.scales, args.nb_instance, args.nb_run,
+                              args.metric_mode, args.cases, args.seed)
+    save_bench_run(results, args.label, args.history, groups=args.groups,
+                   scales=args.scales, nb_instance=args.nb_instance, nb_run=args.nb_run,
+                   metric_mode=args.metric_mode, seed=args.seed)
+
+    print(f'{"case":<60} {"time (s)":>10} {"median (s)":>11} {"peak (MB)":>10}')
+    for case, res in results.items():
+        print(f'{case:<60} {res["time"]:>10.4f} {res["median_time"]:>11.4f} '
+              f'{res["peak_memory"] / 2 ** 20:>10.2f}')
+
+
+def _compare_command(args):
+    history = load_bench_history(args.history)
+    if len(history) < 2 and (args.base is None or args.new is None):
+        sys.exit(f'At least two runs are required in {args.history}')
+
+    base_run = _find_run(history, -2 if args.base is None else args.base)
+    new_run = _find_run(history, -1 if args.new is None else args.new)
+    comparison = compare_bench_runs(base_run, new_run, args.threshold)
+
+    print(f'{base_run["label"]} -> {new_run["label"]}')
+    print(f'{"case":<60} {"base (s)":>10} {"new (s)":>10} {"time":>7} {"memory":>7}  status')
+    for res in comparison:
+        print(f'{res["case"]:<60} {res["base_time"]:>10.4f} {res["new_time"]:>10.4f} '
+              f'{res["time_ratio"]:>7.2f} {res["memory_ratio"]:>7.2f}  {res["status"]}')
+
+    regressions = [res['case'] for res in comparison if res['status'] == 'regression']
+    if regressions:
+        sys.exit(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', default=BENCH_HISTORY_FILE)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='measure the hot paths')
+    run_parser.add_argument('--label', default=None)
+    run_parser.add_argument('-g', '--groups', nargs='+', default=BENCH_GROUPS)
+    run_parser.add_argument('-s', '--scales', nargs='+', type=int, default=BENCH_SCALES)
+    run_parser.add_argument('-i', '--nb-instance', type=int, default=3)
+    run_parser.add_argument('-n', '--nb-run', type=int, default=3)
+    run_parser.add_argument('-m', '--metric-mode', choices=['exact', 'approx'],
+                            default='approx')
+    run_parser.add_argument('-c', '--cases', nargs='+', default=None)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.set_defaults(func=_run_command)
+
+    compare_parser = subparsers.add_parser('compare', help='flag the regressions of a run')
+    compare_parser.add_argument('--base', default=None,
+                                help='label of the reference run, the one before '
+                                     'the latest if not given')
+    compare_parser.add_argument('--new', default=None,
+                                help='label of the run being checked, the latest '
+                                     'if not given')
+    compare_parser.add_argument('-t', '--threshold', type=float,
+                                default=REGRESSION_THRESHOLD)
+    compare_parser.set_defaults(func=_compare_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
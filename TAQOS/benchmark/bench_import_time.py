@@ -0,0 +1,140 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Time the import of TAQOS.maxcut in fresh interpreters, and check that
+    instances can be listed while the heuristic backends (MQLib, dimod,
+    the D-Wave packages) cannot be imported at all
+
+    python -m TAQOS.benchmark.bench_import_time -n 5
+=========
+"""
+
+# third party import
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# local import
+
+# Packages only required to run the heuristics
+HEAVY_PACKAGES = ['MQLib', 'dimod', 'dwave', 'dwave_networkx', 'sympy']
+
+# Script run in a fresh interpreter: the heavy packages are blocked if
+# requested, TAQOS.maxcut is imported and the instances are listed
+_IMPORT_SCRIPT = """
+import json, sys, timeit
+
+blocked = {blocked}
+
+class _Blocker:
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] in blocked:
+            raise ImportError(f'{{name}} is blocked by the benchmark')
+        return None
+
+sys.meta_path.insert(0, _Blocker())
+
+start_time = timeit.default_timer()
+import TAQOS.maxcut as maxcut
+import_time = timeit.default_timer() - start_time
+
+start_time = timeit.default_timer()
+nb_groups = len(maxcut.list_instances())
+list_time = timeit.default_timer() - start_time
+
+start_time = timeit.default_timer()
+if {load_backends}:
+    # Modules imported when the heuristics are run, the ones whose
+    # packages are not installed are skipped
+    import importlib
+    for module in ['TAQOS.heuristic.dw_heuristic', 'TAQOS.heuristic.sa_sampler',
+                   'dwave.system', 'TAQOS.heuristic.mqlib_heuristic']:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+backend_time = timeit.default_timer() - start_time
+
+print(json.dumps({{
+    'import_time': import_time,
+    'list_time': list_time,
+    'backend_time': backend_time,
+    'nb_groups': nb_groups,
+    'loaded': sorted({{m.split('.')[0] for m in sys.modules}} & set({heavy}))
+}}))
+"""
+
+
+def _run_import_script(blocked, load_backends):
+    """
+    Run the import script in a fresh interpreter
+
+    Returns
+    -------
+        dict: measures printed by the script
+    """
+    script = _IMPORT_SCRIPT.format(blocked=set(blocked), load_backends=load_backends,
+                                   heavy=HEAVY_PACKAGES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    output = subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_import_time(nb_run):
+    """
+    Time the import of TAQOS.maxcut with the heavy packages blocked, and
+    with the heuristic backends loaded afterwards
+
+    Parameters
+    ----------
+    nb_run : int
+        number of fresh interpreters per measure
+
+    Returns
+    -------
+        dict<string, dict>: median times (in seconds) and packages loaded by
+        each scenario
+    """
+    scenarios = {
+        'blocked': (HEAVY_PACKAGES, False),
+        'with backends': ([], True)
+    }
+
+    results = {}
+    for scenario, (blocked, load_backends) in scenarios.items():
+        runs = [_run_import_script(blocked, load_backends) for _ in range(nb_run)]
+        results[scenario] = {
+            'import_time': statistics.median(run['import_time'] for run in runs),
+            'list_time': statistics.median(run['list_time'] for run in runs),
+            'backend_time': statistics.median(run['backend_time'] for run in runs),
+            'loaded': runs[-1]['loaded']
+        }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--nb-run', type=int, default=5)
+    args = parser.parse_args()
+
+    results = bench_import_time(args.nb_run)
+
+    print(f'{"scenario":>14} {"import (s)":>11} {"list (s)":>9} {"backends (s)":>13}  loaded')
+    for scenario, res in results.items():
+        print(f'{scenario:>14} {res["import_time"]:>11.3f} {res["list_time"]:>9.4f} '
+              f'{res["backend_time"]:>13.3f}  {", ".join(res["loaded"]) or "-"}')
+
+    if results['blocked']['loaded']:
+        sys.exit('TAQOS.maxcut loaded ' + ', '.join(results['blocked']['loaded']))
+
+
+if __name__ == '__main__':
+    main()
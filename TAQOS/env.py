@@ -21,6 +21,9 @@ PROJECT_PATH = os.path.join('xxxx') # Put your path to TAQOS directory
 ###################################################
 RTSEC = 1
 
+# Default number of sweeps of the local simulated annealing sampler
+SA_NUM_SWEEPS = 100
+
 ###################################################
 # Constants used specifically by the D-Wave system
 ###################################################
@@ -35,3 +38,6 @@ DW_NUM_READS = 256
 
 # Default annealing time
 DW_AN_TIME = 100
+
+# Maximal number of problems submitted to D-Wave and waiting for their results
+DW_MAX_CONCURRENCY = 8
@@ -4,31 +4,141 @@
 @authors Valentin Gilbert <valentin.gilbert@cea.fr>
 
 Description:
-    Generate Graphs based on D-Wave annealers' architecture
+    Generate Graphs based on D-Wave annealers' architecture. The hardware
+    graph of a solver (working qubits and couplers) is cached on disk the
+    first time it is read from the cloud, so that graphs can be generated
+    offline afterwards.
 =========
 """
 
 # third party import
-from dwave.system import DWaveSampler
+import json
+import os
 
 # local import
-from TAQOS.env import DWAVE_TOKEN
+from TAQOS.env import DWAVE_TOKEN, PROJECT_PATH
+from TAQOS.logger.logging_device import log_warning
 
+# Path where the hardware graphs of the solvers are cached
+TOPOLOGY_PATH = os.path.join(PROJECT_PATH, 'db', 'topologies')
 
-def get_dw_sampler_graph(solver):
+# Topology family and shape of the known solvers, as given by the
+# 'topology' property of the solvers
+SOLVER_TOPOLOGIES = {
+    'DW_2000Q_6': {'type': 'chimera', 'shape': [16, 16, 4]},
+    'Advantage_system4.1': {'type': 'pegasus', 'shape': [16]},
+    'Advantage_system6.1': {'type': 'pegasus', 'shape': [16]},
+    'Advantage2_prototype1.1': {'type': 'zephyr', 'shape': [4, 4]}
+}
+
+
+def get_ideal_graph(topology, node_list=None, edge_list=None):
     """
-    Return the graph associated to a D-Wave sampler
+    Build the graph of a D-Wave topology with every qubit and coupler, or
+    restricted to the given qubits and couplers
 
     Parameters
     ----------
-    solver str
-        solver name: ['DW_2000Q_6', 'Advantage_system4.1'
-            'Advantage_system6.1', 'Advantage2_prototype1.1']
+    topology : dict
+        'type' ('chimera', 'pegasus' or 'zephyr') and 'shape' of the
+        topology
+    node_list : list<int>
+        working qubits, every qubit is kept if None
+    edge_list : list<(int, int)>
+        working couplers, every coupler is kept if None
 
     Returns
     -------
-        networkx graph associated to the solver
+        networkx graph of the topology
+    """
+    # dwave_networkx is only imported when a graph is built
+    import dwave_networkx as dnx
+
+    topology_type = topology['type']
+    shape = topology['shape']
+
+    if topology_type == 'chimera':
+        return dnx.chimera_graph(*shape, node_list=node_list, edge_list=edge_list)
+    if topology_type == 'pegasus':
+        return dnx.pegasus_graph(shape[0], node_list=node_list, edge_list=edge_list)
+    if topology_type == 'zephyr':
+        return dnx.zephyr_graph(*shape, node_list=node_list, edge_list=edge_list)
+
+    raise ValueError(f'Unknown topology {topology_type}')
+
+
+def _get_topology_file(solver):
+    """
+    Path of the file caching the hardware graph of a solver
+    """
+    return os.path.join(TOPOLOGY_PATH, f'{solver}.json')
+
+
+def save_dw_topology(solver, topology, qubits, couplers):
+    """
+    Cache the hardware graph of a solver on disk
+
+    Parameters
+    ----------
+    solver : str
+        solver name
+    topology : dict
+        'type' and 'shape' of the topology
+    qubits : list<int>
+        working qubits
+    couplers : list<(int, int)>
+        working couplers
+    """
+    os.makedirs(TOPOLOGY_PATH, exist_ok=True)
+
+    content = {
+        'solver': solver,
+        'topology': {'type': topology['type'], 'shape': list(topology['shape'])},
+        'qubits': sorted(int(q) for q in qubits),
+        'couplers': sorted([int(u), int(v)] for u, v in couplers)
+    }
+
+    with open(_get_topology_file(solver), 'w') as fo:
+        json.dump(content, fo, separators=(',', ':'))
+
+
+def load_dw_topology(solver):
+    """
+    Load the cached hardware graph of a solver
+
+    Parameters
+    ----------
+    solver : str
+        solver name
+
+    Returns
+    -------
+        dict with the 'topology', 'qubits' and 'couplers' of the solver,
+        None if the solver is not cached
+    """
+    file_path = _get_topology_file(solver)
+    if not os.path.exists(file_path):
+        return None
+
+    with open(file_path, 'r') as fi:
+        return json.load(fi)
+
+
+def fetch_dw_topology(solver):
     """
+    Read the hardware graph of a solver from the D-Wave cloud and cache it
+
+    Parameters
+    ----------
+    solver : str
+        solver name
+
+    Returns
+    -------
+        dict with the 'topology', 'qubits' and 'couplers' of the solver
+    """
+    # The D-Wave cloud client is only imported when it is used
+    from dwave.system import DWaveSampler
 
     dw_sampler = DWaveSampler(
         endpoint='https://cloud.dwavesys.com/sapi',
@@ -37,4 +147,65 @@ def get_dw_sampler_graph(solver):
         retry_interval=30
     )
 
-    return dw_sampler.to_networkx_graph()
+    save_dw_topology(
+        solver, dw_sampler.properties['topology'],
+        dw_sampler.nodelist, dw_sampler.edgelist
+    )
+
+    return load_dw_topology(solver)
+
+
+def import_dw_topology(solver, instance):
+    """
+    Cache the hardware graph of a solver from an instance generated on it,
+    each node and edge of the instance being a working qubit and coupler
+
+    Parameters
+    ----------
+    solver : str
+        solver name, must be in SOLVER_TOPOLOGIES
+    instance : MaxCutInstance
+        instance covering the hardware graph of the solver
+    """
+    node_ids = instance.node_ids
+    save_dw_topology(
+        solver, SOLVER_TOPOLOGIES[solver], node_ids.tolist(),
+        zip(node_ids[instance.edge_u].tolist(), node_ids[instance.edge_v].tolist())
+    )
+
+
+def get_dw_sampler_graph(solver, offline=False):
+    """
+    Return the graph associated to a D-Wave sampler. The cached hardware
+    graph is used when available, otherwise it is read from the cloud and
+    cached. In offline mode, a solver which is not cached falls back on the
+    ideal graph of its topology.
+
+    Parameters
+    ----------
+    solver str
+        solver name: ['DW_2000Q_6', 'Advantage_system4.1'
+            'Advantage_system6.1', 'Advantage2_prototype1.1']
+    offline : bool
+        if True, the D-Wave cloud is never reached
+
+    Returns
+    -------
+        networkx graph associated to the solver
+    """
+    content = load_dw_topology(solver)
+
+    if content is None and not offline:
+        content = fetch_dw_topology(solver)
+
+    if content is None:
+        if solver not in SOLVER_TOPOLOGIES:
+            raise ValueError(f'Topology of solver {solver} unknown offline')
+
+        log_warning(f'No hardware graph cached for {solver}, using the ideal {SOLVER_TOPOLOGIES[solver]["type"]} graph')
+        return get_ideal_graph(SOLVER_TOPOLOGIES[solver])
+
+    return get_ideal_graph(
+        content['topology'], content['qubits'],
+        [tuple(coupler) for coupler in content['couplers']]
+    )
@@ -10,11 +10,19 @@ Description:
 """
 
 # third party import
+import importlib
+import itertools
+import threading
 import timeit
-from dwave.system import DWaveSampler
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
 
 # local import
-from TAQOS.env import DW_AN_TIME, DW_NUM_READS, DWAVE_TOKEN
+from TAQOS.env import DW_AN_TIME, DW_MAX_CONCURRENCY, DW_NUM_READS, \
+    DWAVE_TOKEN
+from TAQOS.heuristic.post_processing import steepest_descent
+from TAQOS.heuristic.result_export import pack_samples
+from TAQOS.logger.instrumentation import PhaseTimer
 
 # Mapping between heuristic name and solver name
 SOLVER_MAP = {
@@ -24,10 +32,25 @@ SOLVER_MAP = {
     'DW_Adv2_wo_embedding': 'Advantage2_prototype1.1'
 }
 
+# Heuristics run by a local sampler in place of a D-Wave solver: module
+# and class of the sampler, imported on first use
+LOCAL_SAMPLERS = {
+    'LOCAL_SA': ('TAQOS.heuristic.sa_sampler', 'LocalAnnealingSampler')
+}
+
+# Samplers already connected, by solver name
+_DW_SAMPLERS = {}
+
+# Lock of _DW_SAMPLERS, so that a solver gets a single client when
+# samplers are requested from several threads
+_DW_SAMPLERS_LOCK = threading.Lock()
+
 
 def _get_dw_sampler(solver):
     """
-    Get the D-wave sampler
+    Get the D-wave sampler, the connection to a solver is opened once and
+    reused by the following calls
+
     Parameters
     ----------
     solver : str
@@ -40,18 +63,91 @@ def _get_dw_sampler(solver):
     graph being solved
     """
 
-    # Get the sampler from
-    dw_sampler = DWaveSampler(
-        endpoint='https://cloud.dwavesys.com/sapi',
-        token=DWAVE_TOKEN,
-        solver=solver,
-        retry_interval=30
-    )
+    with _DW_SAMPLERS_LOCK:
+        if solver not in _DW_SAMPLERS:
+            # The D-Wave cloud client is only imported when a solver is used
+            from dwave.system import DWaveSampler
+
+            _DW_SAMPLERS[solver] = DWaveSampler(
+                endpoint='https://cloud.dwavesys.com/sapi',
+                token=DWAVE_TOKEN,
+                solver=solver,
+                retry_interval=30
+            )
+
+        return _DW_SAMPLERS[solver]
 
-    return dw_sampler
 
+def _get_heuristic_sampler(heuristic):
+    """
+    Get the sampler running a heuristic
+
+    Parameters
+    ----------
+    heuristic : string
+        name of the heuristic, in SOLVER_MAP or LOCAL_SAMPLERS
 
-def format_dwave_results(heuristic, instance, sample_set, annealing_time, num_reads, service_time, embedding, embedding_time):
+    Returns
+    -------
+        dimod Sampler
+    """
+    if heuristic in LOCAL_SAMPLERS:
+        module_name, class_name = LOCAL_SAMPLERS[heuristic]
+        return getattr(importlib.import_module(module_name), class_name)()
+    if heuristic in SOLVER_MAP:
+        return _get_dw_sampler(SOLVER_MAP[heuristic])
+
+    raise ValueError(f'Unknown heuristic {heuristic}')
+
+
+def get_post_processed_solution(instance, sample_set, occurrences, num_reads):
+    """
+    Run a steepest descent from every sample of a D-Wave result
+
+    Parameters
+    ----------
+    instance : Instance
+        instance being solved
+    sample_set : D-Wave SampleSet
+        dictionary storing D-Wave results
+    occurrences : numpy array
+        number of occurrences of each sample
+    num_reads : int
+        number of annealing runs
+
+    Returns
+    -------
+        dictionary storing the best solution and the energies after
+        post-processing
+        numpy array of float: energy of each sample after post-processing
+    """
+    spins = instance.to_spin_matrix(sample_set.record.sample, list(sample_set.variables))
+    spins, energies, nb_flips = steepest_descent(*instance.csr, spins)
+
+    best_partition = None
+    best_energy = 0
+    best_cut_size = 0
+    best = int(np.argmin(energies))
+    if energies[best] < best_energy:
+        best_energy = float(energies[best])
+        best_partition = dict(zip([str(i) for i in instance.node_ids.tolist()],
+                                  spins[best].tolist()))
+        best_cut_size = float(instance.get_cut_sizes(spins[[best]])[0])
+
+    solution = {
+        'best_partition': best_partition,
+        'best_cut_size': best_cut_size,
+        'best_energy': best_energy,
+        'worst_energy': float(energies.max()),
+        'mean_energy': float(occurrences @ energies) / num_reads,
+        'mean_flips': float(occurrences @ nb_flips) / num_reads
+    }
+
+    return solution, energies
+
+
+def format_dwave_results(heuristic, instance, sample_set, annealing_time, num_reads, service_time, embedding, embedding_time,
+                         post_processing=False, timer=None):
     """
     Format the results obtained from D-Wave quantum computer
 
@@ -74,47 +170,45 @@ def format_dwave_results(heuristic, instance, sample_set, annealing_time, num_re
         mapping of the variables to the qubits
     embedding_time : float
         embedding time, in seconds
+    post_processing : bool
+        if True, a steepest descent is run from every sample (see
+        post_processing.py): solution['post_processed'] stores the best,
+        worst and mean energies reached, time['post_processing_time'] its
+        duration (in micro seconds, not counted in the wall clock time)
+    timer : PhaseTimer
+        timer measuring the evaluation and the post-processing, if given
 
     Returns
     -------
-        dictionary storing the result of the simulation
+        dictionary storing the result of the simulation. extra stores the
+        unique samples: 'variables' (labels of the columns), 'vartype'
+        ('SPIN' or 'BINARY', the values of the samples), 'samples' (uint8
+        matrix of bit-packed rows, see result_export.unpack_samples),
+        'num_occurrences' and 'energies'. result_export.result_to_json
+        converts it to JSON.
     """
-    sample_list = []
+    timer = PhaseTimer() if timer is None else timer
+    variables = list(sample_set.variables)
+    labels = [str(v) for v in variables]
+    record = sample_set.record
+    energies = record.energy.astype(float)
+    occurrences = record.num_occurrences.astype(int)
 
-    wost_energy = max([float(energy) for energy, in sample_set.data(fields=['energy'])])
+    worst_energy = float(energies.max())
+    mean_energy = float(occurrences @ energies) / num_reads
 
+    # Best sample: lowest negative energy, first one in case of ties
     best_partition = None
-    mean_energy = 0
     best_energy = 0
     best_cut_size = 0
-
-    # Convert the solution to bit string and perform the majority vote
-    for sample_dict, occurence, energy in sample_set.data(
-            fields=['sample', 'num_occurrences', 'energy']):
-        occurence = int(occurence)
-        energy = float(energy)
-
-        if energy < best_energy:
-            best_energy = energy
-            best_partition = sample_dict
-
-            for k in list(sample_dict.keys()):
-                sample_dict[str(k)] = sample_dict[k]
-                del sample_dict[k]
-
-            best_cut_size = instance.get_cut_size(sample_dict)
-
-        mean_energy += (occurence*energy)/num_reads
-
-        sample_list.append({
-            'sample': sample_dict,
-            'num_occurrences': occurence,
-            'energy': energy
-        })
-
-    energy_list = []
-    for res_sample in sample_list:
-        energy_list.append(res_sample['energy'])
+    best = int(np.argmin(energies))
+    if energies[best] < best_energy:
+        best_energy = float(energies[best])
+        best_partition = dict(zip(labels, record.sample[best].tolist()))
+        with timer.phase('evaluation'):
+            best_cut_size = float(instance.get_cut_sizes(
+                instance.to_spin_matrix(record.sample[[best]], variables)
+            )[0])
 
     wall_clock_time = service_time * 10 ** 6 + embedding_time * 10 ** 6
 
@@ -136,20 +230,111 @@ def format_dwave_results(heuristic, instance, sample_set, annealing_time, num_re
             'best_partition': best_partition,
             'best_cut_size': best_cut_size,
             'best_energy': best_energy,
-            'worst_energy': wost_energy,
+            'worst_energy': worst_energy,
             'mean_energy': mean_energy
         },
+        # Unique samples, bit-packed rows of the values of the vartype of
+        # the sample set in the order of variables
         'extra': {
-            'sample_list': sample_list,
+            'variables': labels,
+            'vartype': sample_set.vartype.name,
+            'samples': pack_samples(record.sample),
+            'num_occurrences': occurrences.tolist(),
+            'energies': energies.tolist()
         }
     }
 
+    if post_processing:
+        start_time = timeit.default_timer()
+        with timer.phase('post_processing'):
+            solution, post_processed_energies = get_post_processed_solution(
+                instance, sample_set, occurrences, num_reads
+            )
+        res_dict['time']['post_processing_time'] = \
+            (timeit.default_timer() - start_time) * 10 ** 6
+        res_dict['parameter_setting']['post_processing'] = True
+        res_dict['solution']['post_processed'] = solution
+        res_dict['extra']['post_processed_energies'] = post_processed_energies.tolist()
+
     return res_dict
 
 
+def _get_identity_embedding(instance):
+    """
+    Embedding of the problems solved without embedding step: each variable
+    is mapped to the qubit of the same label
+    """
+    node_ids = instance.node_ids.tolist()
+    return dict(zip(node_ids, node_ids))
+
+
+def expand_dw_param_grid(param_grid):
+    """
+    Expand a grid of parameters of the D-Wave heuristics, missing
+    parameters taking their default value
+
+    Parameters
+    ----------
+    param_grid : dict<string, list> or list<dict>
+        values of each parameter, every combination is run, or list of
+        parameter settings
+
+    Returns
+    -------
+        list<dict>: parameter settings with annealing_time and num_reads,
+        the other parameters (post_processing, parameters of the sampler)
+        being kept
+    """
+    if param_grid is None:
+        param_grid = {}
+
+    if isinstance(param_grid, dict):
+        keys = list(param_grid.keys())
+        param_grid = [dict(zip(keys, values))
+                      for values in itertools.product(*param_grid.values())]
+
+    return [dict({'annealing_time': DW_AN_TIME, 'num_reads': DW_NUM_READS}, **params)
+            for params in param_grid]
+
+
+def get_sampler_parameters(heuristic, dw_sampler, params):
+    """
+    Keyword arguments of the sampler for a parameter setting
+
+    Parameters
+    ----------
+    heuristic : string
+        name of the heuristic
+    dw_sampler : dimod Sampler
+        sampler of the heuristic
+    params : dict
+        parameter setting, see expand_dw_param_grid
+
+    Returns
+    -------
+        dict: annealing_time, num_reads and the other parameters given to
+        the sampler
+        dict: parameters other than annealing_time and num_reads, stored
+        in the parameter setting of the result
+    """
+    sampler_params = {k: v for k, v in params.items() if k != 'post_processing'}
+    extra_params = {k: v for k, v in sampler_params.items()
+                    if k not in ('annealing_time', 'num_reads')}
+
+    unknown = [k for k in extra_params if k not in dw_sampler.parameters]
+    if unknown:
+        raise ValueError(f'Unknown parameters {", ".join(unknown)} of {heuristic}')
+
+    return sampler_params, extra_params
+
+
 def run_dw_heuristic(heuristic, instance,
                      annealing_time=DW_AN_TIME,
-                     num_reads=DW_NUM_READS):
+                     num_reads=DW_NUM_READS,
+                     sampler=None,
+                     post_processing=False,
+                     timer=None,
+                     **sampler_params):
     """
     Run D-Wave quantum heuristic.
 
@@ -163,35 +348,198 @@ def run_dw_heuristic(heuristic, instance,
         annealing time in micro seconds
     num_reads : int
         number of annealing runs
+    sampler : dimod Sampler
+        sampler used instead of the D-Wave solver of the heuristic, for
+        instance a dwave.system.testing.MockDWaveSampler
+    post_processing : bool
+        if True, the samples are improved by a steepest descent, see
+        format_dwave_results
+    timer : PhaseTimer
+        timer of the run, holding the phases measured before the call (for
+        instance the loading of the instance) if given
+    sampler_params:
+        other parameters of the sampler (for instance num_sweeps and seed
+        of LOCAL_SA), stored in the parameter setting of the result. A
+        ValueError is raised for parameters the sampler does not accept.
 
     Returns
     -------
-        dictionary storing the result of the simulation
+        dictionary storing the result of the simulation. The time entry
+        holds the measures of the phases of the run, see PhaseTimer
     """
-    if heuristic not in SOLVER_MAP:
-        raise ValueError(f'Unknown heuristic {heuristic}')
+    timer = PhaseTimer() if timer is None else timer
+    dw_sampler = _get_heuristic_sampler(heuristic) if sampler is None else sampler
+    sampler_params, extra_params = get_sampler_parameters(
+        heuristic, dw_sampler,
+        dict(sampler_params, annealing_time=annealing_time, num_reads=num_reads)
+    )
 
-    solver_name = SOLVER_MAP[heuristic]
+    with timer.phase('conversion'):
+        bqm = instance.to_bqm()
 
-    dw_sampler = _get_dw_sampler(solver_name)
+    with timer.phase('solver', memory=False):
+        start_time = timeit.default_timer()
+        sample_set = dw_sampler.sample(bqm, **sampler_params)
+        sample_set.resolve()
+        finish_time = timeit.default_timer()
+    service_time = finish_time - start_time
+
+    # Ignore embedding processing
+    with timer.phase('formatting'):
+        res_dict = format_dwave_results(
+            heuristic, instance, sample_set, annealing_time,
+            num_reads, service_time, _get_identity_embedding(instance),
+            embedding_time=0, post_processing=post_processing, timer=timer
+        )
+    res_dict['parameter_setting'].update(extra_params)
 
-    h_dict, J_ij_dict = instance.to_ising()
+    return timer.attach(res_dict)
 
-    start_time = timeit.default_timer()
-    sample_set = dw_sampler.sample_ising(
-        h_dict, J_ij_dict,  num_reads=num_reads,
-        annealing_time=annealing_time
-    )
+
+def run_dw_heuristic_batch(heuristic, instances, param_grid=None,
+                           max_concurrency=DW_MAX_CONCURRENCY, sampler=None,
+                           post_processing=False):
+    """
+    Run D-Wave quantum heuristic on every instance for every parameter
+    setting. Up to max_concurrency problems are submitted at once to the
+    same sampler, and the results are formatted as soon as they are
+    received.
+
+    Parameters
+    ----------
+    heuristic : string
+        name of the heuristic
+    instances : list<Instance>
+        instances being solved
+    param_grid : dict<string, list> or list<dict>
+        annealing_time, num_reads and other parameters of the sampler,
+        every combination is run (default values of env.py if missing)
+    max_concurrency : int
+        maximal number of problems waiting for their results
+    sampler : dimod Sampler
+        sampler used instead of the D-Wave solver of the heuristic
+    post_processing : bool
+        if True, the samples are improved by a steepest descent, see
+        format_dwave_results
+
+    Returns
+    -------
+        generator of (instance, result dictionary), in order of completion
+    """
+    param_list = expand_dw_param_grid(param_grid)
+    jobs = ((instance, params) for instance in instances for params in param_list)
+
+    return ((job[0], res_dict)
+            for job, res_dict in run_dw_heuristic_jobs(heuristic, jobs, max_concurrency,
+                                                       sampler, post_processing))
+
+
+def run_dw_heuristic_jobs(heuristic, jobs, max_concurrency=DW_MAX_CONCURRENCY,
+                          sampler=None, post_processing=False):
+    """
+    Run D-Wave quantum heuristic on a sequence of (instance, parameters)
+    jobs, see run_dw_heuristic_batch. Jobs are only taken from the
+    sequence when they can be submitted.
+
+    Parameters
+    ----------
+    heuristic : string
+        name of the heuristic
+    jobs : iterable of (Instance, dict) or (Instance, dict, PhaseTimer)
+        instance and parameters (annealing_time, num_reads, optionally
+        post_processing and other parameters of the sampler, see
+        run_dw_heuristic) of each job, and the timer holding the phases measured before the job (for
+        instance the loading of the instance) if given. The solver phase
+        of a job only measures its submission and the reception of its
+        result, the service time being in dwave_service_time.
+    max_concurrency : int
+        maximal number of problems waiting for their results
+    sampler : dimod Sampler
+        sampler used instead of the D-Wave solver of the heuristic
+    post_processing : bool
+        if True, the samples are improved by a steepest descent, see
+        format_dwave_results, unless set otherwise by the parameters of a
+        job
+
+    Returns
+    -------
+        generator of (job, result dictionary), in order of completion
+    """
+    dw_sampler = _get_heuristic_sampler(heuristic) if sampler is None else sampler
+
+    return _run_dw_jobs(heuristic, iter(jobs), max_concurrency, dw_sampler,
+                        post_processing)
+
+
+def _wait_sample_set(sample_set):
+    """
+    Wait for the result of a problem in a waiter thread of _run_dw_jobs
+
+    Returns
+    -------
+        float: time at which the result was received
+    """
     sample_set.resolve()
-    finish_time = timeit.default_timer()
-    service_time = finish_time - start_time
+    return timeit.default_timer()
 
-    # Ignore embedding processing
-    embedding = dict(zip(
-        list(instance.graph.nodes()), list(instance.graph.nodes())
-    ))
 
-    return format_dwave_results(
-        heuristic, instance, sample_set, annealing_time,
-        num_reads, service_time, embedding, embedding_time=0
-    )
+def _run_dw_jobs(heuristic, jobs, max_concurrency, dw_sampler, post_processing):
+    """
+    Submit the jobs and yield their results as they are received. Each
+    pending problem is waited for by a thread recording the time its
+    result is received, so that the service time does not depend on when
+    the results are formatted or consumed.
+    """
+    max_concurrency = max(max_concurrency, 1)
+    waiters = ThreadPoolExecutor(max_workers=max_concurrency)
+    pending = {}
+
+    try:
+        while True:
+            # Submit new problems while below the concurrency cap
+            while len(pending) < max_concurrency:
+                job = next(jobs, None)
+                if job is None:
+                    break
+
+                instance, params = job[:2]
+                timer = job[2] if len(job) > 2 else PhaseTimer()
+                job_post_processing = params.get('post_processing', post_processing)
+                params, extra_params = get_sampler_parameters(
+                    heuristic, dw_sampler, expand_dw_param_grid([params])[0]
+                )
+
+                with timer.phase('conversion'):
+                    bqm = instance.to_bqm()
+                with timer.phase('solver', memory=False):
+                    start_time = timeit.default_timer()
+                    sample_set = dw_sampler.sample(bqm, **params)
+                pending[waiters.submit(_wait_sample_set, sample_set)] = (
+                    job, params, extra_params, sample_set, start_time, timer,
+                    job_post_processing
+                )
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, params, extra_params, sample_set, start_time, timer, \
+                    job_post_processing = pending.pop(future)
+                instance = job[0]
+
+                with timer.phase('solver', memory=False):
+                    service_time = future.result() - start_time
+
+                with timer.phase('formatting'):
+                    res_dict = format_dwave_results(
+                        heuristic, instance, sample_set, params['annealing_time'],
+                        params['num_reads'], service_time,
+                        _get_identity_embedding(instance), embedding_time=0,
+                        post_processing=job_post_processing, timer=timer
+                    )
+                res_dict['parameter_setting'].update(extra_params)
+
+                yield job, timer.attach(res_dict)
+    finally:
+        waiters.shutdown(wait=False)
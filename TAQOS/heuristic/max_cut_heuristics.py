@@ -4,16 +4,24 @@
 @authors Valentin Gilbert <valentin.gilbert@cea.fr>
 
 Description:
-    Heuristics used to solve Maxcut problems
+    Heuristics used to solve Maxcut problems. Each heuristic is registered
+    with the backend module running it, its default parameters, how it can
+    be parallelized and an optional batch entry point, see
+    register_heuristic. Backend modules are only imported when one of
+    their heuristics is first run (MQLib and the D-Wave cloud client are
+    slow to import).
 =========
 
 """
 
 # third party import
+import importlib
+import inspect
+import itertools
 
 # local import
-from TAQOS.heuristic.dw_heuristic import run_dw_heuristic
-from TAQOS.heuristic.mqlib_heuristic import run_mql_heuristic
+from TAQOS.env import DW_AN_TIME, DW_NUM_READS, RTSEC
+from TAQOS.logger.instrumentation import PhaseTimer
 
 # List of heuristic using MQLib
 MQLIB_HEURISTICS = [
@@ -32,6 +40,277 @@ DW_HEURISTICS = [
     'DW_Adv2_wo_embedding'
 ]
 
+# List of heuristics sampling like D-Wave systems with a local sampler
+LOCAL_HEURISTICS = [
+    'LOCAL_SA'
+]
+
+# Description of the built-in heuristics
+HEURISTIC_DESCRIPTIONS = {
+    # Heuristics available in the MQLib:
+    'BASELINE': 'Baseline heuristic',
+    'DUARTE2005': 'Genetic algorithm with VNS as local search',
+    'FESTA2002GPR': 'GRASP with path-relinking',
+    'FESTA2002GVNS': 'GRASP with VNS local search',
+    'FESTA2002GVNSPR': 'GRASP & VNS with path-relinking',
+
+    # D-Wave heuristics (without embedding step):
+    'DW_2000Q_wo_embedding': 'D-Wave 2000Q (Chimera topology) without embedding',
+    'DW_Adv4.1_wo_embedding': 'D-Wave Advantage 4.1 (Pegasus topology) without embedding',
+    'DW_Adv6.1_wo_embedding': 'D-Wave Advantage 6.1 (Pegasus topology) without embedding',
+    'DW_Adv2_wo_embedding': 'D-Wave Advantage2 (Zephyr topology) without embedding',
+
+    # Local heuristics standing in for D-Wave:
+    'LOCAL_SA': 'Simulated annealing run locally, sampled like a D-Wave system'
+}
+
+# Module running the heuristics of each built-in family
+HEURISTIC_BACKENDS = {
+    'mqlib': 'TAQOS.heuristic.mqlib_heuristic',
+    'dwave': 'TAQOS.heuristic.dw_heuristic',
+    'local': 'TAQOS.heuristic.dw_heuristic'
+}
+
+# Registered heuristics by name, see register_heuristic. The built-in
+# heuristics are registered at the end of the module.
+_HEURISTIC_REGISTRY = {}
+
+
+def register_heuristic(name, family, run, description='', backend=None, defaults=None,
+                       options=(), run_batch=None, thread_safe=False, process_safe=False,
+                       anytime_parameter=None):
+    """
+    Register a heuristic, replacing any heuristic of the same name
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic
+    family : string
+        family of the heuristic ('mqlib', 'dwave', 'local' or any new one)
+    run : callable or string
+        function run(name, instance, timer=None, **parameters) returning a
+        result dictionary (timer being a PhaseTimer), or name of this
+        function in the backend module
+    description : string
+        brief description, see get_maxcut_heuristic
+    backend : string
+        module of the functions given by name, HEURISTIC_BACKENDS of the
+        family if None. It is imported on first use.
+    defaults : dict
+        default value of each parameter, completing the parameter
+        settings of the grids
+    options : tuple<string>
+        other parameters accepted by run
+    run_batch : callable or string
+        optional function run_batch(name, jobs, **kwargs) running many
+        jobs in one call: jobs is an iterable of (instance, parameters,
+        PhaseTimer) and the function yields (job, result dictionary) in
+        any order. Campaigns and run_maxcut_heuristic_batch only give it the
+        options it accepts, see get_batch_options.
+    thread_safe : bool
+        True if run_batch can run while other heuristics run in the same
+        process (I/O bound backends, such as remote solvers)
+    process_safe : bool
+        True if run can be called in worker processes
+    anytime_parameter : string
+        parameter which run accepts as a list of values, all of them being
+        covered by a single run (rtsec for the MQLib heuristics)
+    """
+    _HEURISTIC_REGISTRY[name] = {
+        'name': name,
+        'family': family,
+        'description': description,
+        'backend': HEURISTIC_BACKENDS.get(family) if backend is None else backend,
+        'run': run,
+        'run_batch': run_batch,
+        'defaults': dict(defaults or {}),
+        'options': tuple(options),
+        'thread_safe': thread_safe,
+        'process_safe': process_safe,
+        'anytime_parameter': anytime_parameter
+    }
+
+
+def get_heuristic_entry(name):
+    """
+    Registration of a heuristic, see register_heuristic
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic
+
+    Returns
+    -------
+        dict with the arguments of register_heuristic
+    """
+    if name not in _HEURISTIC_REGISTRY:
+        raise ValueError(f'Unknown heuristic {name}')
+    return _HEURISTIC_REGISTRY[name]
+
+
+def list_registered_heuristics(family=None):
+    """
+    Names of the registered heuristics
+
+    Parameters
+    ----------
+    family : string
+        family of the heuristics, every family if None
+
+    Returns
+    -------
+        list<string>
+    """
+    return [name for name, entry in _HEURISTIC_REGISTRY.items()
+            if family is None or entry['family'] == family]
+
+
+def get_heuristic_family(name):
+    """
+    Family of a heuristic
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic
+
+    Returns
+    -------
+        string: for the built-in heuristics, 'mqlib', 'dwave' or 'local'
+    """
+    return get_heuristic_entry(name)['family']
+
+
+def get_heuristic_backend(name):
+    """
+    Module running a heuristic, imported on first use
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic
+
+    Returns
+    -------
+        module of the heuristic, None if its functions are given as
+        callables
+    """
+    backend = get_heuristic_entry(name)['backend']
+    return None if backend is None else importlib.import_module(backend)
+
+
+def get_heuristic_function(entry, key):
+    """
+    Function of a registered heuristic, imported from its backend if given
+    by name
+
+    Parameters
+    ----------
+    entry : dict
+        registration of the heuristic, see get_heuristic_entry
+    key : string
+        'run' or 'run_batch'
+
+    Returns
+    -------
+        callable, None if the heuristic has no such function
+    """
+    function = entry[key]
+    if function is None or callable(function):
+        return function
+    return getattr(importlib.import_module(entry['backend']), function)
+
+
+def get_batch_options(run_batch, **kwargs):
+    """
+    Options of a batch entry point among the given ones, so that the
+    options of the built-in backends (max_concurrency, sampler) are not
+    given to a run_batch(name, jobs) function
+
+    Parameters
+    ----------
+    run_batch : callable
+        batch entry point, see register_heuristic
+    kwargs:
+        options given to the batch entry points
+
+    Returns
+    -------
+        dict: options accepted by run_batch
+    """
+    parameters = inspect.signature(run_batch).parameters
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+        return kwargs
+    return {k: v for k, v in kwargs.items() if k in parameters}
+
+
+def get_execution_strategy(name):
+    """
+    Fastest way of running many jobs of a heuristic
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic
+
+    Returns
+    -------
+        string:
+            'batch': jobs are given to run_batch, while other heuristics
+            run in the same process
+            'pool': jobs are run in worker processes
+            'sequential': jobs are run one after the other in the calling
+            process (by run_batch if available)
+    """
+    entry = get_heuristic_entry(name)
+    if entry['run_batch'] is not None and entry['thread_safe']:
+        return 'batch'
+    if entry['process_safe']:
+        return 'pool'
+    return 'sequential'
+
+
+def expand_param_grid(param_grid):
+    """
+    List every combination of the values of the parameters of a grid
+
+    Parameters
+    ----------
+    param_grid : dict<string, list>
+        values of each parameter
+
+    Returns
+    -------
+        list<dict>: parameter settings
+    """
+    param_grid = {} if param_grid is None else param_grid
+    return [dict(zip(param_grid.keys(), values))
+            for values in itertools.product(*param_grid.values())]
+
+
+def expand_heuristic_grid(name, param_grid):
+    """
+    List the parameter settings of a grid of a heuristic, completed with
+    its default parameters
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic
+    param_grid : dict<string, list> or list<dict>
+        values of each parameter, every combination is run, or list of
+        parameter settings
+
+    Returns
+    -------
+        list<dict>: parameter settings
+    """
+    defaults = get_heuristic_entry(name)['defaults']
+    param_list = param_grid if isinstance(param_grid, list) else expand_param_grid(param_grid)
+    return [dict(defaults, **params) for params in param_list]
+
 
 def get_maxcut_heuristic():
     """
@@ -42,20 +321,7 @@ def get_maxcut_heuristic():
         dict<string, string>: name and description of the heurisitic
     """
     heuristics = {
-        'Maxcut': {
-            # Heuristics available in the MQLib:
-            'BASELINE': 'Baseline heuristic',
-            'DUARTE2005': 'Genetic algorithm with VNS as local search',
-            'FESTA2002GPR': 'GRASP with path-relinking',
-            'FESTA2002GVNS': 'GRASP with VNS local search',
-            'FESTA2002GVNSPR': 'GRASP & VNS with path-relinking',
-
-            # D-Wave heuristics (without embedding step):
-            'DW_2000Q_wo_embedding': 'D-Wave 2000Q (Chimera topology) without embedding',
-            'DW_Adv4.1_wo_embedding': 'D-Wave Advantage 4.1 (Pegasus topology) without embedding',
-            'DW_Adv6.1_wo_embedding': 'D-Wave Advantage 6.1 (Pegasus topology) without embedding',
-            'DW_Adv2_wo_embedding': 'D-Wave Advantage2 (Zephyr topology) without embedding'
-        }
+        'Maxcut': {name: entry['description'] for name, entry in _HEURISTIC_REGISTRY.items()}
     }
 
     return heuristics
@@ -85,6 +351,9 @@ def run_maxcut_heuristic(name, instance, *args, **kwargs):
             'DW_Adv6.1_wo_embedding': D-Wave Advantage 6.1 without embedding step
             'DW_Adv2_wo_embedding': D-Wave Advantage 2 without embedding step
 
+        Local heuristics, run like the quantum heuristics:
+            'LOCAL_SA': simulated annealing, see heuristic/sa_sampler.py
+
     instance: MaxCutInstance
         instance being solved
 
@@ -94,10 +363,12 @@ def run_maxcut_heuristic(name, instance, *args, **kwargs):
                 maximal running time in seconds
             see env.py for default values being used
 
-        For DW heuristics:
+        For DW and local heuristics:
             annealing_time: int
                 annealing time in micro seconds
             num_reads: number of shots
+            post_processing: if True, the samples are improved by a
+                steepest descent, reported in solution['post_processed']
             see env.py for default values being used
 
     Returns
@@ -108,10 +379,172 @@ def run_maxcut_heuristic(name, instance, *args, **kwargs):
             'solution': details about the solution
             'extra': extra information specific to the heuristic run
     """
+    run = get_heuristic_function(get_heuristic_entry(name), 'run')
+    return run(name, instance, *args, **kwargs)
 
-    if name in MQLIB_HEURISTICS:
-        return run_mql_heuristic(name, instance, *args, **kwargs)
-    elif name in DW_HEURISTICS:
-        return run_dw_heuristic(name, instance, *args, **kwargs)
-    else:
-        raise ValueError(f'Unknown heuristic {name}')
+
+def run_maxcut_heuristic_batch(name, instances, param_grid=None, **kwargs):
+    """
+    Run a heuristic on a list of instances for every parameter setting of a
+    grid. Heuristics with a batch entry point (D-Wave problems are
+    submitted concurrently, see run_dw_heuristic_batch) are given every
+    job at once, the other ones are run one job after the other, the
+    values of their anytime parameter (rtsec for the MQLib heuristics)
+    being covered by a single run per instance.
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic, see run_maxcut_heuristic
+    instances : list<MaxCutInstance>
+        instances being solved
+    param_grid : dict<string, list>
+        values of each parameter of the heuristic, every combination is
+        run, missing parameters taking their default value
+    kwargs:
+        options of the batch entry point, for DW heuristics:
+        max_concurrency and sampler, see run_dw_heuristic_batch. Options
+        the entry point does not accept are ignored, see
+        get_batch_options.
+
+    Returns
+    -------
+        generator of (instance, result dictionary)
+    """
+    entry = get_heuristic_entry(name)
+    run_batch = get_heuristic_function(entry, 'run_batch')
+
+    if run_batch is not None:
+        jobs = ((instance, params, PhaseTimer()) for instance in instances
+                for params in expand_heuristic_grid(name, param_grid))
+        options = get_batch_options(run_batch, **kwargs)
+        return ((job[0], res_dict) for job, res_dict in run_batch(name, jobs, **options))
+
+    return _run_heuristic_sequence(entry, instances, param_grid)
+
+
+def run_maxcut_heuristic_seeds(name, instance, nb_seeds, **kwargs):
+    """
+    Run independent seeds of a classical heuristic on a process pool
+
+    Parameters
+    ----------
+    name : string
+        name of a MQLib heuristic, see run_maxcut_heuristic
+    instance : MaxCutInstance
+        instance being solved
+    nb_seeds : int
+        number of runs
+    kwargs:
+        rtsec, seed and processes, see run_mql_heuristic_seeds
+
+    Returns
+    -------
+        dictionary storing the aggregated result, the result of each run
+        being in extra['seed_results'] (list of dictionaries, one per time
+        limit, if rtsec is a list)
+    """
+    if get_heuristic_family(name) != 'mqlib':
+        raise ValueError(f'Unknown classical heuristic {name}')
+
+    return get_heuristic_backend(name).run_mql_heuristic_seeds(name, instance, nb_seeds,
+                                                               **kwargs)
+
+
+def group_anytime_parameters(entry, param_list):
+    """
+    Group parameter settings only differing by the anytime parameter of a
+    heuristic, each group being covered by a single run
+
+    Parameters
+    ----------
+    entry : dict
+        registration of the heuristic, see get_heuristic_entry
+    param_list : list<dict>
+        parameter settings
+
+    Returns
+    -------
+        list<list<dict>>: groups of parameter settings
+    """
+    anytime_parameter = entry['anytime_parameter']
+    if anytime_parameter is None:
+        return [[params] for params in param_list]
+
+    groups = {}
+    for params in param_list:
+        other_params = {k: v for k, v in params.items() if k != anytime_parameter}
+        groups.setdefault(repr(sorted(other_params.items())), []).append(params)
+
+    return list(groups.values())
+
+
+def run_heuristic_group(entry, instance, param_group, timer=None):
+    """
+    Run a heuristic for a group of parameter settings, see
+    group_anytime_parameters
+
+    Parameters
+    ----------
+    entry : dict
+        registration of the heuristic, see get_heuristic_entry
+    instance : MaxCutInstance
+        instance being solved
+    param_group : list<dict>
+        parameter settings only differing by the anytime parameter
+    timer : PhaseTimer
+        timer holding the phases measured before the run, if given
+
+    Returns
+    -------
+        list of dictionaries storing the result of each parameter setting
+    """
+    run = get_heuristic_function(entry, 'run')
+    timer = PhaseTimer() if timer is None else timer
+    anytime_parameter = entry['anytime_parameter']
+
+    if len(param_group) == 1 or anytime_parameter is None:
+        return [run(entry['name'], instance, **param_group[0], timer=timer)]
+
+    params = {k: v for k, v in param_group[0].items() if k != anytime_parameter}
+    params[anytime_parameter] = [p[anytime_parameter] for p in param_group]
+    return run(entry['name'], instance, **params, timer=timer)
+
+
+def _run_heuristic_sequence(entry, instances, param_grid):
+    """
+    Run a heuristic without batch entry point on a list of instances, one
+    run per instance and group of parameter settings
+    """
+    param_groups = group_anytime_parameters(
+        entry, expand_heuristic_grid(entry['name'], param_grid)
+    )
+
+    for instance in instances:
+        for param_group in param_groups:
+            for res_dict in run_heuristic_group(entry, instance, param_group):
+                yield instance, res_dict
+
+
+# Built-in heuristics
+for _name in MQLIB_HEURISTICS:
+    register_heuristic(
+        _name, 'mqlib', 'run_mql_heuristic', HEURISTIC_DESCRIPTIONS[_name],
+        defaults={'rtsec': RTSEC},
+        options=('seed',), process_safe=True, anytime_parameter='rtsec'
+    )
+
+for _name in DW_HEURISTICS:
+    register_heuristic(
+        _name, 'dwave', 'run_dw_heuristic', HEURISTIC_DESCRIPTIONS[_name],
+        defaults={'annealing_time': DW_AN_TIME, 'num_reads': DW_NUM_READS},
+        options=('post_processing',), run_batch='run_dw_heuristic_jobs', thread_safe=True
+    )
+
+for _name in LOCAL_HEURISTICS:
+    register_heuristic(
+        _name, 'local', 'run_dw_heuristic', HEURISTIC_DESCRIPTIONS[_name],
+        defaults={'annealing_time': DW_AN_TIME, 'num_reads': DW_NUM_READS},
+        options=('post_processing', 'num_sweeps', 'beta_range', 'seed'),
+        run_batch='run_dw_heuristic_jobs', process_safe=True
+    )
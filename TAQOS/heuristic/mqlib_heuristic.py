@@ -10,13 +10,25 @@ Description:
 """
 
 # third party import
+import os
+import timeit
+from concurrent.futures import ProcessPoolExecutor
 import MQLib as mql
+import numpy as np
 
 # local import
 from TAQOS.env import RTSEC
+from TAQOS.logger.instrumentation import PhaseTimer, \
+    configure_instrumentation, get_instrumentation_config
 
+# Seeds of the MQLib heuristics are non negative 32 bit integers
+MQLIB_MAX_SEED = 2 ** 31
 
-def format_mqlib_results(heuristic, instance, result, rtsec):
+# Instance of the processes of run_mql_heuristic_seeds
+_SEED_WORKER_INSTANCE = None
+
+
+def format_mqlib_results(heuristic, instance, result, rtsec, timer=None):
     """
     Format the results obtained from MQLib solvers
 
@@ -30,25 +42,36 @@ def format_mqlib_results(heuristic, instance, result, rtsec):
         result structure returned by the MQLib
     rtsec : int
         processing time limit (in second)
+    timer : PhaseTimer
+        timer measuring the evaluation of the solution, if given. The
+        measured solver phase of the timer is the wall clock time of the
+        result, rtsec if the timer measured no solver phase.
 
     Returns
     -------
         dictionary storing the result of the simulation
     """
-    solution_dict = dict(zip([i for i in instance.graph.nodes()], result['solution']))
+    timer = PhaseTimer() if timer is None else timer
+    solution_dict = dict(zip(
+        [str(i) for i in instance.node_ids.tolist()], result['solution']
+    ))
+
+    with timer.phase('evaluation'):
+        best_cut_size = instance.get_cut_size(solution_dict)
+        best_energy = instance.compute_energy(solution_dict)
 
     res_dict = {
         'heuristic_name': heuristic,
         'time': {
-            'wall_clock_time': rtsec
+            'wall_clock_time': timer.times.get('solver', rtsec)
         },
         'parameter_setting': {
             'max_runtime': rtsec
         },
         'solution': {
             'best_partition': solution_dict,
-            'best_cut_size': instance.get_cut_size(solution_dict),
-            'best_energy': instance.compute_energy(solution_dict)
+            'best_cut_size': best_cut_size,
+            'best_energy': best_energy
         },
         'extra': {
             'bestsolhistory_objvals': result['bestsolhistory_objvals'],
@@ -59,7 +82,81 @@ def format_mqlib_results(heuristic, instance, result, rtsec):
     return res_dict
 
 
-def run_mql_heuristic(heuristic, instance, rtsec=RTSEC):
+def format_mqlib_anytime_results(heuristic, instance, result, budgets, timer=None):
+    """
+    Format the results that a run would have obtained with smaller time
+    limits, from the history of the best solutions of a single run. MQLib
+    only records the cut size of the best solutions: the result of a
+    smaller time limit is marked by extra['anytime_derived'], its
+    best_partition is None unless the final solution was already found
+    within the time limit, and its best_energy is derived from the cut
+    size. The time entry of a derived result holds the time limit as
+    wall_clock_time, without measures of phases that did not run for it.
+
+    Parameters
+    ----------
+    heuristic : string
+        name of the heuristic
+    instance : Instance
+        instance being solved
+    result : dict
+        result structure returned by the MQLib for the largest time limit
+    budgets : list<float>
+        processing time limits (in second)
+    timer : PhaseTimer
+        timer measuring the evaluation of the solution, if given
+
+    Returns
+    -------
+        list of dictionaries storing the result of each time limit
+    """
+    objvals = np.asarray(result['bestsolhistory_objvals'], dtype=np.float64)
+    runtimes = np.asarray(result['bestsolhistory_runtimes'], dtype=np.float64)
+    total_weight = float(np.sum(instance.weights))
+    largest_budget = max(budgets)
+
+    res_list = []
+    final = format_mqlib_results(heuristic, instance, result, largest_budget, timer)
+    for budget in budgets:
+        if budget == largest_budget:
+            res_dict = final
+        else:
+            found = runtimes <= budget
+            best_cut_size = float(objvals[found].max()) if found.any() else 0.
+
+            # The partition is only known for the final solution
+            if found.any() and best_cut_size >= result['objval']:
+                solution = dict(final['solution'])
+            else:
+                solution = {
+                    'best_partition': None,
+                    'best_cut_size': best_cut_size,
+                    'best_energy': total_weight - 2 * best_cut_size
+                }
+
+            res_dict = {
+                'heuristic_name': heuristic,
+                'time': {
+                    'wall_clock_time': budget
+                },
+                'parameter_setting': {
+                    'max_runtime': budget
+                },
+                'solution': solution,
+                'extra': {
+                    'bestsolhistory_objvals': objvals[found].tolist(),
+                    'bestsolhistory_runtimes': runtimes[found].tolist()
+                }
+            }
+
+        res_dict['extra']['anytime_max_runtime'] = largest_budget
+        res_dict['extra']['anytime_derived'] = budget != largest_budget
+        res_list.append(res_dict)
+
+    return res_list
+
+
+def run_mql_heuristic(heuristic, instance, rtsec=RTSEC, seed=None, timer=None):
     """
     Run MQLib heuristic
 
@@ -69,12 +166,189 @@ def run_mql_heuristic(heuristic, instance, rtsec=RTSEC):
         name of the heuristic
     instance : Instance
         instance being solved
+    rtsec : int or list<int>
+        processing time limit (in second). For a list of time limits, the
+        heuristic is run once with the largest one, the results of the
+        other ones being derived from the history of the best solutions
+    seed : int
+        seed of the heuristic, a random seed is used if None
+    timer : PhaseTimer
+        timer of the run, holding the phases measured before the call (for
+        instance the loading of the instance) if given
+
+    Returns
+    -------
+        dictionary storing the result of the simulation, list of
+        dictionaries (one per time limit) if rtsec is a list. The time
+        entry holds the measures of the phases of the run, see PhaseTimer,
+        except for the results derived for the smaller time limits (see
+        format_mqlib_anytime_results)
+    """
+    timer = PhaseTimer() if timer is None else timer
+    budgets = list(rtsec) if isinstance(rtsec, (list, tuple, np.ndarray)) else None
+    max_runtime = rtsec if budgets is None else max(budgets)
+
+    with timer.phase('conversion'):
+        mqlib_instance = instance.to_mqlib_instance()
+
+    seed_kwargs = {} if seed is None else {'seed': int(seed)}
+    with timer.phase('solver', memory=False):
+        result = mql.runHeuristic(heuristic, mqlib_instance, rtsec=max_runtime,
+                                  **seed_kwargs)
+
+    with timer.phase('formatting'):
+        if budgets is None:
+            res_list = [format_mqlib_results(heuristic, instance, result, rtsec, timer)]
+        else:
+            res_list = format_mqlib_anytime_results(heuristic, instance, result, budgets,
+                                                    timer)
+
+    for res_dict in res_list:
+        # Results derived from the history did not run the phases
+        if not res_dict['extra'].get('anytime_derived', False):
+            timer.attach(res_dict)
+        if seed is not None:
+            res_dict['parameter_setting']['seed'] = int(seed)
+
+    return res_list[0] if budgets is None else res_list
+
+
+def _set_seed_worker_instance(instrumentation, instance_class, id, *arrays):
+    """
+    Initializer of the processes of run_mql_heuristic_seeds: the instance
+    is rebuilt once per process from its arrays
+    """
+    global _SEED_WORKER_INSTANCE
+    configure_instrumentation(**instrumentation)
+    _SEED_WORKER_INSTANCE = instance_class.from_arrays(id, *arrays)
+
+
+def _seed_worker(heuristic, rtsec, seed):
+    """
+    Run a MQLib heuristic on the instance of the process
+    """
+    return run_mql_heuristic(heuristic, _SEED_WORKER_INSTANCE, rtsec, seed)
+
+
+def get_seed_statistics(heuristic, res_list, rtsec, wall_clock_time=None):
+    """
+    Aggregate the results of independent runs of a MQLib heuristic
+
+    Parameters
+    ----------
+    heuristic : string
+        name of the heuristic
+    res_list : list<dict>
+        result of each run
     rtsec : int
-        processing time limit (in second)
+        processing time limit of each run (in second)
+    wall_clock_time : float
+        measured duration of the runs (in second), the runs being
+        considered run one after the other if None
 
     Returns
     -------
-        dictionary storing the result of the simulation
+        dictionary storing the best solution and the statistics of the
+        energies of the runs, the result of each run being in
+        extra['seed_results']
     """
-    result = mql.runHeuristic(heuristic, instance.to_mqlib_instance(), rtsec=rtsec)
-    return format_mqlib_results(heuristic, instance, result, rtsec)
+    total_runtime = float(sum(res_dict['time']['wall_clock_time'] for res_dict in res_list))
+    energies = np.array([res_dict['solution']['best_energy'] for res_dict in res_list],
+                        dtype=np.float64)
+    best = res_list[int(np.argmin(energies))]
+
+    derived = all(res_dict['extra'].get('anytime_derived', False) for res_dict in res_list)
+
+    # Phases of the runs are summed, their peak memory is the largest one
+    timer = PhaseTimer()
+    for res_dict in res_list:
+        timer.add(res_dict['time'])
+
+    res_dict = {
+        'heuristic_name': heuristic,
+        'time': {
+            'wall_clock_time': total_runtime if wall_clock_time is None else wall_clock_time,
+            'total_runtime': total_runtime
+        },
+        'parameter_setting': {
+            'max_runtime': rtsec,
+            'nb_seeds': len(res_list)
+        },
+        'solution': {
+            'best_partition': best['solution']['best_partition'],
+            'best_cut_size': best['solution']['best_cut_size'],
+            'best_energy': float(energies.min()),
+            'worst_energy': float(energies.max()),
+            'mean_energy': float(energies.mean()),
+            'std_energy': float(energies.std()),
+            'median_energy': float(np.median(energies))
+        },
+        'extra': {
+            'seeds': [res_dict['parameter_setting']['seed'] for res_dict in res_list],
+            'seed_results': res_list
+        }
+    }
+
+    if derived:
+        res_dict['extra']['anytime_derived'] = True
+        return res_dict
+
+    return timer.attach(res_dict)
+
+
+def run_mql_heuristic_seeds(heuristic, instance, nb_seeds, rtsec=RTSEC, seed=None,
+                            processes=None):
+    """
+    Run independent seeds of a MQLib heuristic on a process pool
+
+    Parameters
+    ----------
+    heuristic : string
+        name of the heuristic
+    instance : MaxCutInstance
+        instance being solved
+    nb_seeds : int
+        number of runs
+    rtsec : int or list<int>
+        processing time limit of each run (in second). For a list of time
+        limits, each seed is run once with the largest one (see
+        run_mql_heuristic) and the results are aggregated per time limit.
+    seed : int
+        seed from which the seeds of the runs are drawn, a random seed is
+        used if None
+    processes : int
+        number of processes, all the cores are used if None
+
+    Returns
+    -------
+        dictionary storing the aggregated result, see get_seed_statistics,
+        list of dictionaries (one per time limit) if rtsec is a list
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(nb_seeds) % MQLIB_MAX_SEED
+
+    processes = os.cpu_count() if processes is None else processes
+    processes = max(1, min(processes, nb_seeds))
+
+    start_time = timeit.default_timer()
+    if processes == 1:
+        res_list = [run_mql_heuristic(heuristic, instance, rtsec, s) for s in seeds.tolist()]
+    else:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=_set_seed_worker_instance,
+                                 initargs=(get_instrumentation_config(),
+                                           type(instance), instance.id,
+                                           *instance.to_arrays())) as executor:
+            res_list = list(executor.map(_seed_worker, [heuristic] * nb_seeds,
+                                         [rtsec] * nb_seeds, seeds.tolist()))
+    wall_clock_time = timeit.default_timer() - start_time
+
+    if not isinstance(rtsec, (list, tuple, np.ndarray)):
+        return get_seed_statistics(heuristic, res_list, rtsec, wall_clock_time)
+
+    # Results of each seed are given per time limit, the smaller ones being
+    # derived from the runs of the largest one
+    largest_budget = max(rtsec)
+    return [get_seed_statistics(heuristic, [seed_results[i] for seed_results in res_list],
+                                budget,
+                                wall_clock_time if budget == largest_budget else budget)
+            for i, budget in enumerate(rtsec)]
@@ -0,0 +1,122 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+   Post-processing of the samples of the annealers: single spin flip
+   steepest descent run on every sample at once
+=========
+
+"""
+
+# third party import
+import numpy as np
+import scipy.sparse as sp
+
+# local import
+
+
+def _get_neighbor_positions(indptr, nodes):
+    """
+    Positions in the CSR arrays of the neighbors of several nodes
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the adjacency
+    nodes : numpy array
+        nodes whose neighbors are listed
+
+    Returns
+    -------
+        numpy array: positions of the neighbors, node after node
+        numpy array: number of neighbors of each node
+    """
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    ends = np.cumsum(counts)
+    offsets = np.arange(ends[-1] if len(ends) > 0 else 0) - np.repeat(ends - counts, counts)
+    return np.repeat(starts, counts) + offsets, counts
+
+
+def steepest_descent(indptr, indices, weights, spins, max_iterations=None):
+    """
+    Single spin flip steepest descent on the Ising energy
+    sum_{(i, j)} w_ij s_i s_j of many spin assignments at once: at each
+    iteration every sample flips the spin decreasing its energy the most,
+    until no flip decreases it. The local fields of the samples are kept
+    as a (number of samples, number of nodes) array, updated over the
+    neighbors of the flipped spins.
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the symmetric adjacency
+    indices : numpy array
+        CSR column indices of the adjacency
+    weights : numpy array
+        CSR weights of the adjacency
+    spins : numpy array (num_samples, num_nodes)
+        spin (1 or -1) of each node in each sample, nodes set to 0 are
+        given the spin 1
+    max_iterations : int
+        maximal number of flips per sample, no limit if None
+
+    Returns
+    -------
+        numpy array of int8 (num_samples, num_nodes): local minima reached
+        numpy array of float: energy of each local minimum
+        numpy array of int: number of flips of each sample
+    """
+    num_nodes = len(indptr) - 1
+    spins = np.where(np.asarray(spins) < 0, -1, 1).astype(np.int8)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    adjacency = sp.csr_matrix((weights, indices, indptr), shape=(num_nodes, num_nodes))
+    fields = (adjacency @ spins.T.astype(np.float64)).T
+
+    energies = 0.5 * np.einsum('ij,ij->i', spins, fields)
+    nb_flips = np.zeros(len(spins), dtype=np.int64)
+
+    # Energy change of flipping each spin: -2 s_i h_i. The rows of the
+    # samples not yet in a local minimum are kept in a compact working set.
+    deltas = -2 * spins * fields
+    active = np.arange(len(spins))
+    work_spins = spins
+    work_deltas = deltas
+    iteration = 0
+    while len(active) > 0 and (max_iterations is None or iteration < max_iterations):
+        best_nodes = np.argmin(work_deltas, axis=1)
+        best_deltas = work_deltas[np.arange(len(active)), best_nodes]
+
+        improving = best_deltas < 0
+        if not improving.all():
+            spins[active] = work_spins
+            active = active[improving]
+            work_spins = work_spins[improving]
+            work_deltas = work_deltas[improving]
+            best_nodes = best_nodes[improving]
+            best_deltas = best_deltas[improving]
+            if len(active) == 0:
+                break
+
+        work_rows = np.arange(len(active))
+        work_spins[work_rows, best_nodes] *= -1
+        work_deltas[work_rows, best_nodes] *= -1
+        energies[active] += best_deltas
+        nb_flips[active] += 1
+
+        # Flipping s_i changes the field of each neighbor j by 2 w_ij s_i,
+        # hence its delta by -4 s_j w_ij s_i
+        positions, counts = _get_neighbor_positions(indptr, best_nodes)
+        neighbor_rows = np.repeat(work_rows, counts)
+        neighbors = indices[positions]
+        work_deltas[neighbor_rows, neighbors] -= \
+            4 * weights[positions] * work_spins[neighbor_rows, neighbors] \
+            * np.repeat(work_spins[work_rows, best_nodes], counts)
+
+        iteration += 1
+
+    spins[active] = work_spins
+    return spins, energies, nb_flips
@@ -0,0 +1,192 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+   Export of the results of the heuristics to JSON. The samples of D-Wave
+   results are kept as bit-packed rows, encoded in base64 in JSON, and only
+   expanded to a list of samples on request.
+=========
+
+"""
+
+# third party import
+import base64
+import json
+import numpy as np
+
+# local import
+
+
+def _to_json_value(value):
+    """
+    Convert numpy values nested in a result to python values
+    """
+    if isinstance(value, dict):
+        return {k: _to_json_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(v) for v in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+def pack_samples(samples):
+    """
+    Bit-pack samples, the bit of a variable being set for spin +1 or
+    value 1
+
+    Parameters
+    ----------
+    samples : array like
+        samples of SPIN or BINARY values, one per row
+
+    Returns
+    -------
+        numpy array of uint8: bit-packed rows of the samples
+    """
+    return np.packbits(np.asarray(samples) > 0, axis=1)
+
+
+def unpack_samples(extra):
+    """
+    Expand the bit-packed samples of the extra entry of a D-Wave result
+
+    Parameters
+    ----------
+    extra : dict
+        extra entry of a result holding 'samples' (bit-packed rows),
+        'variables' and 'vartype'
+
+    Returns
+    -------
+        numpy array of int8: samples in the values of extra['vartype'],
+        one per row, the columns being ordered as extra['variables']
+    """
+    bits = np.unpackbits(extra['samples'], axis=1,
+                         count=len(extra['variables'])).astype(np.int8)
+    if extra.get('vartype', 'SPIN') == 'BINARY':
+        return bits
+    return 2 * bits - 1
+
+
+def _encode_samples(samples):
+    """
+    Encode bit-packed samples in base64
+    """
+    return base64.b64encode(np.ascontiguousarray(samples).tobytes()).decode('ascii')
+
+
+def _decode_samples(extra):
+    """
+    Decode the samples encoded by _encode_samples to bit-packed rows, one
+    per energy, of one bit per variable rounded up to whole bytes
+    """
+    bits = np.frombuffer(base64.b64decode(extra['samples']), dtype=np.uint8)
+    row_width = (len(extra['variables']) + 7) // 8
+    return bits.reshape(len(extra['energies']), row_width).copy()
+
+
+def result_to_json(res_dict, expand_samples=False):
+    """
+    Convert the result of a heuristic to the JSON format of the stored
+    results
+
+    Parameters
+    ----------
+    res_dict : dict
+        result of a heuristic
+    expand_samples : bool
+        if True, the samples of D-Wave results are written as a list of
+        {'sample', 'num_occurrences', 'energy'} dictionaries, otherwise
+        they are bit-packed and encoded in base64
+
+    Returns
+    -------
+        dict: result with JSON serializable values
+    """
+    extra = res_dict.get('extra', {})
+    if not isinstance(extra.get('samples'), np.ndarray):
+        return _to_json_value(res_dict)
+
+    if expand_samples:
+        sample_list = []
+        for sample, occurrence, energy in zip(unpack_samples(extra).tolist(),
+                                              extra['num_occurrences'],
+                                              extra['energies']):
+            sample_list.append({
+                'sample': dict(zip(extra['variables'], sample)),
+                'num_occurrences': occurrence,
+                'energy': energy
+            })
+        json_extra = {k: v for k, v in extra.items()
+                      if k not in ('variables', 'samples', 'num_occurrences', 'energies')}
+        json_extra['sample_list'] = sample_list
+    else:
+        json_extra = dict(extra, samples=_encode_samples(extra['samples']))
+
+    json_dict = dict(res_dict)
+    json_dict['extra'] = json_extra
+    return _to_json_value(json_dict)
+
+
+def result_from_json(json_dict):
+    """
+    Decode the bit-packed samples of a result stored with result_to_json
+
+    Parameters
+    ----------
+    json_dict : dict
+        result read from a JSON file
+
+    Returns
+    -------
+        dict: result of a heuristic
+    """
+    extra = json_dict.get('extra', {})
+    if not isinstance(extra.get('samples'), str):
+        return json_dict
+
+    res_dict = dict(json_dict)
+    res_dict['extra'] = dict(extra, samples=_decode_samples(extra))
+    return res_dict
+
+
+def save_results_json(file_path, results, expand_samples=False):
+    """
+    Write the results of an instance in the format of maxcut_results
+
+    Parameters
+    ----------
+    file_path : string
+        path of the JSON file
+    results : dict<string, list<dict>>
+        results of each heuristic
+    expand_samples : bool
+        see result_to_json
+    """
+    with open(file_path, 'w') as fo:
+        json.dump({heuristic: [result_to_json(res_dict, expand_samples)
+                               for res_dict in res_list]
+                   for heuristic, res_list in results.items()}, fo)
+
+
+def load_results_json(file_path):
+    """
+    Read the results of an instance in the format of maxcut_results
+
+    Parameters
+    ----------
+    file_path : string
+        path of the JSON file
+
+    Returns
+    -------
+        dict<string, list<dict>>: results of each heuristic
+    """
+    with open(file_path, 'r') as fi:
+        results = json.load(fi)
+
+    return {heuristic: [result_from_json(res_dict) for res_dict in res_list]
+            for heuristic, res_list in results.items()}
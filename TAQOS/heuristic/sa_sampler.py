@@ -0,0 +1,201 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+   Local simulated annealing sampler, used in place of the D-Wave solvers
+   to run the pipeline offline
+=========
+
+"""
+
+# third party import
+import timeit
+import dimod
+import numpy as np
+import scipy.sparse as sp
+
+# local import
+from TAQOS.env import DW_NUM_READS, SA_NUM_SWEEPS
+
+
+def get_greedy_coloring(indptr, indices):
+    """
+    Color the nodes of a graph so that two neighbors never share a color,
+    nodes of the largest degree being colored first
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the adjacency
+    indices : numpy array
+        CSR column indices of the adjacency
+
+    Returns
+    -------
+        list<numpy array>: nodes of each color
+    """
+    num_nodes = len(indptr) - 1
+    color = np.full(num_nodes, -1, dtype=np.int64)
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+
+    for node in np.argsort(-np.diff(np.asarray(indptr)), kind='stable').tolist():
+        used = {color[v] for v in indices[indptr[node]:indptr[node + 1]]}
+        c = 0
+        while c in used:
+            c += 1
+        color[node] = c
+
+    return [np.flatnonzero(color == c) for c in range(color.max() + 1)]
+
+
+def get_default_beta_range(h, adjacency):
+    """
+    Inverse temperatures at the beginning and at the end of the annealing:
+    the largest energy change of a flip is accepted with probability 1/2
+    at the beginning, the smallest one with probability 1/100 at the end
+
+    Parameters
+    ----------
+    h : numpy array
+        linear biases
+    adjacency : scipy csr matrix
+        symmetric quadratic biases
+
+    Returns
+    -------
+        (float, float): initial and final inverse temperatures
+    """
+    abs_adjacency = abs(adjacency)
+    max_delta = 2 * float(np.max(np.abs(h) + abs_adjacency.sum(axis=1).A1, initial=0))
+
+    biases = np.concatenate([np.abs(h), abs_adjacency.data])
+    biases = biases[biases > 0]
+    min_delta = 2 * float(biases.min()) if len(biases) > 0 else 1.
+
+    if max_delta == 0:
+        return 1., 1.
+
+    return np.log(2) / max_delta, np.log(100) / min_delta
+
+
+class LocalAnnealingSampler(dimod.Sampler):
+    """
+    Simulated annealing on a binary quadratic model, all the reads being
+    annealed together: the spins are stored as a (variables, reads) array
+    and each sweep updates the nodes color by color (nodes of a color are
+    never coupled) with one sparse product per color.
+    """
+
+    parameters = {
+        'num_reads': [],
+        'num_sweeps': [],
+        'beta_range': [],
+        'seed': [],
+        'annealing_time': []
+    }
+
+    properties = {
+        'category': 'software'
+    }
+
+    def sample(self, bqm, num_reads=DW_NUM_READS, num_sweeps=SA_NUM_SWEEPS,
+               beta_range=None, seed=None, annealing_time=None, **kwargs):
+        """
+        Sample from a binary quadratic model
+
+        Parameters
+        ----------
+        bqm : dimod BinaryQuadraticModel
+            model being sampled
+        num_reads : int
+            number of independent annealing runs
+        num_sweeps : int
+            number of sweeps over every variable
+        beta_range : (float, float)
+            initial and final inverse temperatures, the temperatures follow
+            a geometric schedule (default: get_default_beta_range)
+        seed : int
+            seed of the random generator
+        annealing_time : int
+            annealing time of the D-Wave solvers, accepted for
+            compatibility and ignored
+
+        Returns
+        -------
+            dimod SampleSet with the timing of the run in info['timing'],
+            in micro seconds
+        """
+        start_time = timeit.default_timer()
+
+        spin_bqm = bqm.change_vartype(dimod.SPIN, inplace=False)
+        variables = list(spin_bqm.variables)
+        num_variables = len(variables)
+
+        h, (row, col, quadratic), _ = spin_bqm.to_numpy_vectors(
+            variable_order=variables
+        )
+        adjacency = sp.coo_matrix(
+            (np.concatenate([quadratic, quadratic]),
+             (np.concatenate([row, col]), np.concatenate([col, row]))),
+            shape=(num_variables, num_variables)
+        ).tocsr().astype(np.float32)
+        adjacency.sum_duplicates()
+        h = h.astype(np.float32)
+
+        # Variables are relabeled color by color, so that the spins of a
+        # color are a contiguous block of rows
+        colors = get_greedy_coloring(adjacency.indptr, adjacency.indices)
+        order = np.concatenate(colors)
+        adjacency = adjacency[order][:, order].tocsr()
+        h = h[order]
+        bounds = np.cumsum([0] + [len(nodes) for nodes in colors])
+        color_blocks = [(start, end, adjacency[start:end], h[start:end, None])
+                        for start, end in zip(bounds[:-1], bounds[1:])]
+
+        if beta_range is None:
+            beta_range = get_default_beta_range(h, adjacency)
+        betas = np.geomspace(beta_range[0], beta_range[1], num_sweeps).astype(np.float32)
+
+        rng = np.random.default_rng(seed)
+        spins = (2 * rng.integers(0, 2, size=(num_variables, num_reads), dtype=np.int8) - 1) \
+            .astype(np.float32)
+
+        preprocessing_time = timeit.default_timer()
+
+        for beta in betas:
+            for start, end, rows, bias in color_blocks:
+                block = spins[start:end]
+
+                # Energy change of flipping each spin of the color
+                delta = rows @ spins
+                delta += bias
+                delta *= block
+                delta *= -2
+
+                # Metropolis criterion: accept if -log(u) / beta > delta,
+                # with u uniform in (0, 1]
+                threshold = rng.random(delta.shape, dtype=np.float32)
+                np.log1p(-threshold, out=threshold)
+                threshold *= -1 / beta
+                np.negative(block, out=block, where=delta < threshold)
+
+        sampling_time = timeit.default_timer()
+
+        samples = np.empty((num_reads, num_variables), dtype=np.int8)
+        samples[:, order] = spins.T
+        if bqm.vartype is dimod.BINARY:
+            samples = (samples + 1) // 2
+
+        sample_set = dimod.SampleSet.from_samples_bqm((samples, variables), bqm)
+        sample_set.info['timing'] = {
+            'qpu_programming_time': (preprocessing_time - start_time) * 10 ** 6,
+            'qpu_sampling_time': (sampling_time - preprocessing_time) * 10 ** 6,
+            'qpu_anneal_time_per_sample': (sampling_time - preprocessing_time) * 10 ** 6 / num_reads,
+            'qpu_access_time': (timeit.default_timer() - start_time) * 10 ** 6,
+            'num_sweeps': num_sweeps
+        }
+
+        return sample_set
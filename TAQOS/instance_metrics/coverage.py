@@ -0,0 +1,241 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Coverage of the metric space by a set of instances: each metric value
+    v covers the interval [v - epsilon, v + epsilon] clipped to [0, 1]
+=========
+"""
+
+# third party import
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+# local import
+
+
+def get_coverage_intervals(values, epsilon):
+    """
+    Merge the intervals covered by a set of metric values
+
+    Parameters
+    ----------
+    values : array like of float
+        values of a metric
+    epsilon : float
+        coverage factor
+
+    Returns
+    -------
+        numpy array of shape (k, 2): disjoint covered intervals, sorted
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    starts = np.clip(values - epsilon, 0, 1)
+    ends = np.clip(values + epsilon, 0, 1)
+
+    # Empty intervals (epsilon = 0 or value outside [0, 1]) cover nothing
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return np.zeros((0, 2))
+
+    # Interval ends are sorted as the values are, an interval starts a new
+    # block when it begins after the end of the previous one
+    new_block = np.ones(len(starts), dtype=bool)
+    new_block[1:] = starts[1:] > ends[:-1]
+    first = np.flatnonzero(new_block)
+    last = np.append(first[1:], len(starts)) - 1
+
+    return np.stack([starts[first], ends[last]], axis=1)
+
+
+def get_coverage_length(values, epsilon):
+    """
+    Total length covered by a set of metric values
+
+    Parameters
+    ----------
+    values : array like of float
+        values of a metric
+    epsilon : float
+        coverage factor
+
+    Returns
+    -------
+        float: length of the union of the covered intervals
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    if len(values) == 0:
+        return 0.0
+
+    starts = np.clip(values - epsilon, 0, 1)
+    ends = np.clip(values + epsilon, 0, 1)
+
+    # Each interval only adds the part beyond the end of the previous one
+    previous_end = np.concatenate([[0.0], ends[:-1]])
+    contribution = ends - np.maximum(starts, previous_end)
+
+    return float(np.maximum(contribution, 0).sum())
+
+
+def get_coverage_curve(values, epsilons):
+    """
+    Total length covered by a set of metric values for several coverage
+    factors at once. The values are sorted once and the contribution of
+    every interval is computed for all the coverage factors together.
+
+    Parameters
+    ----------
+    values : array like of float
+        values of a metric
+    epsilons : array like of float
+        coverage factors
+
+    Returns
+    -------
+        numpy array of float: covered length for each coverage factor
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    epsilons = np.asarray(epsilons, dtype=np.float64)
+    if len(values) == 0:
+        return np.zeros(len(epsilons))
+
+    # One row per coverage factor
+    starts = np.clip(values[None, :] - epsilons[:, None], 0, 1)
+    ends = np.clip(values[None, :] + epsilons[:, None], 0, 1)
+
+    previous_end = np.zeros_like(ends)
+    previous_end[:, 1:] = ends[:, :-1]
+    contribution = ends - np.maximum(starts, previous_end)
+
+    return np.maximum(contribution, 0).sum(axis=1)
+
+
+def _uncovered_length(value, epsilon, previous, next):
+    """
+    Length of the interval covered by value that is not covered by the
+    values previous and next surrounding it (None if missing). As every
+    interval has the same width, a value is only overlapped by the
+    intervals of its neighbors in the sorted values.
+    """
+    start = max(0.0, value - epsilon)
+    end = min(1.0, value + epsilon)
+
+    if previous is not None:
+        start = max(start, previous + epsilon)
+    if next is not None:
+        end = min(end, next - epsilon)
+
+    return max(0.0, end - start)
+
+
+class CoverageTracker:
+    """
+    Covered length of each metric for a set of instances updated as
+    instances are added or removed. The values of each metric are kept in
+    a sorted list so that an update only looks at the neighbors of the
+    value: the neighbors are found by bisection in O(log n), but inserting
+    or deleting the value shifts the following ones, so that an update is
+    O(n) in the number n of instances of the set (a memory move, much
+    cheaper than recomputing the coverage in O(n log n)).
+    """
+
+    def __init__(self, epsilon):
+        """
+        Parameters
+        ----------
+        epsilon : float
+            coverage factor
+        """
+        self.epsilon = epsilon
+        self._values = {}
+        self._length = {}
+
+    def __len__(self):
+        return len(next(iter(self._values.values()), []))
+
+    def _neighbors(self, metric, value):
+        """
+        Values surrounding value in the sorted values of a metric
+        """
+        values = self._values.get(metric, [])
+        i = bisect_left(values, value)
+        j = bisect_right(values, value)
+
+        if i != j:
+            # Value already present: any copy covers the same interval
+            return value, value
+
+        previous = values[i - 1] if i > 0 else None
+        next = values[i] if i < len(values) else None
+        return previous, next
+
+    def marginal_gain(self, metrics):
+        """
+        Covered length each metric would gain if an instance was added
+
+        Parameters
+        ----------
+        metrics : dict<string, float>
+            metrics of the instance
+
+        Returns
+        -------
+            dict<string, float>: gain of covered length of each metric
+        """
+        gain = {}
+        for metric, value in metrics.items():
+            value = float(value)
+            gain[metric] = _uncovered_length(
+                value, self.epsilon, *self._neighbors(metric, value)
+            )
+
+        return gain
+
+    def add(self, metrics):
+        """
+        Add an instance to the covering set
+
+        Parameters
+        ----------
+        metrics : dict<string, float>
+            metrics of the instance
+        """
+        for metric, gain in self.marginal_gain(metrics).items():
+            value = float(metrics[metric])
+            values = self._values.setdefault(metric, [])
+            values.insert(bisect_right(values, value), value)
+            self._length[metric] = self._length.get(metric, 0.0) + gain
+
+    def remove(self, metrics):
+        """
+        Remove an instance from the covering set
+
+        Parameters
+        ----------
+        metrics : dict<string, float>
+            metrics of the instance, as given when it was added
+        """
+        for metric, value in metrics.items():
+            value = float(value)
+            values = self._values[metric]
+            i = bisect_left(values, value)
+            if i == len(values) or values[i] != value:
+                raise ValueError(f'No instance with {metric} = {value} in the covering set')
+
+            del values[i]
+            self._length[metric] -= _uncovered_length(
+                value, self.epsilon, *self._neighbors(metric, value)
+            )
+
+    def get_coverage(self):
+        """
+        Covered length of each metric
+
+        Returns
+        -------
+            dict<string, float>: covered length of each metric
+        """
+        return {metric: max(0.0, length) for metric, length in self._length.items()}
@@ -8,15 +8,43 @@ Description:
 """
 
 # third party import
+import os
+from concurrent.futures import ProcessPoolExecutor
 import networkx as nx
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import shortest_path
+from scipy.sparse.linalg import LinearOperator, eigsh
 
 # local import
 
+# Number of sources explored together by a bit-parallel BFS (one bit of the
+# visited masks per source)
+BFS_BATCH_SIZE = 512
 
-def get_metrics(G):
+# CSR adjacency shared with the BFS worker processes
+_BFS_WORKER_GRAPH = None
+
+# Metric modes: exact eccentricities (one BFS per node) or eccentricities
+# bounded from a limited number of BFS
+METRIC_MODES = ('exact', 'approx')
+
+# Default number of BFS run by the approximate mode
+APPROX_BUDGET = 64
+
+# Seed of the random BFS sources of the approximate mode, fixed so that
+# approximate metrics can be cached
+APPROX_SEED = 0
+
+# Metrics derived from the eccentricities, the only approximated ones
+ECCENTRICITY_METRICS = ('diameter', 'min_eccentricity', 'max_eccentricity',
+                        'mean_eccentricity', 'stdev_eccentricity')
+
+
+def get_metrics_nx(G):
     """
-    Returns the metrics associated to the graph G
+    Returns the metrics associated to the graph G, computed with networkx.
+    Reference implementation of get_metrics.
 
     Parameters
     ----------
@@ -69,3 +97,479 @@ def get_metrics(G):
     }
 
     return metric_dict
+
+
+def to_csr(num_nodes, edge_u, edge_v, weights):
+    """
+    Build the symmetric CSR adjacency of a graph from its edge arrays
+
+    Parameters
+    ----------
+    num_nodes : int
+        number of nodes
+    edge_u : numpy array of int
+        index of the first endpoint of each edge
+    edge_v : numpy array of int
+        index of the second endpoint of each edge
+    weights : numpy array
+        weight of each edge
+
+    Returns
+    -------
+        numpy arrays indptr, indices (int32) and weights: the neighbors of
+        node i are indices[indptr[i]:indptr[i+1]]
+    """
+    rows = np.concatenate([edge_u, edge_v])
+    cols = np.concatenate([edge_v, edge_u])
+    order = np.argsort(rows, kind='stable')
+
+    indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+
+    return (
+        indptr,
+        cols[order].astype(np.int32),
+        np.concatenate([weights, weights])[order]
+    )
+
+
+def get_metrics(G, processes=1, mode='exact', budget=APPROX_BUDGET,
+                return_error=False):
+    """
+    Returns the metrics associated to the graph G
+
+    Parameters
+    ----------
+        G : networkx graph
+        processes : int
+            number of processes running the BFS, all the cores if None,
+            see get_csr_metrics
+        mode : string
+            'exact' or 'approx', see get_csr_metrics
+        budget : int
+            number of BFS run by the approximate mode
+        return_error : bool
+            if True, the error bound of each metric is returned as well
+
+    Returns
+    -------
+        dict<string, float> store the metrics associated to the graph
+        dict<string, float> error bound of each metric, if return_error
+    """
+    node_index = {node: i for i, node in enumerate(G.nodes())}
+    edges = [(node_index[u], node_index[v], w)
+             for u, v, w in G.edges(data='weight', default=1) if u != v]
+
+    indptr, indices, weights = to_csr(
+        G.number_of_nodes(),
+        np.array([u for u, _, _ in edges], dtype=np.int32),
+        np.array([v for _, v, _ in edges], dtype=np.int32),
+        np.array([w for _, _, w in edges], dtype=np.float64)
+    )
+
+    return get_csr_metrics(indptr, indices, weights, G.number_of_edges(),
+                           processes, mode, budget, return_error)
+
+
+def _set_bfs_worker_graph(indptr, indices):
+    """
+    Initializer of the BFS worker processes
+    """
+    global _BFS_WORKER_GRAPH
+    _BFS_WORKER_GRAPH = (indptr, indices)
+
+
+def _bfs_worker(sources):
+    """
+    Run a bit-parallel BFS in a worker process
+    """
+    return _bfs_eccentricity(*_BFS_WORKER_GRAPH, sources)
+
+
+def _bfs_eccentricity(indptr, indices, sources):
+    """
+    Bit-parallel BFS from a batch of sources: the visited nodes of each
+    source are stored as one bit of a mask per node, so that a single pass
+    over the CSR adjacency per BFS level explores every source at once
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the adjacency
+    indices : numpy array
+        CSR column indices of the adjacency
+    sources : numpy array of int
+        index of the BFS sources
+
+    Returns
+    -------
+        numpy array of int: eccentricity of each source
+        numpy array of int: number of nodes reached from each source
+    """
+    num_nodes = len(indptr) - 1
+    num_sources = len(sources)
+
+    degree = np.diff(indptr)
+    has_neighbors = degree > 0
+    starts = indptr[:-1][has_neighbors]
+
+    source_bit = np.arange(num_sources)
+    visited = np.zeros((num_nodes, (num_sources + 63) // 64), dtype=np.uint64)
+    visited[sources, source_bit // 64] |= \
+        np.uint64(1) << (source_bit % 64).astype(np.uint64)
+
+    frontier = visited.copy()
+    eccentricity = np.zeros(num_sources, dtype=np.int64)
+    level = 0
+
+    while True:
+        # A node is reached at the next level by every source having one of
+        # its neighbors in the frontier
+        next_frontier = np.zeros_like(visited)
+        if len(starts) > 0:
+            next_frontier[has_neighbors] = np.bitwise_or.reduceat(
+                frontier[indices], starts, axis=0
+            )
+        next_frontier &= ~visited
+
+        if not next_frontier.any():
+            break
+
+        level += 1
+        visited |= next_frontier
+        frontier = next_frontier
+
+        reaching = np.unpackbits(
+            np.bitwise_or.reduce(next_frontier, axis=0).view(np.uint8),
+            bitorder='little'
+        )[:num_sources].astype(bool)
+        eccentricity[reaching] = level
+
+    reached = np.unpackbits(
+        visited.view(np.uint8), axis=1, bitorder='little'
+    )[:, :num_sources].sum(axis=0)
+
+    return eccentricity, reached
+
+
+def get_eccentricity(indptr, indices, processes=None):
+    """
+    Compute the eccentricity of every node with one BFS per node, the BFS
+    being run by batches of BFS_BATCH_SIZE sources
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the adjacency
+    indices : numpy array
+        CSR column indices of the adjacency
+    processes : int
+        number of processes running the BFS batches, all the cores are
+        used if None
+
+    Returns
+    -------
+        numpy array of int: eccentricity of each node
+    """
+    num_nodes = len(indptr) - 1
+    batches = [np.arange(start, min(start + BFS_BATCH_SIZE, num_nodes))
+               for start in range(0, num_nodes, BFS_BATCH_SIZE)]
+
+    processes = os.cpu_count() if processes is None else processes
+    processes = min(processes, len(batches))
+
+    if processes > 1:
+        with ProcessPoolExecutor(
+                max_workers=processes, initializer=_set_bfs_worker_graph,
+                initargs=(indptr, indices)) as executor:
+            results = list(executor.map(_bfs_worker, batches))
+    else:
+        results = [_bfs_eccentricity(indptr, indices, sources)
+                   for sources in batches]
+
+    if any(np.any(reached != num_nodes) for _, reached in results):
+        raise nx.NetworkXError(
+            'Found infinite path length because the graph is not connected'
+        )
+
+    return np.concatenate([eccentricity for eccentricity, _ in results])
+
+
+def get_eccentricity_bounds(indptr, indices, budget=APPROX_BUDGET,
+                            seed=APPROX_SEED):
+    """
+    Bound the eccentricity of every node from a limited number of BFS.
+    A BFS from s gives for every node v
+        max(d(s, v), ecc(s) - d(s, v)) <= ecc(v) <= ecc(s) + d(s, v)
+    The first source is the farthest node from a random node (double
+    sweep), then the sources alternate between the unresolved node with the
+    largest upper bound (tightens the diameter), the one with the smallest
+    lower bound (tightens the radius, as in the bounding diameters
+    algorithm of Takes and Kosters) and a random unresolved node (tightens
+    the mean). The exploration stops once the budget is spent or every
+    bound is tight.
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the adjacency
+    indices : numpy array
+        CSR column indices of the adjacency
+    budget : int
+        maximal number of BFS
+    seed : int
+        seed of the random sources
+
+    Returns
+    -------
+        numpy array of int: lower bound of the eccentricity of each node
+        numpy array of int: upper bound of the eccentricity of each node
+    """
+    num_nodes = len(indptr) - 1
+    adjacency = sp.csr_matrix(
+        (np.ones(len(indices), dtype=np.int8), indices, indptr),
+        shape=(num_nodes, num_nodes)
+    )
+    rng = np.random.default_rng(seed)
+
+    lower = np.zeros(num_nodes, dtype=np.int64)
+    upper = np.full(num_nodes, np.iinfo(np.int64).max)
+
+    source = int(rng.integers(num_nodes))
+    for step in range(max(budget, 1)):
+        distance = shortest_path(adjacency, unweighted=True, indices=source)
+        if np.isinf(distance).any():
+            raise nx.NetworkXError(
+                'Found infinite path length because the graph is not connected'
+            )
+
+        distance = distance.astype(np.int64)
+        eccentricity = distance.max()
+        np.maximum(lower, np.maximum(distance, eccentricity - distance),
+                   out=lower)
+        np.minimum(upper, eccentricity + distance, out=upper)
+        lower[source] = upper[source] = eccentricity
+
+        unresolved = np.flatnonzero(lower < upper)
+        if len(unresolved) == 0:
+            break
+
+        if step == 0:
+            source = int(np.argmax(distance))
+            if lower[source] == upper[source]:
+                source = int(rng.choice(unresolved))
+        elif step % 3 == 1:
+            source = int(unresolved[np.argmax(upper[unresolved])])
+        elif step % 3 == 2:
+            source = int(unresolved[np.argmin(lower[unresolved])])
+        else:
+            source = int(rng.choice(unresolved))
+
+    return lower, upper
+
+
+def _eccentricity_metrics(indptr, indices, processes, mode, budget):
+    """
+    Compute the metrics derived from the eccentricities with their error
+    bound. In the approximate mode, the value reported for a metric is the
+    middle of the interval it is known to lie in and the error bound is
+    the half width of this interval. For the standard deviation, the error
+    bound is the root mean square of the half widths of the eccentricity
+    intervals, which bounds the deviation between the standard deviation
+    of the true eccentricities and the one of the interval middles.
+
+    Returns
+    -------
+        dict<string, float> metrics derived from the eccentricities
+        dict<string, float> error bound of each metric
+    """
+    num_nodes = len(indptr) - 1
+
+    if mode == 'exact':
+        eccentricity = get_eccentricity(indptr, indices, processes) / num_nodes
+        metric_dict = {
+            'diameter': float(eccentricity.max()),
+            'min_eccentricity': float(eccentricity.min()),
+            'max_eccentricity': float(eccentricity.max()),
+            'mean_eccentricity': float(np.mean(eccentricity)),
+            'stdev_eccentricity': float(np.std(eccentricity))
+        }
+        return metric_dict, dict.fromkeys(metric_dict, 0.0)
+
+    if mode != 'approx':
+        raise ValueError(f'Unknown metric mode {mode}, expected one of {METRIC_MODES}')
+
+    lower, upper = get_eccentricity_bounds(indptr, indices, budget)
+    lower = lower / num_nodes
+    upper = upper / num_nodes
+    middle = (lower + upper) / 2
+
+    intervals = {
+        'diameter': (lower.max(), upper.max()),
+        'min_eccentricity': (lower.min(), upper.min()),
+        'max_eccentricity': (lower.max(), upper.max()),
+        'mean_eccentricity': (np.mean(lower), np.mean(upper))
+    }
+    metric_dict = {k: float((a + b) / 2) for k, (a, b) in intervals.items()}
+    error_dict = {k: float((b - a) / 2) for k, (a, b) in intervals.items()}
+
+    metric_dict['stdev_eccentricity'] = float(np.std(middle))
+    error_dict['stdev_eccentricity'] = float(
+        np.sqrt(np.mean(((upper - lower) / 2) ** 2))
+    )
+
+    return metric_dict, error_dict
+
+
+def get_algebraic_connectivity(indptr, indices, weights):
+    """
+    Second smallest eigenvalue of the Laplacian matrix computed with a
+    sparse eigensolver. As in networkx, edge weights are taken in absolute
+    value and a disconnected graph has a null algebraic connectivity.
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the adjacency
+    indices : numpy array
+        CSR column indices of the adjacency
+    weights : numpy array
+        CSR weights of the adjacency
+
+    Returns
+    -------
+        float: algebraic connectivity
+    """
+    num_nodes = len(indptr) - 1
+    adjacency = sp.csr_matrix(
+        (np.abs(weights).astype(np.float64), indices, indptr),
+        shape=(num_nodes, num_nodes)
+    )
+    adjacency.eliminate_zeros()
+
+    if num_nodes < 2:
+        raise nx.NetworkXError('graph has less than two nodes.')
+    if sp.csgraph.connected_components(adjacency, directed=False)[0] > 1:
+        return 0.0
+
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    laplacian = (sp.diags(degree) - adjacency).tocsr()
+    if num_nodes == 2:
+        return 2.0 * float(laplacian[0, 0])
+
+    # The constant vector (eigenvalue 0) is moved above the spectrum so
+    # that the smallest eigenvalue is the algebraic connectivity
+    shift = 2 * degree.max() + 1
+
+    def matvec(x):
+        return laplacian @ x + shift * np.mean(x, axis=0) * np.ones_like(x)
+
+    operator = LinearOperator((num_nodes, num_nodes), matvec=matvec,
+                              dtype=np.float64)
+    v0 = np.random.default_rng(0).standard_normal(num_nodes)
+
+    return float(eigsh(operator, k=1, which='SA', tol=1e-10, v0=v0)[0][0])
+
+
+def get_csr_metrics(indptr, indices, weights, num_edges, processes=None,
+                    mode='exact', budget=APPROX_BUDGET, return_error=False):
+    """
+    Returns the metrics associated to a graph given by its symmetric CSR
+    adjacency. Eccentricity and diameter are derived from the same BFS, and
+    the metrics are the same as get_metrics_nx.
+
+    In the 'exact' mode, one BFS is run per node. In the 'approx' mode, at
+    most budget BFS are run and the metrics derived from the eccentricities
+    are estimated from bounds on the eccentricity of each node (see
+    get_eccentricity_bounds), the other metrics being exact.
+
+    Parameters
+    ----------
+    indptr : numpy array
+        CSR index pointer of the adjacency
+    indices : numpy array
+        CSR column indices of the adjacency
+    weights : numpy array
+        CSR weights of the adjacency
+    num_edges : int
+        number of edges of the graph
+    processes : int
+        number of processes running the BFS, all the cores are used if None
+    mode : string
+        'exact' or 'approx'
+    budget : int
+        number of BFS run by the approximate mode
+    return_error : bool
+        if True, the error bound of each metric is returned as well
+
+    Returns
+    -------
+        dict<string, float> store the metrics associated to the graph, the
+        metrics normalized by the maximum degree and the algebraic
+        connectivity being 0 for a graph with a single node
+        dict<string, float> error bound of each metric, if return_error
+    """
+    num_nodes = len(indptr) - 1
+    if num_nodes == 0:
+        raise ValueError('The graph has no node')
+
+    # Maximum possible degree, as nx.density graphs with a single node have
+    # null density and degree metrics
+    max_degree = max(num_nodes - 1, 1)
+
+    # Eccentricity normalized by the number of nodes
+    eccentricity_dict, eccentricity_error = _eccentricity_metrics(
+        indptr, indices, processes, mode, budget
+    )
+
+    # Degree and mean of neighbor degree of each node
+    degree = np.diff(indptr)
+    neighbor_degree_sum = np.bincount(
+        np.repeat(np.arange(num_nodes), degree),
+        weights=degree[indices], minlength=num_nodes
+    )
+    neighbor_degree = np.divide(
+        neighbor_degree_sum, degree,
+        out=np.zeros(num_nodes), where=degree > 0
+    )
+
+    metric_dict = {
+        # Density
+        'density': 2 * num_edges / (num_nodes * max_degree) if num_nodes > 1 else 0.0,
+
+        # Diameter of the graph normalized by the number of nodes
+        'diameter': eccentricity_dict['diameter'],
+
+        # Eccentricity: the eccentricity of a node v is the maximum distance
+        # from v to all other nodes in G
+        'min_eccentricity': eccentricity_dict['min_eccentricity'],
+        'max_eccentricity': eccentricity_dict['max_eccentricity'],
+        'mean_eccentricity': eccentricity_dict['mean_eccentricity'],
+        'stdev_eccentricity': eccentricity_dict['stdev_eccentricity'],
+
+        # Metrics relative to the degree of the nodes in the graph
+        # normalized by the maximum possible degree (number of nodes - 1)
+        'min_degree': degree.min() / max_degree,
+        'max_degree': degree.max() / max_degree,
+        'mean_degree': np.mean(degree) / max_degree,
+        'stdev_degree': np.std(degree) / max_degree,
+
+        # Average neighbor degree
+        'min_neighbor_degree': neighbor_degree.min() / max_degree,
+        'max_neighbor_degree': neighbor_degree.max() / max_degree,
+        'mean_neighbor_degree': np.mean(neighbor_degree) / max_degree,
+        'stdev_neighbor_degree': np.std(neighbor_degree) / max_degree,
+
+        # Algebraic connectivity
+        # Second smallest eigenvalue of the Laplacian matrix
+        'algebraic_connectivity': get_algebraic_connectivity(
+            indptr, indices, weights
+        ) if num_nodes > 1 else 0.0
+    }
+
+    if return_error:
+        error_dict = dict.fromkeys(metric_dict, 0.0)
+        error_dict.update(eccentricity_error)
+        return metric_dict, error_dict
+
+    return metric_dict
@@ -0,0 +1,110 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Cache of the metrics associated to instances, persisted in a JSON
+    file next to the instances
+=========
+"""
+
+# third party import
+import json
+import os
+
+# local import
+
+
+class MetricCache:
+    """
+    Metrics of instances keyed by the content hash of the instances
+    """
+
+    def __init__(self, file_path=None):
+        """
+        Build the cache, loading the entries already saved in file_path
+
+        Parameters
+        ----------
+        file_path : string
+            JSON file storing the cache, the cache is only kept in memory
+            if None
+        """
+        self.file_path = file_path
+        self._entries = {}
+        self._modified = False
+
+        if file_path is not None and os.path.exists(file_path):
+            with open(file_path, 'r') as fi:
+                self._entries = json.load(fi)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Get the metrics stored for a key
+
+        Parameters
+        ----------
+        key : string
+            content hash of the instance
+
+        Returns
+        -------
+            dict<string, float> metrics of the instance, None if missing
+        """
+        return self._entries.get(key)
+
+    def set(self, key, metrics):
+        """
+        Store the metrics of an instance
+
+        Parameters
+        ----------
+        key : string
+            content hash of the instance
+        metrics : dict<string, float>
+            metrics of the instance
+        """
+        self._entries[key] = {k: float(v) for k, v in metrics.items()}
+        self._modified = True
+
+    def update(self, metric_cache):
+        """
+        Copy the entries of another cache
+
+        Parameters
+        ----------
+        metric_cache : MetricCache
+            cache whose entries are copied
+        """
+        if len(metric_cache) > 0:
+            self._entries.update(metric_cache._entries)
+            self._modified = True
+
+    def save(self):
+        """
+        Write the cache to its file if it was modified. Entries written in
+        the meantime by other processes are kept.
+        """
+        if self.file_path is None or not self._modified:
+            return
+
+        entries = {}
+        if os.path.exists(self.file_path):
+            with open(self.file_path, 'r') as fi:
+                entries = json.load(fi)
+        entries.update(self._entries)
+
+        tmp_path = f'{self.file_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as fo:
+            json.dump(entries, fo, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.file_path)
+
+        self._entries = entries
+        self._modified = False
@@ -0,0 +1,209 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Instrumentation of the heuristic runs: duration of each phase (loading,
+    conversion, solver call, formatting, evaluation...) measured with
+    context manager timers, and optionally the peak memory of each phase
+    (tracemalloc) and a cProfile profile of the phases
+=========
+
+"""
+
+# third party import
+import contextlib
+import cProfile
+import pstats
+import timeit
+import tracemalloc
+
+# local import
+
+# Options of the instrumentation, see configure_instrumentation
+_INSTRUMENTATION = {
+    'memory': False,
+    'profile': False
+}
+
+# Profiler of the phases run in this process, when profiling is enabled
+_PROFILER = None
+
+# True if tracemalloc was started by the phases, it is then stopped when
+# the memory measures are disabled
+_TRACEMALLOC_STARTED = False
+
+
+def configure_instrumentation(memory=False, profile=False):
+    """
+    Enable the optional measures of the phases, both slow down the
+    heuristics and are disabled by default
+
+    Parameters
+    ----------
+    memory : bool
+        if True, the peak memory allocated by each phase is measured with
+        tracemalloc. Disabling it stops tracemalloc if it was started by
+        the phases.
+    profile : bool
+        if True, the phases are profiled with cProfile, see
+        get_profile_stats
+    """
+    global _PROFILER, _TRACEMALLOC_STARTED
+    _INSTRUMENTATION['memory'] = memory
+    _INSTRUMENTATION['profile'] = profile
+    if profile and _PROFILER is None:
+        _PROFILER = cProfile.Profile()
+
+    if not memory and _TRACEMALLOC_STARTED:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        _TRACEMALLOC_STARTED = False
+
+
+def get_instrumentation_config():
+    """
+    Options of the instrumentation, to configure worker processes
+
+    Returns
+    -------
+        dict: keyword arguments of configure_instrumentation
+    """
+    return dict(_INSTRUMENTATION)
+
+
+def get_profile_stats(sort='cumulative'):
+    """
+    Profile of the phases run in this process since profiling was enabled
+
+    Parameters
+    ----------
+    sort : string
+        sort key of the statistics
+
+    Returns
+    -------
+        pstats.Stats, None if profiling was never enabled
+    """
+    if _PROFILER is None:
+        return None
+    return pstats.Stats(_PROFILER).sort_stats(sort)
+
+
+class PhaseTimer:
+    """
+    Duration and peak memory of the phases of a run. Phases may be nested,
+    the time of a phase excludes the time of the phases it contains, so
+    that the phase times add up to the measured time. Only the Python
+    allocations are seen by tracemalloc, the memory of native solvers
+    (MQLib) and of remote ones (D-Wave) is not measured.
+    """
+
+    def __init__(self):
+        self.times = {}
+        self.peak_memory = {}
+        self._stack = []
+
+    @contextlib.contextmanager
+    def phase(self, name, memory=True):
+        """
+        Measure a phase, the times of a phase run several times are summed
+
+        Parameters
+        ----------
+        name : string
+            name of the phase
+        memory : bool
+            if False, the peak memory of the phase is not measured, for
+            phases spent in code tracemalloc does not see (solver calls)
+        """
+        global _TRACEMALLOC_STARTED
+        memory = memory and _INSTRUMENTATION['memory']
+        profile = _INSTRUMENTATION['profile'] and not self._stack
+
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _TRACEMALLOC_STARTED = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Peak of the parent phase before the reset
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        else:
+            current = 0
+
+        entry = {'children': 0., 'start_memory': current, 'peak': current}
+        self._stack.append(entry)
+        if profile:
+            _PROFILER.enable()
+        start_time = timeit.default_timer()
+
+        try:
+            yield
+        finally:
+            elapsed = timeit.default_timer() - start_time
+            if profile:
+                _PROFILER.disable()
+            self._stack.pop()
+
+            self.times[name] = self.times.get(name, 0.) + elapsed - entry['children']
+            if self._stack:
+                self._stack[-1]['children'] += elapsed
+
+            if memory:
+                peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0),
+                                             peak - entry['start_memory'])
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+
+    def add(self, measures):
+        """
+        Add the phases measured by another run
+
+        Parameters
+        ----------
+        measures : dict
+            measures of the phases, as returned by to_dict (or the 'time'
+            entry of a result)
+        """
+        for name, elapsed in measures.get('phase_time', {}).items():
+            self.times[name] = self.times.get(name, 0.) + elapsed
+        for name, peak in measures.get('peak_memory', {}).items():
+            self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak)
+
+    def to_dict(self):
+        """
+        Measures of the phases, stored in the 'time' entry of the results
+
+        Returns
+        -------
+            dict with keys:
+                'phase_time': duration of each phase, in seconds
+                'peak_memory': peak memory allocated by each phase, in
+                bytes (only if memory measures are enabled, and not for
+                the solver phase)
+        """
+        measures = {'phase_time': dict(self.times)}
+        if self.peak_memory:
+            measures['peak_memory'] = dict(self.peak_memory)
+        return measures
+
+    def attach(self, res_dict):
+        """
+        Store the measures of the phases in the 'time' entry of a result
+
+        Parameters
+        ----------
+        res_dict : dict
+            result of a heuristic
+
+        Returns
+        -------
+            dict: the result
+        """
+        res_dict['time'].update(self.to_dict())
+        return res_dict
@@ -22,6 +22,20 @@ def log_debug(msg):
     logging.getLogger().debug(msg)
 
 
+def log_info(msg):
+    """
+    Write the information message msg in the logger
+    """
+    logging.getLogger().info(msg)
+
+
+def log_warning(msg):
+    """
+    Write the warning message msg in the logger
+    """
+    logging.getLogger().warning(msg)
+
+
 def create_logger():
     """
     Creation of the logging device, ignoring with logging level set to
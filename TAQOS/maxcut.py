@@ -13,14 +13,20 @@ Description:
 
 # local import
 from TAQOS.heuristic.max_cut_heuristics import get_maxcut_heuristic, \
-    run_maxcut_heuristic
-from TAQOS.problem.max_cut.db_manager import list_instance_list, \
-    load_maxcut_instance_list, save_maxcut_instance_list
+    register_heuristic, run_maxcut_heuristic, run_maxcut_heuristic_batch, \
+    run_maxcut_heuristic_seeds
+from TAQOS.logger.instrumentation import configure_instrumentation, \
+    get_profile_stats
+from TAQOS.problem.max_cut.campaign import run_campaign
+from TAQOS.problem.max_cut.db_manager import convert_maxcut_instance_list, \
+    iter_maxcut_instances, list_instance_list, load_maxcut_instance_list, \
+    save_maxcut_instance_list
 from TAQOS.problem.max_cut.instance_generation import \
-    generate_dwave_instance_group
+    generate_dwave_instance_group, write_dwave_instance_group
+from TAQOS.problem.max_cut.result_store import ResultStore
 
 
-def load_instance_list(group_name):
+def load_instance_list(group_name, lazy=False):
     """
     Load the instance list corresponding to a group name
 
@@ -28,12 +34,31 @@ def load_instance_list(group_name):
     ----------
     group_name : string
         name of the group
+    lazy : bool
+        if True, instances are only loaded when accessed and only a few
+        of them are kept in memory
 
     Returns
     -------
         InstanceList list of instances corresponding to the group
     """
-    return load_maxcut_instance_list(group_name)
+    return load_maxcut_instance_list(group_name, lazy=lazy)
+
+
+def iter_instances(group_name):
+    """
+    Iterate over the instances of a group, loading one instance at a time
+
+    Parameters
+    ----------
+    group_name : string
+        name of the group
+
+    Returns
+    -------
+        generator of instances sorted by id
+    """
+    return iter_maxcut_instances(group_name)
 
 
 def save_instance_list(instance_list):
@@ -50,6 +75,128 @@ def save_instance_list(instance_list):
     save_maxcut_instance_list(instance_list)
 
 
+def convert_instance_list(group_name=None):
+    """
+    Convert the text edge lists of a group (or of every group) to the
+    binary format, which is much faster to load
+
+    Parameters
+    ----------
+    group_name : string
+        name of the group, every group is converted if None
+
+    Returns
+    -------
+        int: number of converted instances
+    """
+    return convert_maxcut_instance_list(group_name)
+
+
+def select_instance_subset(instance_list, k, epsilon, group_name, processes=1):
+    """
+    Select the k instances of a list maximizing the coverage of the metrics
+
+    Parameters
+    ----------
+    instance_list : MaxcutInstanceList
+        candidate instances
+    k : int
+        number of instances to select
+    epsilon : float
+        coverage factor
+    group_name : string
+        name of the group of selected instances
+    processes : int
+        number of processes computing the metrics of the instances, all
+        the cores if None
+
+    Returns
+    -------
+        MaxcutInstanceList: selected instances, which can be saved with
+        save_instance_list
+    """
+    return instance_list.select_coverage_subset(k, epsilon, group_name,
+                                                processes=processes)
+
+
+def run_benchmark_campaign(group_name, heuristic_grid, **kwargs):
+    """
+    Run every heuristic of a grid with every parameter setting on every
+    instance of a group. The campaign can be interrupted and restarted: the
+    finished cells are checkpointed and skipped when it is run again.
+    Progress is logged at the INFO level, and a summary of the time spent
+    in each phase of the runs is written next to the checkpoint file.
+
+    Parameters
+    ----------
+    group_name : string
+        name of the group
+    heuristic_grid : dict<string, dict<string, list>>
+        values of the parameters of each heuristic, for instance:
+            {'BASELINE': {'rtsec': [1, 10]},
+             'DW_Adv2_wo_embedding': {'annealing_time': [20, 100]}}
+    kwargs:
+        checkpoint_file, processes, max_concurrency, result_store,
+        sampler and post_processing, see campaign.run_campaign
+
+    Returns
+    -------
+        dict<string, dict>: record of every completed cell
+    """
+    return run_campaign(group_name, heuristic_grid, **kwargs)
+
+
+def open_result_store(file_path=None):
+    """
+    Open the store of the results of the heuristics
+
+    Parameters
+    ----------
+    file_path : string
+        SQLite file, the store of the maxcut database is used if None
+
+    Returns
+    -------
+        ResultStore
+    """
+    return ResultStore(file_path)
+
+
+def set_instrumentation(memory=False, profile=False):
+    """
+    Enable the optional measures of the phases of the heuristic runs, the
+    duration of each phase being always stored in result['time']
+
+    Parameters
+    ----------
+    memory : bool
+        if True, the peak memory of each phase is stored in
+        result['time']['peak_memory'] (measured with tracemalloc, which
+        does not see the memory of the solvers: the solver phase is not
+        measured)
+    profile : bool
+        if True, the phases run in this process are profiled with cProfile,
+        see get_profile
+    """
+    configure_instrumentation(memory=memory, profile=profile)
+
+
+def get_profile(sort='cumulative'):
+    """
+    Profile of the phases run since profiling was enabled
+
+    Parameters
+    ----------
+    sort : string
+        sort key of the statistics
+
+    Returns
+    -------
+        pstats.Stats, None if profiling was never enabled
+    """
+    return get_profile_stats(sort)
+
+
 def list_instances():
     """
     List the available group of instances
@@ -72,7 +219,33 @@ def list_heuristics():
     return get_maxcut_heuristic()
 
 
-def run_heuristic(name, instance, *args, **kwargs):
+def add_heuristic(name, family, run, **kwargs):
+    """
+    Make a new heuristic available to run_heuristic, run_heuristic_batch
+    and run_benchmark_campaign
+
+    Parameters
+    ----------
+    name : string
+        name of the heuristic
+    family : string
+        family of the heuristic ('mqlib', 'dwave', 'local' or a new one)
+    run : callable
+        function run(name, instance, timer=None, **parameters) returning a
+        result dictionary
+    kwargs:
+        description, defaults, options, run_batch, thread_safe,
+        process_safe and anytime_parameter, see register_heuristic
+
+    Example
+    -------
+        add_heuristic('MY_SA', 'local', run_my_sa, process_safe=True,
+                      defaults={'num_reads': 100})
+    """
+    register_heuristic(name, family, run, **kwargs)
+
+
+def run_heuristic(name, instance, *args, result_store=None, group_name=None, **kwargs):
     """
     Run classical or quantum heuristic and return the
 
@@ -96,19 +269,32 @@ def run_heuristic(name, instance, *args, **kwargs):
             'DW_Adv6.1_wo_embedding': D-Wave Advantage 6.1 without embedding step
             'DW_Adv2_wo_embedding': D-Wave Advantage 2 without embedding step
 
+        Local heuristics, run like the quantum heuristics:
+            'LOCAL_SA': simulated annealing, see heuristic/sa_sampler.py
+
     instance: MaxCutInstance
         instance being solved
 
+    result_store: ResultStore
+        store the result is appended to, if given
+
+    group_name: string
+        group of the instance, required to store the result
+
     kwargs:
         For classical heuristics:
-            rtsec: int
-                maximal running time in seconds
+            rtsec: int or list<int>
+                maximal running time in seconds. A list of running times
+                is covered by a single run, a list of results being
+                returned (see run_mql_heuristic)
             see env.py for default values being used
 
         For DW heuristics:
             annealing_time: int
                 annealing time in micro seconds
             num_reads: number of shots
+            post_processing: if True, the samples are improved by a
+                steepest descent, reported in solution['post_processed']
             see env.py for default values being used
 
     Returns
@@ -117,12 +303,122 @@ def run_heuristic(name, instance, *args, **kwargs):
             'time': details about the running time of the heuristic
             'parameter_setting': heuristic settings
             'solution': details about the solution
-            'extra': extra information specific to the heuristic run
+            'extra': extra information specific to the heuristic run, the
+                unique samples of DW heuristics with their vartype
+        the samples being bit-packed, see result_export.py for the
+        conversion to JSON
+    """
+    if result_store is not None and group_name is None:
+        raise ValueError('The group name of the instance is required to store the result')
+
+    res_dict = run_maxcut_heuristic(name, instance, *args, **kwargs)
+
+    if result_store is not None:
+        res_list = res_dict if isinstance(res_dict, list) else [res_dict]
+        result_store.append_many(group_name, [(instance.id, r) for r in res_list])
+
+    return res_dict
+
+
+def run_heuristic_seeds(name, instance, nb_seeds, result_store=None, group_name=None,
+                        **kwargs):
+    """
+    Run independent seeds of a classical heuristic in parallel, to compare
+    its statistics with the reads of the DW heuristics
+
+    Parameters
+    ----------
+    name: string
+        name of a classical heuristic, see run_heuristic
+
+    instance: MaxCutInstance
+        instance being solved
+
+    nb_seeds: int
+        number of runs
+
+    result_store: ResultStore
+        store the aggregated result is appended to, if given
+
+    group_name: string
+        group of the instance, required to store the result
+
+    kwargs:
+        rtsec: int or list<int>
+            maximal running time of each run in seconds. A list of running
+            times is covered by a single run per seed, a list of results
+            being returned (one per running time)
+        seed: int
+            seed from which the seeds of the runs are drawn
+        processes: int
+            number of processes, all the cores are used if None
+
+    Returns
+    -------
+        dictionary storing the best solution and the best, worst, mean,
+        median and standard deviation of the energies of the runs, the
+        result of each run being in extra['seed_results'] (list of
+        dictionaries if rtsec is a list)
+    """
+    if result_store is not None and group_name is None:
+        raise ValueError('The group name of the instance is required to store the result')
+
+    res_dict = run_maxcut_heuristic_seeds(name, instance, nb_seeds, **kwargs)
+
+    if result_store is not None:
+        res_list = res_dict if isinstance(res_dict, list) else [res_dict]
+        result_store.append_many(group_name, [(instance.id, r) for r in res_list])
+
+    return res_dict
+
+
+def run_heuristic_batch(name, instances, param_grid=None, result_store=None,
+                        group_name=None, **kwargs):
     """
-    return run_maxcut_heuristic(name, instance, *args, **kwargs)
+    Run a heuristic on several instances and parameter settings. Quantum
+    problems are submitted together to a single connection to the solver,
+    up to DW_MAX_CONCURRENCY (env.py) at a time.
 
+    Parameters
+    ----------
+    name : string
+        name of the heuristic, see run_heuristic
+    instances : list<MaxCutInstance>
+        instances being solved
+    param_grid : dict<string, list>
+        values of each parameter (for instance {'annealing_time': [20,
+        100]}), every combination is run
+    kwargs:
+        For DW heuristics:
+            max_concurrency: maximal number of pending problems
+            sampler: sampler replacing the D-Wave solver, for tests
 
-def generate_instance_group(group_name, solver_name, edge_weights, nb_instance):
+    Returns
+    -------
+        generator of (instance, result dictionary) as the results are
+        received
+    """
+    if result_store is not None and group_name is None:
+        raise ValueError('The group name of the instances is required to store the results')
+
+    results = run_maxcut_heuristic_batch(name, instances, param_grid, **kwargs)
+    if result_store is None:
+        return results
+
+    return _store_results(results, result_store, group_name)
+
+
+def _store_results(results, result_store, group_name):
+    """
+    Append the results of a batch to a store as they are received
+    """
+    for instance, res_dict in results:
+        result_store.append(group_name, instance.id, res_dict)
+        yield instance, res_dict
+
+
+def generate_instance_group(group_name, solver_name, edge_weights, nb_instance,
+                            offline=False, seed=None):
     """
     Generate an instance group based on D-Wave chip topology
 
@@ -135,11 +431,41 @@ def generate_instance_group(group_name, solver_name, edge_weights, nb_instance):
         ['DW_2000Q_6', 'Advantage_system4.1'
          'Advantage_system6.1', 'Advantage2_prototype1.1']
     edge_weights : distribution of weights
+        list of values, dict<value, probability> or function (rng, size)
+        drawing the weights from a numpy Generator
     nb_instance : int
         number of instances
+    offline : bool
+        if True, the D-Wave cloud is never reached: the cached hardware
+        graph of the solver, or its ideal topology, is used
+    seed : int
+        seed of the group, the same seed generates the same instances
 
     Returns
     -------
         InstanceList object that stores the list of instances
     """
-    return generate_dwave_instance_group(group_name, solver_name, edge_weights, nb_instance)
+    return generate_dwave_instance_group(group_name, solver_name, edge_weights, nb_instance,
+                                         offline, seed)
+
+
+def write_instance_group(group_name, solver_name, edge_weights, nb_instance,
+                         offline=False, seed=None, processes=None):
+    """
+    Generate an instance group based on D-Wave chip topology and write it
+    directly in the database, for groups too large to be kept in memory
+
+    Parameters
+    ----------
+    see generate_instance_group
+    processes : int
+        number of processes generating the instances, all the cores are
+        used if None
+
+    Returns
+    -------
+        InstanceList object that stores the list of instances, loaded
+        lazily
+    """
+    return write_dwave_instance_group(group_name, solver_name, edge_weights, nb_instance,
+                                      offline, seed, processes)
@@ -15,6 +15,8 @@ Description:
 
 
 class Instance:
+    __slots__ = ('id',)
+
     def __init__(self, id):
         """
         Create an instance
@@ -0,0 +1,438 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Benchmark campaigns: every heuristic of a grid is run with every
+    parameter setting on every instance of a group. Classical heuristics
+    run on a process pool, quantum heuristics are submitted through a
+    concurrency limited batch, and each finished cell (instance, heuristic,
+    parameters) is checkpointed to a JSON lines file so that a restarted
+    campaign skips the completed cells.
+=========
+"""
+
+# third party import
+import contextlib
+import json
+import os
+import timeit
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# local import
+from TAQOS.env import DW_MAX_CONCURRENCY
+from TAQOS.heuristic.max_cut_heuristics import expand_heuristic_grid, \
+    get_batch_options, get_execution_strategy, get_heuristic_entry, \
+    get_heuristic_function, group_anytime_parameters, run_heuristic_group
+from TAQOS.heuristic.result_export import result_from_json, result_to_json
+from TAQOS.logger.instrumentation import PhaseTimer, \
+    configure_instrumentation, get_instrumentation_config
+from TAQOS.logger.logging_device import log_info
+from TAQOS.problem.max_cut.db_manager import load_maxcut_instance_list
+from TAQOS.problem.max_cut.result_store import MAXCUT_RESULTS_PATH
+
+# Name of the checkpoint file of a campaign, in the result directory of
+# the group
+CAMPAIGN_CHECKPOINT_FILE = 'campaign.jsonl'
+
+# Name of the summary of the phases of a campaign, written next to its
+# checkpoint file
+CAMPAIGN_SUMMARY_FILE = 'campaign_summary.json'
+
+# Instances of the group of the campaign, loaded lazily by each worker
+_CAMPAIGN_WORKER_INSTANCES = None
+
+
+def get_cell_key(instance_id, heuristic, parameters):
+    """
+    Key identifying a cell of a campaign
+
+    Parameters
+    ----------
+    instance_id : int
+        id of the instance
+    heuristic : string
+        name of the heuristic
+    parameters : dict
+        parameters of the heuristic
+
+    Returns
+    -------
+        string
+    """
+    return json.dumps([int(instance_id), heuristic, parameters], sort_keys=True)
+
+
+def load_campaign_results(checkpoint_file):
+    """
+    Read the cells completed by a campaign
+
+    Parameters
+    ----------
+    checkpoint_file : string
+        checkpoint file of the campaign
+
+    Returns
+    -------
+        dict<string, dict>: record of each completed cell, by cell key, with
+        instance_id, heuristic, parameters and result
+    """
+    records = {}
+    if not os.path.exists(checkpoint_file):
+        return records
+
+    with open(checkpoint_file, 'r') as fi:
+        for line in fi:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Line truncated by an interrupted campaign
+                continue
+
+            record['result'] = result_from_json(record['result'])
+            key = get_cell_key(record['instance_id'], record['heuristic'],
+                               record['parameters'])
+            records[key] = record
+
+    return records
+
+
+def _drop_partial_record(checkpoint_file):
+    """
+    Remove the last line of a checkpoint file if it was truncated by an
+    interrupted campaign, so that new records start on a new line
+    """
+    if not os.path.exists(checkpoint_file):
+        return
+
+    with open(checkpoint_file, 'rb+') as fo:
+        content = fo.read()
+        if content and not content.endswith(b'\n'):
+            fo.truncate(content.rfind(b'\n') + 1)
+
+
+class _CampaignProgress:
+    """
+    Checkpoint writer and progress report of a campaign. It is only used
+    by the main thread, which owns the connection of the result store.
+    """
+
+    def __init__(self, checkpoint_file, nb_cells, group_name, result_store):
+        self.checkpoint_file = checkpoint_file
+        self.nb_cells = nb_cells
+        self.group_name = group_name
+        self.result_store = result_store
+        self.nb_done = 0
+        self.start_time = timeit.default_timer()
+
+    def add(self, instance_id, heuristic, parameters, res_dict):
+        """
+        Checkpoint a finished cell and report the progress
+        """
+        record = {
+            'instance_id': int(instance_id),
+            'heuristic': heuristic,
+            'parameters': parameters,
+            'result': result_to_json(res_dict)
+        }
+
+        with open(self.checkpoint_file, 'a') as fo:
+            fo.write(json.dumps(record) + '\n')
+
+        if self.result_store is not None:
+            self.result_store.append(self.group_name, instance_id, res_dict)
+
+        self.nb_done += 1
+        elapsed = timeit.default_timer() - self.start_time
+        throughput = self.nb_done / elapsed if elapsed > 0 else 0.
+        remaining = (self.nb_cells - self.nb_done) / throughput if throughput > 0 else 0.
+        log_info(f'Campaign {self.group_name}: {self.nb_done}/{self.nb_cells} cells '
+                 f'({heuristic} on instance {instance_id}), '
+                 f'{throughput:.3f} cells/s, {remaining:.0f} s remaining')
+
+
+def get_campaign_summary(records):
+    """
+    Summary of the phases measured by the cells of a campaign, by heuristic
+
+    Parameters
+    ----------
+    records : dict<string, dict>
+        completed cells, see load_campaign_results
+
+    Returns
+    -------
+        dict<string, dict>: for each heuristic, the number of cells and for
+        each phase its total and mean time (in seconds) and its largest
+        peak memory (in bytes, if measured). The cells derived from a
+        single MQLib run (see run_mql_heuristic) each report the measures
+        of the whole run.
+    """
+    timers = {}
+    nb_cells = {}
+    for record in records.values():
+        heuristic = record['heuristic']
+        timers.setdefault(heuristic, PhaseTimer()).add(record['result'].get('time', {}))
+        nb_cells[heuristic] = nb_cells.get(heuristic, 0) + 1
+
+    summary = {}
+    for heuristic, timer in timers.items():
+        phases = {}
+        for name, elapsed in sorted(timer.times.items()):
+            phases[name] = {
+                'total_time': elapsed,
+                'mean_time': elapsed / nb_cells[heuristic]
+            }
+            if name in timer.peak_memory:
+                phases[name]['peak_memory'] = timer.peak_memory[name]
+
+        summary[heuristic] = {
+            'nb_cells': nb_cells[heuristic],
+            'phases': phases
+        }
+
+    return summary
+
+
+def export_campaign_summary(checkpoint_file, summary_file=None):
+    """
+    Write the summary of the phases of a campaign, see get_campaign_summary
+
+    Parameters
+    ----------
+    checkpoint_file : string
+        checkpoint file of the campaign
+    summary_file : string
+        JSON file written, CAMPAIGN_SUMMARY_FILE in the directory of the
+        checkpoint file if None
+
+    Returns
+    -------
+        dict<string, dict>: summary of the campaign
+    """
+    if summary_file is None:
+        summary_file = os.path.join(os.path.dirname(os.path.abspath(checkpoint_file)),
+                                    CAMPAIGN_SUMMARY_FILE)
+
+    summary = get_campaign_summary(load_campaign_results(checkpoint_file))
+    with open(summary_file, 'w') as fo:
+        json.dump(summary, fo, indent=2)
+
+    return summary
+
+
+def _set_campaign_worker_group(group_name, instrumentation):
+    """
+    Initializer of the campaign worker processes
+    """
+    global _CAMPAIGN_WORKER_INSTANCES
+    configure_instrumentation(**instrumentation)
+    _CAMPAIGN_WORKER_INSTANCES = load_maxcut_instance_list(group_name, lazy=True)
+
+
+def _campaign_worker(position, entry, param_group):
+    """
+    Run a heuristic on an instance in a worker process, for parameter
+    settings only differing by their anytime parameter (see
+    group_anytime_parameters)
+
+    Returns
+    -------
+        list of dictionaries storing the result of each parameter setting
+    """
+    timer = PhaseTimer()
+    with timer.phase('loading'):
+        instance = _CAMPAIGN_WORKER_INSTANCES[position]
+
+    return run_heuristic_group(entry, instance, param_group, timer)
+
+
+def _load_campaign_jobs(instance_list, cell_list):
+    """
+    Jobs of the cells of a campaign run by a batch entry point, the
+    instances being loaded when the jobs are submitted
+    """
+    for position, parameters in cell_list:
+        timer = PhaseTimer()
+        with timer.phase('loading'):
+            instance = instance_list[position]
+        yield instance, parameters, timer
+
+
+def _get_campaign_runs(entry, cell_list):
+    """
+    Runs of the cells of a heuristic run one instance at a time: cells of
+    the same instance only differing by the anytime parameter of the
+    heuristic are covered by a single run
+
+    Returns
+    -------
+        list of (position in the group, list of parameter settings)
+    """
+    param_lists = {}
+    for position, parameters in cell_list:
+        param_lists.setdefault(position, []).append(parameters)
+
+    return [(position, param_group) for position, param_list in param_lists.items()
+            for param_group in group_anytime_parameters(entry, param_list)]
+
+
+def _add_pool_results(pending, progress, wait=False):
+    """
+    Checkpoint the results of the runs of the pool which are done, the
+    errors of the worker processes being raised
+
+    Parameters
+    ----------
+    pending : dict<Future, (string, int, list<dict>)>
+        heuristic, instance id and parameter settings of each pending run,
+        the collected runs are removed
+    progress : _CampaignProgress
+        checkpoint writer of the campaign
+    wait : bool
+        if True, wait for every pending run
+    """
+    done = as_completed(list(pending)) if wait else [f for f in list(pending) if f.done()]
+    for future in done:
+        heuristic, instance_id, param_group = pending.pop(future)
+        for parameters, res_dict in zip(param_group, future.result()):
+            progress.add(instance_id, heuristic, parameters, res_dict)
+
+
+def run_campaign(group_name, heuristic_grid, checkpoint_file=None, processes=None,
+                 max_concurrency=DW_MAX_CONCURRENCY, result_store=None, sampler=None,
+                 post_processing=False):
+    """
+    Run a benchmark campaign over a group of instances. Each heuristic is
+    run with the strategy given by its registration (see
+    get_execution_strategy): the jobs of heuristics with a thread safe
+    batch entry point (D-Wave solvers) are all given to it, while the
+    heuristics which can run in worker processes (MQLib, local samplers)
+    run on a process pool, the other ones being run last in this process.
+
+    Parameters
+    ----------
+    group_name : string
+        name of the group
+    heuristic_grid : dict<string, dict<string, list>>
+        values of the parameters of each heuristic, every combination is
+        run, for instance:
+            {'BASELINE': {'rtsec': [1, 10]},
+             'DW_Adv2_wo_embedding': {'annealing_time': [20, 100]}}
+    checkpoint_file : string
+        JSON lines file storing the finished cells, CAMPAIGN_CHECKPOINT_FILE
+        in the result directory of the group if None
+    processes : int
+        number of worker processes, all the cores are used if None
+    max_concurrency : int
+        maximal number of quantum problems waiting for their results
+    result_store : ResultStore
+        store the results are appended to, if given
+    sampler : dimod Sampler
+        sampler used instead of the D-Wave solvers, for tests. Heuristics
+        with a batch entry point are then run by it in this process.
+    post_processing : bool
+        if True, the samples of the heuristics accepting a post_processing
+        parameter (D-Wave and local samplers) are improved by a steepest
+        descent, see format_dwave_results
+
+    Returns
+    -------
+        dict<string, dict>: record of every completed cell, see
+        load_campaign_results. The summary of the phases of the cells is
+        written next to the checkpoint file, see export_campaign_summary.
+    """
+    entries = {heuristic: get_heuristic_entry(heuristic) for heuristic in heuristic_grid}
+
+    if checkpoint_file is None:
+        os.makedirs(os.path.join(MAXCUT_RESULTS_PATH, group_name), exist_ok=True)
+        checkpoint_file = os.path.join(MAXCUT_RESULTS_PATH, group_name,
+                                       CAMPAIGN_CHECKPOINT_FILE)
+
+    instance_list = load_maxcut_instance_list(group_name, lazy=True)
+    _drop_partial_record(checkpoint_file)
+    completed = load_campaign_results(checkpoint_file)
+
+    # Cells left to run, by heuristic: (position in the group, parameters).
+    # Parameters are completed with the default values of the heuristic.
+    cells = {}
+    for heuristic, param_grid in heuristic_grid.items():
+        param_list = expand_heuristic_grid(heuristic, param_grid)
+        if post_processing and 'post_processing' in entries[heuristic]['options']:
+            param_list = [dict(params, post_processing=True) for params in param_list]
+        cells[heuristic] = [
+            (position, parameters)
+            for parameters in param_list
+            for position, instance_id in enumerate(instance_list.ids)
+            if get_cell_key(instance_id, heuristic, parameters) not in completed
+        ]
+
+    nb_cells = sum(len(cell_list) for cell_list in cells.values())
+    log_info(f'Campaign {group_name}: {nb_cells} cells to run, '
+             f'{len(completed)} already completed')
+
+    progress = _CampaignProgress(checkpoint_file, nb_cells, group_name, result_store)
+
+    strategies = {}
+    for heuristic, entry in entries.items():
+        strategy = get_execution_strategy(heuristic)
+        if sampler is not None and entry['run_batch'] is not None:
+            strategy = 'batch'
+        strategies.setdefault(strategy, []).append(heuristic)
+        log_info(f'Campaign {group_name}: {heuristic} run with the {strategy} strategy')
+
+    pool_runs = [(heuristic, position, param_group)
+                 for heuristic in strategies.get('pool', [])
+                 for position, param_group in _get_campaign_runs(entries[heuristic],
+                                                                 cells[heuristic])]
+
+    # The worker processes are only started if some runs need them
+    processes = os.cpu_count() if processes is None else processes
+    if pool_runs:
+        pool = ProcessPoolExecutor(max_workers=max(1, min(processes, len(pool_runs))),
+                                   initializer=_set_campaign_worker_group,
+                                   initargs=(group_name, get_instrumentation_config()))
+    else:
+        pool = contextlib.nullcontext()
+
+    with pool as executor:
+        # Runs of the pool go on while the batches are submitted, their
+        # results are collected by this thread between the other cells
+        pending = {}
+        for heuristic, position, param_group in pool_runs:
+            future = executor.submit(_campaign_worker, position, entries[heuristic],
+                                     param_group)
+            pending[future] = (heuristic, instance_list.ids[position], param_group)
+
+        for heuristic in strategies.get('batch', []) + strategies.get('sequential', []):
+            entry = entries[heuristic]
+            run_batch = get_heuristic_function(entry, 'run_batch')
+
+            if run_batch is not None:
+                jobs = _load_campaign_jobs(instance_list, cells[heuristic])
+                options = get_batch_options(run_batch, max_concurrency=max_concurrency,
+                                            sampler=sampler)
+                for job, res_dict in run_batch(heuristic, jobs, **options):
+                    progress.add(job[0].id, heuristic, job[1], res_dict)
+                    _add_pool_results(pending, progress)
+                continue
+
+            for position, param_group in _get_campaign_runs(entry, cells[heuristic]):
+                timer = PhaseTimer()
+                with timer.phase('loading'):
+                    instance = instance_list[position]
+                res_list = run_heuristic_group(entry, instance, param_group, timer)
+                for parameters, res_dict in zip(param_group, res_list):
+                    progress.add(instance.id, heuristic, parameters, res_dict)
+                _add_pool_results(pending, progress)
+
+        _add_pool_results(pending, progress, wait=True)
+
+    summary = export_campaign_summary(checkpoint_file)
+    for heuristic, heuristic_summary in summary.items():
+        phases = ', '.join(f'{name} {phase["mean_time"]:.3f} s'
+                           for name, phase in heuristic_summary['phases'].items())
+        log_info(f'Campaign {group_name}: {heuristic} mean time per cell: {phases}')
+
+    return load_campaign_results(checkpoint_file)
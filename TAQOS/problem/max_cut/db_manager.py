@@ -11,17 +11,241 @@ Description:
 # third party import
 import glob
 import os
-import networkx as nx
+import numpy as np
 
 # local import
 from TAQOS.env import PROJECT_PATH
-from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance
-from TAQOS.problem.max_cut.maxcut_instance_list import MaxcutInstanceList
-from optimization_problems.common.logging_device import log_warning
+from TAQOS.instance_metrics.metric_cache import MetricCache
+from TAQOS.logger.logging_device import log_warning
+from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance, \
+    compact_weights
+from TAQOS.problem.max_cut.maxcut_instance_list import LAZY_CACHE_SIZE, \
+    LazyMaxcutInstanceList, MaxcutInstanceList
 
 # Path where the instances are saved
 MAXCUT_DB_PATH = os.path.join(PROJECT_PATH, 'db', 'maxcut_db')
 
+# Name of the file caching the metrics of the instances of a group
+METRIC_CACHE_FILE = 'MaxcutMetrics.json'
+
+# Binary instance files: a fixed size header followed by the node labels
+# (int64), the edge endpoints given as indices in the node labels (int32)
+# and the edge weights (int32 or float64, as stated in the header)
+BINARY_MAGIC = b'TAQOSMC1'
+BINARY_HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('num_nodes', '<u8'),
+    ('num_edges', '<u8'),
+    ('weight_dtype', 'S8')
+])
+
+
+def write_maxcut_instance_binary(file_path, node_ids, edge_u, edge_v, weights):
+    """
+    Write an instance in the binary format
+
+    Parameters
+    ----------
+    file_path : string
+        path of the binary file
+    node_ids : numpy array of int
+        label of each node
+    edge_u : numpy array of int
+        index (in node_ids) of the first endpoint of each edge
+    edge_v : numpy array of int
+        index (in node_ids) of the second endpoint of each edge
+    weights : numpy array
+        weight of each edge
+    """
+    weights = np.asarray(weights)
+    weight_dtype = '<i4' if np.issubdtype(weights.dtype, np.integer) else '<f8'
+
+    header = np.zeros(1, dtype=BINARY_HEADER)
+    header['magic'] = BINARY_MAGIC
+    header['num_nodes'] = len(node_ids)
+    header['num_edges'] = len(weights)
+    header['weight_dtype'] = weight_dtype.encode()
+
+    with open(file_path, 'wb') as fo:
+        fo.write(header.tobytes())
+        fo.write(np.asarray(node_ids, dtype='<i8').tobytes())
+        fo.write(np.asarray(edge_u, dtype='<i4').tobytes())
+        fo.write(np.asarray(edge_v, dtype='<i4').tobytes())
+        fo.write(weights.astype(weight_dtype).tobytes())
+
+
+def read_maxcut_instance_binary(file_path):
+    """
+    Open an instance stored in the binary format. The arrays are memory
+    mapped views on the file, nothing is read before being used.
+
+    Parameters
+    ----------
+    file_path : string
+        path of the binary file
+
+    Returns
+    -------
+        node labels, edge endpoints (first and second) and edge weights
+        arrays
+    """
+    raw = np.memmap(file_path, dtype=np.uint8, mode='r')
+    header = raw[:BINARY_HEADER.itemsize].view(BINARY_HEADER)[0]
+
+    if header['magic'] != BINARY_MAGIC:
+        raise ValueError(f'{file_path} is not a maxcut binary instance')
+
+    num_nodes = int(header['num_nodes'])
+    num_edges = int(header['num_edges'])
+    weight_dtype = np.dtype(header['weight_dtype'].decode())
+
+    arrays = []
+    offset = BINARY_HEADER.itemsize
+    for dtype, size in [(np.dtype('<i8'), num_nodes),
+                        (np.dtype('<i4'), num_edges),
+                        (np.dtype('<i4'), num_edges),
+                        (weight_dtype, num_edges)]:
+        end = offset + dtype.itemsize * size
+        arrays.append(raw[offset:end].view(dtype))
+        offset = end
+
+    return tuple(arrays)
+
+
+def read_maxcut_instance_text(file_path):
+    """
+    Read an instance stored as a text weighted edge list, nodes are
+    ordered by first appearance in the file
+
+    Parameters
+    ----------
+    file_path : string
+        path of the text file
+
+    Returns
+    -------
+        node labels, edge endpoints (first and second) and edge weights
+        arrays
+    """
+    data = np.loadtxt(file_path, ndmin=2)
+    if data.size == 0:
+        data = np.zeros((0, 3))
+
+    labels, first, inverse = np.unique(
+        data[:, :2].astype(np.int64).ravel(),
+        return_index=True, return_inverse=True
+    )
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    edges = rank[inverse.ravel()].reshape(-1, 2).astype(np.int32)
+
+    return labels[order], edges[:, 0], edges[:, 1], compact_weights(data[:, 2])
+
+
+def write_maxcut_instance_text(file_path, node_ids, edge_u, edge_v, weights):
+    """
+    Write an instance as a text weighted edge list
+
+    Parameters
+    ----------
+    file_path : string
+        path of the text file
+    node_ids : numpy array of int
+        label of each node
+    edge_u : numpy array of int
+        index (in node_ids) of the first endpoint of each edge
+    edge_v : numpy array of int
+        index (in node_ids) of the second endpoint of each edge
+    weights : numpy array
+        weight of each edge
+    """
+    node_ids = np.asarray(node_ids)
+    with open(file_path, 'w') as fo:
+        for u, v, w in zip(node_ids[edge_u].tolist(),
+                           node_ids[edge_v].tolist(),
+                           np.asarray(weights).tolist()):
+            fo.write(f'{u} {v} {w}\n')
+
+
+def write_maxcut_instance(storage_path, id, node_ids, edge_u, edge_v, weights):
+    """
+    Write an instance in a group directory, both as a text edge list and in
+    the binary format
+
+    Parameters
+    ----------
+    storage_path : string
+        directory of the group
+    id : int
+        id of the instance
+    node_ids, edge_u, edge_v, weights : numpy arrays
+        array representation of the instance, see
+        MaxCutInstance.to_arrays
+    """
+    write_maxcut_instance_text(
+        os.path.join(storage_path, f'{id}_MaxcutInstance.txt'),
+        node_ids, edge_u, edge_v, weights
+    )
+    write_maxcut_instance_binary(
+        os.path.join(storage_path, f'{id}_MaxcutInstance.bin'),
+        node_ids, edge_u, edge_v, weights
+    )
+
+
+def _get_instance_files(path):
+    """
+    List the instance files of a group, the binary file of an instance is
+    preferred over its text edge list unless the text file was modified
+    after the binary file was written
+
+    Parameters
+    ----------
+    path : string
+        directory of the group
+
+    Returns
+    -------
+        dict<int, string>: path of the file describing each instance id,
+        sorted by id
+    """
+    instance_files = {}
+
+    for file_path in glob.glob(os.path.join(path, '*_MaxcutInstance.txt')):
+        id = int(os.path.basename(file_path).split('_')[0])
+        instance_files[id] = file_path
+
+    for file_path in glob.glob(os.path.join(path, '*_MaxcutInstance.bin')):
+        id = int(os.path.basename(file_path).split('_')[0])
+        text_path = instance_files.get(id)
+        if text_path is not None and os.path.getmtime(text_path) > os.path.getmtime(file_path):
+            log_warning(f'{file_path} is older than {text_path}, the text file is loaded')
+            continue
+        instance_files[id] = file_path
+
+    return dict(sorted(instance_files.items()))
+
+
+def _load_maxcut_instance(id, file_path):
+    """
+    Load a single instance from its text or binary file
+
+    Parameters
+    ----------
+    id : int
+        id of the instance
+    file_path : string
+        path of the instance file
+
+    Returns
+    -------
+        MaxCutInstance
+    """
+    if file_path.endswith('.bin'):
+        return MaxCutInstance.from_arrays(id, *read_maxcut_instance_binary(file_path))
+
+    return MaxCutInstance.from_arrays(id, *read_maxcut_instance_text(file_path))
+
 
 def list_instance_list():
     """
@@ -39,35 +263,71 @@ def list_instance_list():
     return db_list
 
 
-def load_maxcut_instance_list(group_name):
+def load_maxcut_instance_list(group_name, lazy=False,
+                              cache_size=LAZY_CACHE_SIZE, path=None):
     """
-    Load the instance list corresponding to a group name
+    Load the instance list corresponding to a group name, sorted by
+    instance id. Instances available in the binary format are memory
+    mapped and their networkx graph is only built when required.
 
     Parameters
     ----------
     group_name : string
         name of the group
+    lazy : bool
+        if True, the instances are only loaded when accessed
+    cache_size : int
+        maximal number of instances kept in memory by a lazy list
+    path : string
+        directory of the group directories, MAXCUT_DB_PATH if None
 
     Returns
     -------
         InstanceList list of instances corresponding to the group
     """
-    path = os.path.join(MAXCUT_DB_PATH, group_name)
-    instance_list = MaxcutInstanceList(group_name)
+    path = os.path.join(MAXCUT_DB_PATH if path is None else path, group_name)
+    instance_files = _get_instance_files(path)
+    metric_cache = MetricCache(os.path.join(path, METRIC_CACHE_FILE))
 
-    for file_path in glob.glob(path+'/*.txt'):
-        fi = open(file_path, 'rb')
-        graph = nx.read_weighted_edgelist(fi)
-        id = int(file_path.split('/')[-1].split('_')[0])
-        maxcut_instance = MaxCutInstance(id, graph)
-        instance_list.append(maxcut_instance)
+    if lazy:
+        return LazyMaxcutInstanceList(
+            group_name, instance_files, _load_maxcut_instance, cache_size,
+            metric_cache
+        )
+
+    instance_list = MaxcutInstanceList(group_name, metric_cache)
+    for id, file_path in instance_files.items():
+        instance_list.append(_load_maxcut_instance(id, file_path))
 
     return instance_list
 
 
+def iter_maxcut_instances(group_name, path=None):
+    """
+    Iterate over the instances of a group, sorted by instance id, loading
+    a single instance at a time
+
+    Parameters
+    ----------
+    group_name : string
+        name of the group
+    path : string
+        directory of the group directories, MAXCUT_DB_PATH if None
+
+    Returns
+    -------
+        generator of MaxCutInstance
+    """
+    path = os.path.join(MAXCUT_DB_PATH if path is None else path, group_name)
+
+    for id, file_path in _get_instance_files(path).items():
+        yield _load_maxcut_instance(id, file_path)
+
+
 def save_maxcut_instance_list(instance_list):
     """
-    Save the list of instances withing the maxcut database
+    Save the list of instances withing the maxcut database, each instance
+    is written both as a text edge list and in the binary format
 
     Parameters
     ----------
@@ -79,9 +339,42 @@ def save_maxcut_instance_list(instance_list):
     if not os.path.exists(storage_path):
         os.mkdir(storage_path)
         for instance in instance_list:
-            file_name = os.path.join(storage_path,
-                                     f'{instance.id}_MaxcutInstance.txt')
-            fo = open(file_name, "wb")
-            nx.write_weighted_edgelist(instance.graph, fo)
+            write_maxcut_instance(storage_path, instance.id, *instance.to_arrays())
+
+        # Keep the metrics already computed for the instances
+        metric_cache = MetricCache(os.path.join(storage_path, METRIC_CACHE_FILE))
+        metric_cache.update(instance_list.metric_cache)
+        metric_cache.save()
     else:
         log_warning(f'Path {storage_path} already existing. Please remove the directory or use another group name')
+
+
+def convert_maxcut_instance_list(group_name=None):
+    """
+    Write the binary file of every instance only available as a text
+    edge list, or whose text edge list was modified after its binary file
+    was written
+
+    Parameters
+    ----------
+    group_name : string
+        name of the group to convert, all the groups are converted if None
+
+    Returns
+    -------
+        int: number of converted instances
+    """
+    group_list = list_instance_list() if group_name is None else [group_name]
+
+    nb_converted = 0
+    for group in group_list:
+        path = os.path.join(MAXCUT_DB_PATH, group)
+        for id, file_path in _get_instance_files(path).items():
+            if file_path.endswith('.txt'):
+                write_maxcut_instance_binary(
+                    os.path.join(path, f'{id}_MaxcutInstance.bin'),
+                    *read_maxcut_instance_text(file_path)
+                )
+                nb_converted += 1
+
+    return nb_converted
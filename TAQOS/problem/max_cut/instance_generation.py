@@ -4,22 +4,152 @@
 @authors Valentin Gilbert <valentin.gilbert@cea.fr>
 
 Description:
-    Generate instances of the maxcut problem
+    Generate instances of the maxcut problem. The weights of the instances
+    of a group are drawn from a seeded numpy Generator, by shards of
+    GENERATION_SHARD_SIZE instances each having an independent random
+    stream: a group is reproducible from its seed, whatever the number of
+    processes generating it.
 =========
 """
 
 # third party import
-import random
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 # local import
 from TAQOS.graph_generator.dwave_graph_generation import get_dw_sampler_graph
-from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance
+from TAQOS.logger.logging_device import log_warning
+from TAQOS.problem.max_cut.db_manager import MAXCUT_DB_PATH, \
+    load_maxcut_instance_list, write_maxcut_instance
+from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance, \
+    compact_weights
 from TAQOS.problem.max_cut.maxcut_instance_list import MaxcutInstanceList
 
+# Number of instances whose weights are drawn from the same random stream
+GENERATION_SHARD_SIZE = 64
 
-def generate_dwave_instance_group(group_name, solver_name, edge_weights, nb_instance):
+
+def draw_edge_weights(edge_weights, rng, size):
+    """
+    Draw edge weights from a distribution
+
+    Parameters
+    ----------
+    edge_weights : list, dict or callable
+        distribution of the weights:
+            - list of values, drawn uniformly
+            - dict<value, probability> of values
+            - function (rng, size) -> numpy array drawing the weights from a
+              numpy Generator, for continuous distributions. It must be
+              defined at module level to generate with several processes.
+    rng : numpy Generator
+        random generator
+    size : tuple<int>
+        shape of the weight array
+
+    Returns
+    -------
+        numpy array of weights
+    """
+    if callable(edge_weights):
+        return np.asarray(edge_weights(rng, size))
+
+    if isinstance(edge_weights, dict):
+        values = np.array(list(edge_weights.keys()))
+        probabilities = np.array(list(edge_weights.values()), dtype=np.float64)
+        return rng.choice(values, size=size, p=probabilities / probabilities.sum())
+
+    return rng.choice(np.asarray(edge_weights), size=size)
+
+
+def _generate_shard(edge_weights, num_edges, seed_sequence, ids, topology=None,
+                    storage_path=None):
+    """
+    Draw the weights of a shard of instances, and write the instances as
+    text edge lists and in the binary format if storage_path is given
+
+    Parameters
+    ----------
+    edge_weights : list, dict or callable
+        distribution of the weights, see draw_edge_weights
+    num_edges : int
+        number of edges of each instance
+    seed_sequence : numpy SeedSequence
+        seed of the random stream of the shard
+    ids : list<int>
+        ids of the instances of the shard
+    topology : tuple<numpy array>
+        node labels and edge endpoints shared by the instances, only
+        required to write the instances
+    storage_path : string
+        directory where the instances are written
+
+    Returns
+    -------
+        numpy array of shape (number of instances, number of edges): weights
+        of the instances, None if they are written
+    """
+    rng = np.random.default_rng(seed_sequence)
+    weights = compact_weights(
+        draw_edge_weights(edge_weights, rng, (len(ids), num_edges))
+    )
+
+    if storage_path is None:
+        return weights
+
+    for id, instance_weights in zip(ids, weights):
+        write_maxcut_instance(storage_path, id, *topology, instance_weights)
+    return None
+
+
+def _generate_weights(topology, edge_weights, nb_instance, seed, processes,
+                      storage_path=None):
+    """
+    Generate the weights of every instance of a group, shard by shard
+
+    Returns
+    -------
+        list of weight arrays, one per shard (None if written)
+    """
+    num_edges = len(topology[1])
+    shard_ids = [list(range(start, min(start + GENERATION_SHARD_SIZE, nb_instance)))
+                 for start in range(0, nb_instance, GENERATION_SHARD_SIZE)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(shard_ids))
+
+    processes = os.cpu_count() if processes is None else processes
+    processes = min(processes, len(shard_ids))
+
+    # The topology is only sent to the processes writing the instances
+    shard_topology = None if storage_path is None else topology
+    tasks = [(edge_weights, num_edges, seed_sequence, ids, shard_topology,
+              storage_path)
+             for seed_sequence, ids in zip(seed_sequences, shard_ids)]
+
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(_generate_shard, *zip(*tasks)))
+
+    return [_generate_shard(*task) for task in tasks]
+
+
+def _get_topology_arrays(solver_name, offline):
+    """
+    Node labels and edge endpoints of the hardware graph of a solver
+    """
+    node_ids, edge_u, edge_v, _ = MaxCutInstance(
+        0, get_dw_sampler_graph(solver_name, offline)
+    ).to_arrays()
+
+    return node_ids, edge_u, edge_v
+
+
+def generate_dwave_instance_group(group_name, solver_name, edge_weights, nb_instance,
+                                  offline=False, seed=None, processes=1):
     """
-    Generate maxcut instance group based on D-Wave solver topology
+    Generate maxcut instance group based on D-Wave solver topology. The
+    instances share the node and edge arrays of the topology, only the
+    weights differ.
 
     Parameters
     ----------
@@ -30,24 +160,62 @@ def generate_dwave_instance_group(group_name, solver_name, edge_weights, nb_inst
         ['DW_2000Q_6', 'Advantage_system4.1'
          'Advantage_system6.1', 'Advantage2_prototype1.1']
     edge_weights : distribution of weights
+        list of values, dict of probabilities or function, see
+        draw_edge_weights
     nb_instance : int
         number of instances
+    offline : bool
+        if True, the hardware graph of the solver is never read from the
+        D-Wave cloud, see get_dw_sampler_graph
+    seed : int
+        seed of the group, a random seed is used if None
+    processes : int
+        number of processes drawing the weights, all the cores are used if
+        None
 
     Returns
     -------
         InstanceList object that stores the list of instances
     """
+    topology = _get_topology_arrays(solver_name, offline)
+
+    weights = _generate_weights(topology, edge_weights, nb_instance, seed, processes)
+
     instance_list = MaxcutInstanceList(group_name)
-    graph = get_dw_sampler_graph(solver_name)
+    for shard_weights in weights:
+        for instance_weights in shard_weights:
+            instance_list.append(MaxCutInstance.from_arrays(
+                len(instance_list), *topology, instance_weights
+            ))
 
-    for i in range(nb_instance):
-        graph_i = graph.copy()
+    return instance_list
 
-        # Generate random weight from the list edge_weight
-        for edge in graph_i.edges():
-            graph_i[edge[0]][edge[1]]['weight'] = random.choice(edge_weights)
 
-        instance = MaxCutInstance(i, graph_i)
-        instance_list.append(instance)
+def write_dwave_instance_group(group_name, solver_name, edge_weights, nb_instance,
+                               offline=False, seed=None, processes=None):
+    """
+    Generate maxcut instance group based on D-Wave solver topology, the
+    instances being directly written in the maxcut database (text edge
+    list and binary format, as save_maxcut_instance_list) without being
+    kept in memory
 
-    return instance_list
+    Parameters
+    ----------
+    see generate_dwave_instance_group
+
+    Returns
+    -------
+        LazyMaxcutInstanceList: instances of the group, None if the group
+        already exists
+    """
+    storage_path = os.path.join(MAXCUT_DB_PATH, group_name)
+    if os.path.exists(storage_path):
+        log_warning(f'Path {storage_path} already existing. Please remove the directory or use another group name')
+        return None
+    os.mkdir(storage_path)
+
+    topology = _get_topology_arrays(solver_name, offline)
+    _generate_weights(topology, edge_weights, nb_instance, seed, processes,
+                      storage_path)
+
+    return load_maxcut_instance_list(group_name, lazy=True)
@@ -9,30 +9,270 @@ Description:
 """
 
 # third party import
-import MQLib as mql
+import hashlib
 import networkx as nx
+import numpy as np
+import scipy.sparse as sp
 
 # local import
-from TAQOS.instance_metrics.graph_metrics import get_metrics
+from TAQOS.instance_metrics.graph_metrics import APPROX_BUDGET, \
+    get_csr_metrics, to_csr
 from TAQOS.problem.instance import Instance
-from optimization_problems.common.logging_device import create_logger, \
-    log_debug
+
+# Maximal number of (sample, node) pairs evaluated at once when computing
+# the energy or the cut size of many samples
+EVALUATION_CHUNK_SIZE = 2 ** 22
+
+
+def compact_weights(weights):
+    """
+    Store edge weights as int32 when they are all integers, as float64
+    otherwise
+
+    Parameters
+    ----------
+    weights : array like
+        weight of each edge
+
+    Returns
+    -------
+        numpy array of weights
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if np.array_equal(weights, np.round(weights)) and \
+            np.all(np.abs(weights) < 2 ** 31):
+        return weights.astype(np.int32)
+    return weights
 
 
 class MaxCutInstance(Instance):
+    """
+    Maxcut instance stored as arrays: node labels, edge endpoints (as
+    indices in the node labels) and edge weights. The CSR adjacency and the
+    networkx graph are built on first use.
+    """
+
+    __slots__ = ('node_ids', 'edge_u', 'edge_v', 'weights',
+                 '_node_index', '_csr', '_adjacency', '_graph', '_ising',
+                 '_bqm', '_mqlib', '_metrics')
+
     def __init__(self, id, graph):
         """
-        Build the maxcut instance from filepath
+        Build the maxcut instance from a graph
 
         Parameters
         ----------
         id: int
             path of the instance
         graph: networkx graph
-            input graph
+            input graph, node labels should be integers (or strings
+            representing integers)
         """
         super().__init__(id)
-        self.graph = graph
+
+        nodes = list(graph.nodes())
+        node_index = {node: i for i, node in enumerate(nodes)}
+        edges = list(graph.edges(data='weight', default=1))
+
+        self.node_ids = np.array([int(node) for node in nodes], dtype=np.int64)
+        self.edge_u = np.array([node_index[u] for u, _, _ in edges], dtype=np.int32)
+        self.edge_v = np.array([node_index[v] for _, v, _ in edges], dtype=np.int32)
+        self.weights = compact_weights([w for _, _, w in edges])
+        self._init_cache()
+        self._graph = graph
+
+    @classmethod
+    def from_arrays(cls, id, node_ids, edge_u, edge_v, weights):
+        """
+        Build the maxcut instance from its array representation, the
+        networkx graph is only built when it is first accessed
+
+        Parameters
+        ----------
+        id : int
+            id of the instance
+        node_ids : numpy array of int
+            label of each node
+        edge_u : numpy array of int32
+            index (in node_ids) of the first endpoint of each edge
+        edge_v : numpy array of int32
+            index (in node_ids) of the second endpoint of each edge
+        weights : numpy array
+            weight of each edge
+
+        Returns
+        -------
+            MaxCutInstance
+        """
+        instance = cls.__new__(cls)
+        Instance.__init__(instance, id)
+        instance.node_ids = node_ids
+        instance.edge_u = edge_u
+        instance.edge_v = edge_v
+        instance.weights = weights
+        instance._init_cache()
+        return instance
+
+    def _init_cache(self):
+        """
+        Reset the structures derived from the arrays, built on first use
+        """
+        self._node_index = None
+        self._csr = None
+        self._adjacency = None
+        self._graph = None
+        self._ising = None
+        self._bqm = None
+        self._mqlib = None
+        self._metrics = {}
+
+    @property
+    def num_nodes(self):
+        """
+        int: number of nodes
+        """
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        """
+        int: number of edges
+        """
+        return len(self.weights)
+
+    @property
+    def node_index(self):
+        """
+        dict<int, int>: index of each node label in the node arrays
+        """
+        if self._node_index is None:
+            self._node_index = {
+                node: i for i, node in enumerate(self.node_ids.tolist())
+            }
+        return self._node_index
+
+    @property
+    def csr(self):
+        """
+        Symmetric CSR adjacency of the instance
+
+        Returns
+        -------
+            numpy arrays indptr, indices (int32) and weights: the
+            neighbors of node i are indices[indptr[i]:indptr[i+1]]
+        """
+        if self._csr is None:
+            self._csr = to_csr(self.num_nodes, self.edge_u, self.edge_v,
+                               self.weights)
+        return self._csr
+
+    @property
+    def adjacency(self):
+        """
+        Symmetric weighted adjacency matrix of the instance, built on first
+        use from the CSR adjacency. Rows and columns follow the order of
+        the node arrays.
+
+        Returns
+        -------
+            scipy.sparse.csr_matrix of float64
+        """
+        if self._adjacency is None:
+            indptr, indices, weights = self.csr
+            self._adjacency = sp.csr_matrix(
+                (weights.astype(np.float64), indices, indptr),
+                shape=(self.num_nodes, self.num_nodes)
+            )
+        return self._adjacency
+
+    @property
+    def graph(self):
+        """
+        networkx graph of the instance, built on first access. Node labels
+        are strings as for graphs read from the text edge lists.
+        """
+        if self._graph is None:
+            labels = [str(node) for node in self.node_ids.tolist()]
+            graph = nx.Graph()
+            graph.add_nodes_from(labels)
+            graph.add_weighted_edges_from(zip(
+                [labels[i] for i in self.edge_u.tolist()],
+                [labels[i] for i in self.edge_v.tolist()],
+                self.weights.astype(float).tolist()
+            ))
+            self._graph = graph
+        return self._graph
+
+    def to_arrays(self):
+        """
+        Array representation of the instance
+
+        Returns
+        -------
+            numpy array of node labels (int64)
+            numpy arrays of edge endpoints, as indices in the node
+            array (int32)
+            numpy array of edge weights
+        """
+        return self.node_ids, self.edge_u, self.edge_v, self.weights
+
+    def to_sparse_matrix(self):
+        """
+        Upper triangular weighted adjacency matrix, rows and columns follow
+        the order of the node arrays
+
+        Returns
+        -------
+            scipy.sparse.coo_matrix
+        """
+        row = np.minimum(self.edge_u, self.edge_v)
+        col = np.maximum(self.edge_u, self.edge_v)
+        non_zero = self.weights != 0
+        return sp.coo_matrix(
+            (self.weights[non_zero].astype(np.float64),
+             (row[non_zero], col[non_zero])),
+            shape=(self.num_nodes, self.num_nodes)
+        )
+
+    def to_ising_arrays(self):
+        """
+        Compute auto-coupling and coupling factors as arrays, computed once
+        and cached
+
+        Returns
+        -------
+            numpy array of auto-coupling bias of each node
+            tuple of numpy arrays (row, col, bias): coupling bias between
+            the nodes of index row and col
+            list<int> node label of each index
+        """
+        if self._ising is None:
+            self._ising = (
+                np.zeros(self.num_nodes),
+                (self.edge_u, self.edge_v, self.weights.astype(np.float64)),
+                self.node_ids.tolist()
+            )
+        return self._ising
+
+    def to_bqm(self):
+        """
+        Ising model of the instance as a dimod binary quadratic model,
+        computed once and cached. The returned model should not be
+        modified.
+
+        Returns
+        -------
+            dimod.BinaryQuadraticModel with SPIN variables
+        """
+        if self._bqm is None:
+            # dimod is only imported by the quantum heuristics
+            import dimod
+
+            linear, quadratic, labels = self.to_ising_arrays()
+            self._bqm = dimod.BinaryQuadraticModel.from_numpy_vectors(
+                linear, quadratic, 0.0, dimod.SPIN, variable_order=labels
+            )
+        return self._bqm
 
     def to_ising(self):
         """
@@ -43,36 +283,270 @@ class MaxCutInstance(Instance):
             dict of auto-coupling bias (h_dict)
             dict of coupling bias (J_ij_dict)
         """
-        J_ij_dict = {}
-        for ed in self.graph.edges():
-            J_ij_dict[(int(ed[0]), int(ed[1]))] = self.graph.edges()[ed][
-                'weight']
+        linear, (row, col, bias), labels = self.to_ising_arrays()
+        J_ij_dict = dict(zip(
+            zip([labels[i] for i in row.tolist()],
+                [labels[i] for i in col.tolist()]),
+            bias.tolist()
+        ))
 
-        h_dict = {}
-        for bias in self.graph.nodes():
-            h_dict[int(bias)] = 0
+        h_dict = dict(zip(labels, linear.tolist()))
 
         return h_dict, J_ij_dict
 
     def to_mqlib_instance(self):
         """
-        Build MQLib instance from the current graph
+        Build MQLib instance from the adjacency matrix, computed once and
+        cached. The variables of MQLib solutions follow the order of the
+        node arrays.
 
         Returns
         -------
             MQLib instance
         """
-        return mql.Instance('M', self.graph)
+        if self._mqlib is None:
+            # MQLib is only imported by the classical heuristics
+            import MQLib as mql
+
+            self._mqlib = mql.Instance('M', self.to_sparse_matrix())
+        return self._mqlib
+
+    def content_hash(self):
+        """
+        Hash of the node labels and of the weighted edge list, identifies
+        the instance independently of its id and storage format
+
+        Returns
+        -------
+            string: hexadecimal digest
+        """
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(self.node_ids, dtype='<i8').tobytes())
+        digest.update(np.ascontiguousarray(self.edge_u, dtype='<i4').tobytes())
+        digest.update(np.ascontiguousarray(self.edge_v, dtype='<i4').tobytes())
+        digest.update(np.ascontiguousarray(self.weights, dtype='<f8').tobytes())
+        return digest.hexdigest()
+
+    def metric_cache_keys(self, mode='exact', budget=APPROX_BUDGET):
+        """
+        Keys of the metrics of the instance in a MetricCache
+
+        Parameters
+        ----------
+        mode : string
+            'exact' or 'approx' metrics
+        budget : int
+            number of BFS run by the approximate mode
+
+        Returns
+        -------
+            string: key of the metrics
+            string: key of the error bounds of the metrics
+        """
+        key = self.content_hash()
+        if mode != 'exact':
+            key = f'{key}:{mode}:{budget}'
+
+        return key, f'{key}:error'
+
+    def lookup_metrics(self, metric_cache=None, mode='exact', budget=APPROX_BUDGET):
+        """
+        Metrics of the instance already memoized on the instance or stored
+        in a metric cache
 
-    def get_metrics(self):
+        Parameters
+        ----------
+        metric_cache : MetricCache
+            cache of metrics keyed by content hash
+        mode : string
+            'exact' or 'approx', see graph_metrics.get_csr_metrics
+        budget : int
+            number of BFS run by the approximate mode
+
+        Returns
+        -------
+            (dict<str, double>, dict<str, double>): metrics and error bound
+            of each metric, None if they have to be computed
         """
-        Compute the list of metrics associated to the instance
+        memo_key = (mode, budget) if mode != 'exact' else (mode, None)
+        if memo_key in self._metrics:
+            return self._metrics[memo_key]
+
+        if metric_cache is None:
+            return None
+
+        key, error_key = self.metric_cache_keys(mode, budget)
+        metrics = metric_cache.get(key)
+        errors = metric_cache.get(error_key)
+        if mode == 'exact' and metrics is not None:
+            errors = dict.fromkeys(metrics, 0.0)
+        if metrics is None or errors is None:
+            return None
+
+        self._metrics[memo_key] = (metrics, errors)
+        return metrics, errors
+
+    def store_metrics(self, metrics, errors, metric_cache=None, mode='exact',
+                      budget=APPROX_BUDGET):
+        """
+        Memoize the metrics of the instance and store them in a metric
+        cache, see lookup_metrics
+        """
+        memo_key = (mode, budget) if mode != 'exact' else (mode, None)
+        self._metrics[memo_key] = (metrics, errors)
+
+        if metric_cache is not None:
+            key, error_key = self.metric_cache_keys(mode, budget)
+            metric_cache.set(key, metrics)
+            if mode != 'exact':
+                metric_cache.set(error_key, errors)
+
+    def get_metrics(self, metric_cache=None, mode='exact',
+                    budget=APPROX_BUDGET, return_error=False, processes=1):
+        """
+        Compute the list of metrics associated to the instance. Metrics are
+        computed once per mode and memoized on the instance.
+
+        Parameters
+        ----------
+        metric_cache : MetricCache
+            cache of metrics keyed by content hash, looked up before
+            computing the metrics and updated afterwards
+        mode : string
+            'exact' or 'approx', see graph_metrics.get_csr_metrics
+        budget : int
+            number of BFS run by the approximate mode
+        return_error : bool
+            if True, the error bound of each metric is returned as well
+        processes : int
+            number of processes running the BFS of the instance, all the
+            cores if None. The metrics of many instances are better
+            computed in parallel by MaxcutInstanceList.get_metric_values.
 
         Returns
         -------
             dict<str, double>: dictionary of metrics
+            dict<str, double>: error bound of each metric, if return_error
+        """
+        found = self.lookup_metrics(metric_cache, mode, budget)
+        if found is None:
+            found = get_csr_metrics(
+                *self.csr, self.num_edges, processes=processes, mode=mode,
+                budget=budget, return_error=True
+            )
+            self.store_metrics(*found, metric_cache, mode, budget)
+
+        metrics, errors = found
+        if return_error:
+            return metrics, errors
+
+        return metrics
+
+    def to_spin_matrix(self, samples, variables):
         """
-        return get_metrics(self.graph)
+        Reorder the columns of a sample matrix to follow the order of the
+        node arrays
+
+        Parameters
+        ----------
+        samples : numpy array (num_samples, num_variables)
+            value of each variable in each sample
+        variables : list<int>
+            node label of each column of samples
+
+        Returns
+        -------
+            numpy array of int8 (num_samples, num_nodes), nodes missing
+            from variables are set to 0
+        """
+        samples = np.asarray(samples)
+        node_index = self.node_index
+        spins = np.zeros((len(samples), self.num_nodes), dtype=np.int8)
+        spins[:, [node_index[int(v)] for v in variables]] = samples
+        return spins
+
+    def _iter_sample_chunks(self, num_samples):
+        """
+        Split the samples in chunks of bounded size for batch evaluation
+
+        Parameters
+        ----------
+        num_samples : int
+            number of samples
+
+        Returns
+        -------
+            generator of slices
+        """
+        chunk_size = max(1, EVALUATION_CHUNK_SIZE // max(1, self.num_nodes))
+        for start in range(0, num_samples, chunk_size):
+            yield slice(start, start + chunk_size)
+
+    def compute_energies(self, samples):
+        """
+        Compute the energy of many spin assignments at once
+
+        Parameters
+        ----------
+        samples : numpy array (num_samples, num_nodes)
+            spin of each node (following the order of the node arrays) in
+            each sample
+
+        Returns
+        -------
+            numpy array of float: energy of each sample
+        """
+        adjacency = self.adjacency
+
+        samples = np.asarray(samples)
+        energies = np.empty(len(samples))
+        for chunk in self._iter_sample_chunks(len(samples)):
+            spins = np.ascontiguousarray(samples[chunk].T, dtype=np.float64)
+            # Each edge appears twice in the symmetric adjacency
+            energies[chunk] = 0.5 * np.einsum(
+                'ij,ij->j', spins, adjacency @ spins
+            )
+        return energies
+
+    def get_cut_sizes(self, samples):
+        """
+        Compute the cut size of many spin assignments at once, the cut
+        separates the nodes with value 1 from the other nodes
+
+        Parameters
+        ----------
+        samples : numpy array (num_samples, num_nodes)
+            spin of each node (following the order of the node arrays) in
+            each sample
+
+        Returns
+        -------
+            numpy array of float: cut size of each sample
+        """
+        sides = np.where(np.asarray(samples) == 1, 1, -1).astype(np.int8)
+        # Cut edges contribute -w to the energy, the others +w
+        return 0.5 * (float(self.weights.sum()) - self.compute_energies(sides))
+
+    def _solution_to_array(self, solution_dict):
+        """
+        Convert a solution to an array following the order of the node
+        arrays
+
+        Parameters
+        ----------
+        solution_dict : dict<string, int>
+            Partition of each node, keys are node labels as integers or
+            strings
+
+        Returns
+        -------
+            numpy array of float
+        """
+        node_index = self.node_index
+        spins = np.zeros(self.num_nodes)
+        spins[[node_index[int(k)] for k in solution_dict.keys()]] = \
+            list(solution_dict.values())
+        return spins
 
     def compute_energy(self, solution_dict):
         """
@@ -87,12 +561,24 @@ class MaxCutInstance(Instance):
         -------
             float: energy of the solution
         """
-        sol_energy = 0
-        for ed in self.graph.edges():
-            sol_energy += self.graph.edges()[ed]['weight']*solution_dict[ed[0]]*solution_dict[ed[1]]
-
-        return sol_energy
+        return float(self.compute_energies(
+            self._solution_to_array(solution_dict)[np.newaxis, :]
+        )[0])
 
     def get_cut_size(self, solution_dict):
-        partition = [k for k, v in solution_dict.items() if v == 1]
-        return nx.cut_size(self.graph, partition, weight='weight')
+        """
+        Compute the size of the cut between the nodes with value 1 and the
+        other nodes
+
+        Parameters
+        ----------
+        solution_dict : dict<string, int>
+            Partition of each node
+
+        Returns
+        -------
+            float: sum of the weights of the cut edges
+        """
+        return float(self.get_cut_sizes(
+            self._solution_to_array(solution_dict)[np.newaxis, :]
+        )[0])
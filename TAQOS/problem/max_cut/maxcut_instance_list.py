@@ -9,54 +9,156 @@ Description:
 """
 
 # third party import
-from sympy import Union, Interval
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, \
+    as_completed, wait
+import heapq
+import os
+import sys
+import numpy as np
 
 # local import
+from TAQOS.instance_metrics.coverage import CoverageTracker, \
+    get_coverage_curve, get_coverage_intervals, get_coverage_length
+from TAQOS.instance_metrics.graph_metrics import APPROX_BUDGET, \
+    get_csr_metrics
+from TAQOS.instance_metrics.metric_cache import MetricCache
 from TAQOS.problem.instance_list import InstanceList
 
+# Default number of instances kept in memory by a lazy instance list
+LAZY_CACHE_SIZE = 8
+
+
+def _metric_worker(csr, num_edges, mode, budget):
+    """
+    Compute the metrics of an instance in a worker process, the BFS of the
+    instance being run serially
+    """
+    return get_csr_metrics(*csr, num_edges, processes=1, mode=mode, budget=budget,
+                           return_error=True)
+
 
 class MaxcutInstanceList(InstanceList):
     """
     List of instance of the maxcut problem
     """
 
-    def __init__(self, group_name):
+    def __init__(self, group_name, metric_cache=None):
+        """
+        Build an instance list
+
+        Parameters
+        ----------
+        group_name : string
+            name of the group
+        metric_cache : MetricCache
+            cache of the instance metrics, kept in memory if None
+        """
         super().__init__(group_name)
+        self.metric_cache = MetricCache() if metric_cache is None else metric_cache
 
-    def _get_coverage_intervals(self, epsilon):
+    def _compute_metrics(self, mode, budget, processes):
         """
-        Compute the coverage interval for each metric for a set of
-        instances
+        Gather the metrics of the instances in a single pass over the list,
+        those missing from the metric cache being computed one instance per
+        task of a single pool of processes. Only the arrays of the instances
+        being computed are kept, at most two per process, so that a lazy
+        list never holds more instances than its cache.
 
         Returns
         -------
-            dict<string, sympy.Interval>: dictionary storing the
-            interval covered by each metric
+            list<dict<string, double>>: metrics of each instance, in the
+            order of the list
         """
+        processes = os.cpu_count() if processes is None else processes
+        if processes <= 1:
+            return [instance.get_metrics(self.metric_cache, mode, budget)
+                    for instance in self]
 
         metric_list = []
-        for instance in self:
-            metric_list.append(instance.get_metrics())
+        pending = {}
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for position, instance in enumerate(self):
+                found = instance.lookup_metrics(self.metric_cache, mode, budget)
+                if found is not None:
+                    metric_list.append(found[0])
+                    continue
+
+                metric_list.append(None)
+                future = executor.submit(_metric_worker, instance.csr,
+                                         instance.num_edges, mode, budget)
+                pending[future] = (position, instance.metric_cache_keys(mode, budget))
 
-        metric_h = metric_list[0].keys()
+                if len(pending) >= 2 * processes:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._store_metrics(metric_list, *pending.pop(future),
+                                            *future.result(), mode)
+
+            for future in as_completed(pending):
+                self._store_metrics(metric_list, *pending[future], *future.result(),
+                                    mode)
+
+        return metric_list
+
+    def _store_metrics(self, metric_list, position, keys, metrics, errors, mode):
+        """
+        Store the metrics computed for the instance at a position of the
+        list in the metric cache of the list, see
+        MaxCutInstance.store_metrics
+        """
+        metric_list[position] = metrics
+        key, error_key = keys
+        self.metric_cache.set(key, metrics)
+        if mode != 'exact':
+            self.metric_cache.set(error_key, errors)
+
+    def get_metric_values(self, mode='exact', budget=APPROX_BUDGET, processes=1):
+        """
+        Gather the metrics of every instance of the list, computed once and
+        cached in the metric cache of the list
+
+        Parameters
+        ----------
+        mode : string
+            'exact' or 'approx' metrics, see graph_metrics.get_csr_metrics
+        budget : int
+            number of BFS per instance in the approximate mode
+        processes : int
+            number of processes computing the metrics of the instances, all
+            the cores if None. The processes are shared by the instances,
+            each instance being computed serially by one of them.
+
+        Returns
+        -------
+            dict<string, numpy array>: value of each metric for every
+            instance, in the order of the list
+        """
+        metric_list = self._compute_metrics(mode, budget, processes)
+        self.metric_cache.save()
 
-        coverage = {}
-        for h in metric_h:
-            coverage[h] = []
+        if len(metric_list) == 0:
+            return {}
 
-        for content in metric_list:
-            for k in coverage.keys():
-                inf_tuple = max([0, float(content[k]) - epsilon])
-                sup_tuple = min([float(content[k]) + epsilon, 1])
-                coverage[k].append((inf_tuple, sup_tuple))
+        return {k: np.array([content[k] for content in metric_list], dtype=np.float64)
+                for k in metric_list[0].keys()}
 
-        for k, v in coverage.items():
-            intervals = Union(*[Interval(*int_tup) for int_tup in v])
-            coverage[k] = intervals
+    def _get_coverage_intervals(self, epsilon, mode='exact',
+                                budget=APPROX_BUDGET, processes=1):
+        """
+        Compute the coverage interval for each metric for a set of
+        instances
 
-        return coverage
+        Returns
+        -------
+            dict<string, numpy array>: disjoint intervals (one per row)
+            covered by each metric
+        """
+        return {k: get_coverage_intervals(values, epsilon)
+                for k, values in self.get_metric_values(mode, budget,
+                                                        processes).items()}
 
-    def get_coverage(self, epsilon):
+    def get_coverage(self, epsilon, mode='exact', budget=APPROX_BUDGET, processes=1):
         """
         Compute the total length of coverage interval for a set of
         instances.
@@ -65,26 +167,247 @@ class MaxcutInstanceList(InstanceList):
         ----------
         epsilon : float
             coverage factor
+        mode : string
+            'exact' or 'approx' metrics, the approximate mode bounds the
+            eccentricities with a limited number of BFS per instance (see
+            graph_metrics.get_csr_metrics)
+        budget : int
+            number of BFS per instance in the approximate mode
+        processes : int
+            number of processes computing the metrics, see
+            get_metric_values
 
         Returns
         -------
             dict<string, float>: dictionary storing the coverage length
             of each metric
         """
-        coverage_intervals = self._get_coverage_intervals(epsilon)
+        return {k: get_coverage_length(values, epsilon)
+                for k, values in self.get_metric_values(mode, budget,
+                                                        processes).items()}
+
+    def get_coverage_curve(self, epsilons, mode='exact', budget=APPROX_BUDGET,
+                           processes=1):
+        """
+        Compute the total length of coverage interval for several coverage
+        factors, the metrics being computed a single time
+
+        Parameters
+        ----------
+        epsilons : array like of float
+            coverage factors
+        mode : string
+            'exact' or 'approx' metrics, see get_coverage
+        budget : int
+            number of BFS per instance in the approximate mode
+        processes : int
+            number of processes computing the metrics, see
+            get_metric_values
+
+        Returns
+        -------
+            list<string>: name of the metrics
+            numpy array of shape (number of metrics, number of epsilons):
+            coverage length of each metric for each coverage factor
+        """
+        metric_values = self.get_metric_values(mode, budget, processes)
+
+        metric_names = list(metric_values.keys())
+        curve = np.zeros((len(metric_names), len(epsilons)))
+        for i, values in enumerate(metric_values.values()):
+            curve[i] = get_coverage_curve(values, epsilons)
+
+        return metric_names, curve
+
+    def select_coverage_subset(self, k, epsilon, group_name, mode='exact',
+                               budget=APPROX_BUDGET, processes=1):
+        """
+        Greedily select k instances maximizing the total coverage length of
+        the metrics. The coverage being submodular, the gain of an instance
+        can only decrease as instances are selected: the gains are kept in
+        a heap and only the gain at the top is recomputed (lazy greedy).
+
+        Parameters
+        ----------
+        k : int
+            number of instances to select
+        epsilon : float
+            coverage factor
+        group_name : string
+            name of the group of selected instances
+        mode : string
+            'exact' or 'approx' metrics, see get_coverage
+        budget : int
+            number of BFS per instance in the approximate mode
+        processes : int
+            number of processes computing the metrics, see
+            get_metric_values
+
+        Returns
+        -------
+            MaxcutInstanceList: selected instances, in order of selection
+        """
+        metric_values = self.get_metric_values(mode, budget, processes)
+        metric_list = [dict(zip(metric_values.keys(), values))
+                       for values in zip(*metric_values.values())]
+
+        tracker = CoverageTracker(epsilon)
+
+        # Heap of (- gain, position, number of selected instances when the
+        # gain was computed)
+        heap = [(-sum(tracker.marginal_gain(metrics).values()), i, 0)
+                for i, metrics in enumerate(metric_list)]
+        heapq.heapify(heap)
 
-        coverage_length = {}
-        for k, intervals in coverage_intervals.items():
-            length = 0
-            if isinstance(intervals, Union):
-                for interval in intervals.args:
-                    length += interval.end - interval.start
+        selected = []
+        while heap and len(selected) < k:
+            _, i, nb_selected = heapq.heappop(heap)
+
+            if nb_selected == len(selected):
+                tracker.add(metric_list[i])
+                selected.append(i)
             else:
-                try:
-                    length = intervals.end - intervals.start
-                except AttributeError:
-                    # Generated by empty set errors
-                    length = 0
-            coverage_length[k] = length
-
-        return coverage_length
+                gain = sum(tracker.marginal_gain(metric_list[i]).values())
+                heapq.heappush(heap, (-gain, i, len(selected)))
+
+        # Keep the metrics of the selected instances along with them
+        metric_cache = MetricCache()
+        subset = MaxcutInstanceList(group_name, metric_cache)
+        for i in selected:
+            instance = self[i]
+            for key in instance.metric_cache_keys(mode, budget):
+                if key in self.metric_cache:
+                    metric_cache.set(key, self.metric_cache.get(key))
+            subset.append(instance)
+
+        return subset
+
+
+class LazyMaxcutInstanceList(MaxcutInstanceList):
+    """
+    List of instance of the maxcut problem only storing the id and file of
+    each instance. Instances are loaded when indexed or iterated over, the
+    most recently used ones are kept in a bounded cache. The methods of
+    list taking or returning elements work on instances, an instance of a
+    file being identified by its id.
+    """
+
+    def __init__(self, group_name, instance_files, loader,
+                 cache_size=LAZY_CACHE_SIZE, metric_cache=None):
+        """
+        Build a lazy instance list
+
+        Parameters
+        ----------
+        group_name : string
+            name of the group
+        instance_files : dict<int, string>
+            file of each instance id, in the order of the list
+        loader : function
+            function loading an instance from its id and file path
+        cache_size : int
+            maximal number of loaded instances kept in memory
+        metric_cache : MetricCache
+            cache of the instance metrics, kept in memory if None
+        """
+        super().__init__(group_name, metric_cache)
+        super().extend(instance_files.items())
+        self.loader = loader
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _materialize(self, item):
+        """
+        Return the instance described by an item of the list
+
+        Parameters
+        ----------
+        item : tuple(int, string) or Instance
+            id and file of an instance, or instance appended to the list
+
+        Returns
+        -------
+            Instance
+        """
+        if not isinstance(item, tuple):
+            return item
+
+        if item in self._cache:
+            self._cache.move_to_end(item)
+            return self._cache[item]
+
+        instance = self.loader(*item)
+        self._cache[item] = instance
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return instance
+
+    @property
+    def ids(self):
+        """
+        list<int>: id of each instance, without loading them
+        """
+        return [item[0] if isinstance(item, tuple) else item.id
+                for item in super().__iter__()]
+
+    def __getitem__(self, index):
+        item = super().__getitem__(index)
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in item]
+        return self._materialize(item)
+
+    def __iter__(self):
+        for item in super().__iter__():
+            yield self._materialize(item)
+
+    def __reversed__(self):
+        for item in super().__reversed__():
+            yield self._materialize(item)
+
+    def _matches(self, item, value):
+        """
+        Check whether an item of the list describes an instance
+        """
+        if isinstance(item, tuple):
+            return getattr(value, 'id', None) == item[0]
+        return item is value or item == value
+
+    def __contains__(self, value):
+        return any(self._matches(item, value) for item in super().__iter__())
+
+    def index(self, value, start=0, stop=sys.maxsize):
+        items = list(super().__iter__())
+        start, stop, _ = slice(start, stop).indices(len(items))
+        for position in range(start, stop):
+            if self._matches(items[position], value):
+                return position
+        raise ValueError(f'Instance {getattr(value, "id", value)} is not in the list')
+
+    def count(self, value):
+        return sum(self._matches(item, value) for item in super().__iter__())
+
+    def pop(self, index=-1):
+        return self._materialize(super().pop(index))
+
+    def remove(self, value):
+        super().__delitem__(self.index(value))
+
+    def copy(self):
+        """
+        Copy of the list, sharing the loader, the instance cache and the
+        metric cache of the list
+        """
+        copy = LazyMaxcutInstanceList(self.group_name, {}, self.loader, self.cache_size,
+                                      self.metric_cache)
+        copy._cache = self._cache
+        list.extend(copy, super().__iter__())
+        return copy
+
+    def __add__(self, other):
+        concatenation = self.copy()
+        if isinstance(other, LazyMaxcutInstanceList):
+            list.extend(concatenation, list.__iter__(other))
+        else:
+            list.extend(concatenation, other)
+        return concatenation
@@ -0,0 +1,359 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Store of the results of the heuristics in a SQLite database, with one
+    row per result indexed by group, heuristic, parameters and instance
+=========
+"""
+
+# third party import
+import glob
+import json
+import os
+import sqlite3
+import numpy as np
+
+# local import
+from TAQOS.env import PROJECT_PATH
+from TAQOS.heuristic.result_export import load_results_json, \
+    result_from_json, result_to_json
+from TAQOS.logger.logging_device import log_warning
+
+# Path where the results are saved
+MAXCUT_RESULTS_PATH = os.path.join(PROJECT_PATH, 'db', 'maxcut_results')
+
+# Database storing the results
+RESULT_STORE_FILE = 'maxcut_results.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    group_name TEXT NOT NULL,
+    instance_id INTEGER NOT NULL,
+    heuristic TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    best_energy REAL,
+    best_cut_size REAL,
+    worst_energy REAL,
+    mean_energy REAL,
+    wall_clock_time REAL,
+    source TEXT,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lookup
+    ON results (group_name, heuristic, parameters, instance_id);
+CREATE INDEX IF NOT EXISTS results_source ON results (source);
+"""
+
+# Columns returned by the queries, besides the full result
+_COLUMNS = ['group_name', 'instance_id', 'heuristic', 'parameters',
+            'best_energy', 'best_cut_size', 'worst_energy', 'mean_energy',
+            'wall_clock_time']
+
+# Columns expected in every imported result, a warning is logged when
+# they are stored as NULL
+_REQUIRED_COLUMNS = ['best_energy', 'best_cut_size']
+
+# Aggregation functions of energy_table
+_AGGREGATES = {'min': 'MIN', 'max': 'MAX', 'mean': 'AVG'}
+
+
+def _to_float(value):
+    """
+    Numeric value of a result field, None if missing or not a number
+    """
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    return None
+
+
+def get_parameter_key(res_dict):
+    """
+    Canonical representation of the parameters of a result, the embedding
+    of D-Wave results being left out
+
+    Parameters
+    ----------
+    res_dict : dict
+        result of a heuristic
+
+    Returns
+    -------
+        string: JSON of the parameters with sorted keys
+    """
+    parameters = {k: v for k, v in res_dict.get('parameter_setting', {}).items()
+                  if k != 'embedding'}
+    return json.dumps(result_to_json(parameters), sort_keys=True)
+
+
+class ResultStore:
+    """
+    Results of the heuristics on the instances of the maxcut database
+    """
+
+    def __init__(self, file_path=None):
+        """
+        Open (and create if needed) the store
+
+        Parameters
+        ----------
+        file_path : string
+            SQLite file, RESULT_STORE_FILE in MAXCUT_RESULTS_PATH if None
+        """
+        if file_path is None:
+            os.makedirs(MAXCUT_RESULTS_PATH, exist_ok=True)
+            file_path = os.path.join(MAXCUT_RESULTS_PATH, RESULT_STORE_FILE)
+
+        self.file_path = file_path
+        self._connection = sqlite3.connect(file_path)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Close the connection to the database
+        """
+        self._connection.close()
+
+    def _get_row(self, group_name, instance_id, res_dict, source=None):
+        """
+        Row of the results table corresponding to a result
+        """
+        solution = res_dict.get('solution', {})
+        return (
+            group_name, int(instance_id), res_dict['heuristic_name'],
+            get_parameter_key(res_dict),
+            _to_float(solution.get('best_energy')),
+            _to_float(solution.get('best_cut_size')),
+            _to_float(solution.get('worst_energy')),
+            _to_float(solution.get('mean_energy')),
+            _to_float(res_dict.get('time', {}).get('wall_clock_time')),
+            source,
+            json.dumps(result_to_json(res_dict))
+        )
+
+    def append(self, group_name, instance_id, res_dict):
+        """
+        Add the result of a heuristic
+
+        Parameters
+        ----------
+        group_name : string
+            group of the instance
+        instance_id : int
+            id of the instance
+        res_dict : dict
+            result of the heuristic
+        """
+        self.append_many(group_name, [(instance_id, res_dict)])
+
+    def append_many(self, group_name, results, source=None):
+        """
+        Add several results within a single transaction
+
+        Parameters
+        ----------
+        group_name : string
+            group of the instances
+        results : iterable of (int, dict)
+            instance id and result of the heuristic
+        source : string
+            origin of the results, used by the importer
+        """
+        with self._connection:
+            self._insert(group_name, results, source)
+
+    def _insert(self, group_name, results, source=None):
+        """
+        Insert results, within the transaction of the caller
+
+        Returns
+        -------
+            list<tuple>: inserted rows
+        """
+        rows = [self._get_row(group_name, instance_id, res_dict, source)
+                for instance_id, res_dict in results]
+        self._connection.executemany(
+            'INSERT INTO results (group_name, instance_id, heuristic, parameters, '
+            'best_energy, best_cut_size, worst_energy, mean_energy, '
+            'wall_clock_time, source, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        return rows
+
+    def _get_conditions(self, group_name=None, instance_id=None, heuristic=None,
+                        parameters=None):
+        """
+        WHERE clause and arguments selecting results
+        """
+        conditions = []
+        args = []
+
+        for column, value in [('group_name', group_name), ('instance_id', instance_id)]:
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                args.append(value)
+
+        if heuristic is not None:
+            heuristics = [heuristic] if isinstance(heuristic, str) else list(heuristic)
+            conditions.append(f'heuristic IN ({", ".join("?" * len(heuristics))})')
+            args.extend(heuristics)
+
+        for key, value in (parameters or {}).items():
+            conditions.append('json_extract(parameters, ?) = ?')
+            args.extend([f'$.{key}', value])
+
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        return where, args
+
+    def query(self, group_name=None, instance_id=None, heuristic=None,
+              parameters=None, with_result=False):
+        """
+        Select results
+
+        Parameters
+        ----------
+        group_name : string
+            group of the instances, any group if None
+        instance_id : int
+            id of the instance, any instance if None
+        heuristic : string or list<string>
+            name of the heuristics, any heuristic if None
+        parameters : dict
+            value of some parameters (for instance {'annealing_time': 100})
+        with_result : bool
+            if True, the full result dictionary is returned as well
+
+        Returns
+        -------
+            list<dict>: selected results, with the parameters as a dict
+        """
+        where, args = self._get_conditions(group_name, instance_id, heuristic, parameters)
+        columns = _COLUMNS + (['result'] if with_result else [])
+
+        rows = []
+        for row in self._connection.execute(
+                f'SELECT {", ".join(columns)} FROM results{where} '
+                'ORDER BY group_name, instance_id, heuristic, id', args):
+            row = dict(zip(columns, row))
+            row['parameters'] = json.loads(row['parameters'])
+            if with_result:
+                row['result'] = result_from_json(json.loads(row['result']))
+            rows.append(row)
+
+        return rows
+
+    def energy_table(self, group_name, heuristics=None, parameters=None,
+                     column='best_energy', aggregate='min'):
+        """
+        Table of energies of the instances of a group for several
+        heuristics, computed with a single query
+
+        Parameters
+        ----------
+        group_name : string
+            group of the instances
+        heuristics : list<string>
+            heuristics (columns of the table), every heuristic having
+            results if None
+        parameters : dict
+            value of some parameters, see query
+        column : string
+            'best_energy', 'worst_energy', 'mean_energy', 'best_cut_size'
+            or 'wall_clock_time'
+        aggregate : string
+            'min', 'max' or 'mean' over the results of a heuristic on an
+            instance
+
+        Returns
+        -------
+            numpy array of int: instance ids (rows of the table)
+            list<string>: heuristics (columns of the table)
+            numpy array of float: table, NaN if a heuristic has no result on
+            an instance
+        """
+        if column not in _COLUMNS[4:]:
+            raise ValueError(f'Unknown column {column}')
+        if aggregate not in _AGGREGATES:
+            raise ValueError(f'Unknown aggregate {aggregate}')
+
+        where, args = self._get_conditions(group_name, None, heuristics, parameters)
+        rows = self._connection.execute(
+            f'SELECT instance_id, heuristic, {_AGGREGATES[aggregate]}({column}) '
+            f'FROM results{where} GROUP BY instance_id, heuristic', args
+        ).fetchall()
+
+        if heuristics is None:
+            heuristics = sorted({heuristic for _, heuristic, _ in rows})
+        heuristics = [heuristics] if isinstance(heuristics, str) else list(heuristics)
+
+        instance_ids = np.array(sorted({instance_id for instance_id, _, _ in rows}),
+                                dtype=np.int64)
+        row_index = {instance_id: i for i, instance_id in enumerate(instance_ids.tolist())}
+        column_index = {heuristic: j for j, heuristic in enumerate(heuristics)}
+
+        table = np.full((len(instance_ids), len(heuristics)), np.nan)
+        for instance_id, heuristic, value in rows:
+            if value is not None:
+                table[row_index[instance_id], column_index[heuristic]] = value
+
+        return instance_ids, heuristics, table
+
+    def import_json_results(self, group_name=None, path=None):
+        """
+        Import the <id>_MaxcutResult.json files of the groups. Importing
+        a file again replaces the results previously imported from it.
+        Results missing a numeric best_energy or best_cut_size are imported
+        with a NULL value and reported by a warning for each group.
+
+        Parameters
+        ----------
+        group_name : string
+            group to import, every group directory of path if None
+        path : string
+            directory of the group directories, MAXCUT_RESULTS_PATH if None
+
+        Returns
+        -------
+            int: number of imported results
+        """
+        path = MAXCUT_RESULTS_PATH if path is None else path
+        group_list = [group_name] if group_name is not None else \
+            sorted(os.path.basename(d) for d in glob.glob(os.path.join(path, '*'))
+                   if os.path.isdir(d))
+
+        nb_imported = 0
+        for group in group_list:
+            missing = dict.fromkeys(_REQUIRED_COLUMNS, 0)
+            for file_path in sorted(glob.glob(os.path.join(path, group, '*_MaxcutResult.json'))):
+                instance_id = int(os.path.basename(file_path).split('_')[0])
+                results = [(instance_id, res_dict)
+                           for res_list in load_results_json(file_path).values()
+                           for res_dict in res_list]
+
+                # Files are identified relatively to path, so that a
+                # moved database is imported again in place
+                source = f'{group}/{os.path.basename(file_path)}'
+                with self._connection:
+                    self._connection.execute('DELETE FROM results WHERE source = ?',
+                                             (source,))
+                    rows = self._insert(group, results, source)
+                nb_imported += len(results)
+
+                for column in _REQUIRED_COLUMNS:
+                    position = _COLUMNS.index(column)
+                    missing[column] += sum(row[position] is None for row in rows)
+
+            for column, count in missing.items():
+                if count > 0:
+                    log_warning(f'{count} results of group {group} have no {column}, stored as NULL')
+
+        return nb_imported
@@ -0,0 +1,101 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Fixtures of the tests: a small group of instances written in a
+    temporary database, and a stub of MQLib so that the classical
+    heuristics run without the package
+
+    python -m pytest TAQOS/tests
+=========
+"""
+
+# third party import
+import os
+import sys
+import types
+import numpy as np
+import pytest
+
+# local import
+import TAQOS.problem.max_cut.db_manager as db_manager
+from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance
+
+# Group of instances written by the instance_group fixture
+TEST_GROUP = 'test_group'
+
+# Number of instances of the test group
+TEST_NB_INSTANCE = 4
+
+
+def get_random_instance(id, num_nodes, rng, edge_probability=0.3):
+    """
+    Random instance with +1/-1 weights, the nodes being labelled by even
+    numbers
+    """
+    edge_u, edge_v = np.triu_indices(num_nodes, k=1)
+    kept = rng.random(len(edge_u)) < edge_probability
+    return MaxCutInstance.from_arrays(
+        id, np.arange(0, 2 * num_nodes, 2, dtype=np.int64),
+        edge_u[kept].astype(np.int32), edge_v[kept].astype(np.int32),
+        rng.choice(np.array([-1, 1], dtype=np.int32), size=int(kept.sum()))
+    )
+
+
+def _run_stub_heuristic(heuristic, instance, rtsec, seed=-1):
+    """
+    Random solution reported with a history of two best solutions, as
+    MQLib.runHeuristic
+    """
+    adjacency = instance.matrix.tocsr()
+    adjacency = adjacency + adjacency.T
+    rng = np.random.default_rng(None if seed < 0 else seed)
+    solution = rng.choice([-1, 1], adjacency.shape[0])
+    cut_size = 0.25 * (2 * adjacency.sum() / 2 - solution @ (adjacency @ solution))
+    return {
+        'objval': float(cut_size),
+        'solution': solution.tolist(),
+        'bestsolhistory_objvals': [float(cut_size) - 1, float(cut_size)],
+        'bestsolhistory_runtimes': [rtsec / 4, rtsec / 2]
+    }
+
+
+@pytest.fixture
+def stub_mqlib(monkeypatch):
+    """
+    Stub of the MQLib package, inherited by the worker processes
+    """
+    module = types.ModuleType('MQLib')
+    module.Instance = lambda kind, matrix: types.SimpleNamespace(matrix=matrix)
+    module.runHeuristic = _run_stub_heuristic
+    monkeypatch.setitem(sys.modules, 'MQLib', module)
+
+    import TAQOS.heuristic.mqlib_heuristic as mqlib_heuristic
+    monkeypatch.setattr(mqlib_heuristic, 'mql', module)
+    return module
+
+
+@pytest.fixture
+def instance_group(tmp_path, monkeypatch):
+    """
+    Database holding TEST_GROUP, made of TEST_NB_INSTANCE small instances
+
+    Returns
+    -------
+        list<MaxCutInstance>: instances of the group
+    """
+    monkeypatch.setattr(db_manager, 'MAXCUT_DB_PATH', str(tmp_path / 'maxcut_db'))
+    path = os.path.join(db_manager.MAXCUT_DB_PATH, TEST_GROUP)
+    os.makedirs(path)
+
+    rng = np.random.default_rng(0)
+    instances = [get_random_instance(id, 12, rng) for id in range(TEST_NB_INSTANCE)]
+    for instance in instances:
+        db_manager.write_maxcut_instance_text(
+            os.path.join(path, f'{instance.id}_MaxcutInstance.txt'),
+            *instance.to_arrays()
+        )
+
+    return instances
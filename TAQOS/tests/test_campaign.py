@@ -0,0 +1,75 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the benchmark campaigns
+=========
+"""
+
+# third party import
+import json
+
+# local import
+import TAQOS.heuristic.max_cut_heuristics as max_cut_heuristics
+import TAQOS.problem.max_cut.campaign as campaign
+from TAQOS.heuristic.max_cut_heuristics import register_heuristic
+from TAQOS.problem.max_cut.campaign import load_campaign_results, run_campaign
+from TAQOS.problem.max_cut.result_store import ResultStore
+from TAQOS.tests.conftest import TEST_GROUP, TEST_NB_INSTANCE
+
+
+def test_campaign_stores_pool_results(stub_mqlib, instance_group, tmp_path):
+    # The cells run in worker processes are checkpointed and stored by the
+    # main thread, which owns the connection of the store
+    checkpoint_file = str(tmp_path / 'campaign.jsonl')
+    budgets = [0.01, 0.02]
+
+    with ResultStore(str(tmp_path / 'results.sqlite')) as store:
+        records = run_campaign(TEST_GROUP, {'BASELINE': {'rtsec': budgets}},
+                               checkpoint_file=checkpoint_file, processes=2,
+                               result_store=store)
+        rows = store.query(TEST_GROUP, heuristic='BASELINE')
+
+    nb_cells = TEST_NB_INSTANCE * len(budgets)
+    assert len(records) == nb_cells
+    assert len(rows) == nb_cells
+    assert len(load_campaign_results(checkpoint_file)) == nb_cells
+    with open(checkpoint_file) as fi:
+        assert sorted(json.loads(line)['parameters']['rtsec'] for line in fi) == \
+            sorted(budgets * TEST_NB_INSTANCE)
+
+
+def test_campaign_resumes_from_checkpoint(stub_mqlib, instance_group, tmp_path):
+    checkpoint_file = str(tmp_path / 'campaign.jsonl')
+    run_campaign(TEST_GROUP, {'BASELINE': {'rtsec': [0.01]}},
+                 checkpoint_file=checkpoint_file, processes=1)
+    records = run_campaign(TEST_GROUP, {'BASELINE': {'rtsec': [0.01, 0.02]}},
+                           checkpoint_file=checkpoint_file, processes=1)
+
+    with open(checkpoint_file) as fi:
+        assert len(fi.readlines()) == len(records) == 2 * TEST_NB_INSTANCE
+
+
+def _run_constant_batch(heuristic, jobs):
+    """
+    Batch entry point without options, reporting a constant energy
+    """
+    for job in jobs:
+        yield job, {'heuristic_name': heuristic, 'time': {}, 'parameter_setting': job[1],
+                    'solution': {'best_energy': 0.0}, 'extra': {}}
+
+
+def test_campaign_plain_batch_heuristic(instance_group, tmp_path, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('process pool created')
+
+    monkeypatch.setattr(campaign, 'ProcessPoolExecutor', no_pool)
+    monkeypatch.setitem(max_cut_heuristics._HEURISTIC_REGISTRY, 'CONSTANT', None)
+    register_heuristic('CONSTANT', 'test', lambda *args, **kwargs: None,
+                       run_batch=_run_constant_batch, thread_safe=True)
+
+    records = run_campaign(TEST_GROUP, {'CONSTANT': {'size': [1, 2]}},
+                           checkpoint_file=str(tmp_path / 'campaign.jsonl'))
+    assert len(records) == 2 * TEST_NB_INSTANCE
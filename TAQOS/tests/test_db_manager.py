@@ -0,0 +1,79 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the storage of the instances in the maxcut database
+=========
+"""
+
+# third party import
+import os
+import numpy as np
+import pytest
+
+# local import
+import TAQOS.problem.max_cut.db_manager as db_manager
+from TAQOS.tests.conftest import TEST_GROUP, TEST_NB_INSTANCE
+
+
+@pytest.mark.parametrize('weights', [np.array([1, -1, 3], dtype=np.int32),
+                                     np.array([0.5, -1.25, 2.0])])
+def test_binary_round_trip(tmp_path, weights):
+    node_ids = np.array([4, 0, 7, 2], dtype=np.int64)
+    edge_u = np.array([0, 1, 2], dtype=np.int32)
+    edge_v = np.array([1, 2, 3], dtype=np.int32)
+    file_path = str(tmp_path / '0_MaxcutInstance.bin')
+
+    db_manager.write_maxcut_instance_binary(file_path, node_ids, edge_u, edge_v, weights)
+    arrays = db_manager.read_maxcut_instance_binary(file_path)
+
+    for read, written in zip(arrays, (node_ids, edge_u, edge_v, weights)):
+        assert read.dtype.kind == written.dtype.kind
+        assert np.array_equal(read, written)
+
+
+def test_converted_instances_are_mapped(instance_group):
+    path = os.path.join(db_manager.MAXCUT_DB_PATH, TEST_GROUP)
+    instances = db_manager.load_maxcut_instance_list(TEST_GROUP)
+
+    # Loading does not write in the database
+    assert not [f for f in os.listdir(path) if f.endswith('.bin')]
+    assert db_manager.convert_maxcut_instance_list(TEST_GROUP) == TEST_NB_INSTANCE
+    assert db_manager.convert_maxcut_instance_list(TEST_GROUP) == 0
+
+    for loaded, reloaded in zip(instances, db_manager.iter_maxcut_instances(TEST_GROUP)):
+        assert reloaded.id == loaded.id
+        for read, written in zip(reloaded.to_arrays(), loaded.to_arrays()):
+            assert isinstance(read, np.memmap)
+            assert np.array_equal(read, written)
+
+
+def test_stale_binary_is_not_loaded(instance_group):
+    path = os.path.join(db_manager.MAXCUT_DB_PATH, TEST_GROUP)
+    db_manager.convert_maxcut_instance_list(TEST_GROUP)
+
+    # The text file of an instance is rewritten with other weights
+    node_ids, edge_u, edge_v, weights = instance_group[0].to_arrays()
+    text_path = os.path.join(path, '0_MaxcutInstance.txt')
+    db_manager.write_maxcut_instance_text(text_path, node_ids, edge_u, edge_v, -weights)
+    text_mtime = os.path.getmtime(text_path)
+    os.utime(os.path.join(path, '0_MaxcutInstance.bin'), (text_mtime - 10, text_mtime - 10))
+
+    instance = next(db_manager.iter_maxcut_instances(TEST_GROUP))
+    assert not isinstance(instance.weights, np.memmap)
+    assert instance.weights.sum() == -weights.sum()
+
+    assert db_manager.convert_maxcut_instance_list(TEST_GROUP) == 1
+    instance = next(db_manager.iter_maxcut_instances(TEST_GROUP))
+    assert isinstance(instance.weights, np.memmap)
+    assert instance.weights.sum() == -weights.sum()
+
+
+def test_iter_instances_of_another_directory(instance_group, tmp_path, monkeypatch):
+    path = db_manager.MAXCUT_DB_PATH
+    monkeypatch.setattr(db_manager, 'MAXCUT_DB_PATH', str(tmp_path / 'other_db'))
+
+    ids = [instance.id for instance in db_manager.iter_maxcut_instances(TEST_GROUP, path)]
+    assert ids == list(range(TEST_NB_INSTANCE))
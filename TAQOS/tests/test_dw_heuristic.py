@@ -0,0 +1,115 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the D-Wave heuristics, run with the local annealing sampler
+=========
+"""
+
+# third party import
+import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+import dimod
+import numpy as np
+import pytest
+
+# local import
+import TAQOS.heuristic.dw_heuristic as dw_heuristic
+from TAQOS.heuristic.dw_heuristic import run_dw_heuristic, run_dw_heuristic_batch
+from TAQOS.heuristic.sa_sampler import LocalAnnealingSampler
+from TAQOS.tests.conftest import get_random_instance
+
+
+@pytest.fixture
+def instances():
+    rng = np.random.default_rng(1)
+    return [get_random_instance(id, 10, rng) for id in range(2)]
+
+
+def test_batch_passes_sampler_parameters(instances):
+    results = list(run_dw_heuristic_batch(
+        'LOCAL_SA', instances, {'num_reads': [4], 'num_sweeps': [5, 10]},
+        sampler=LocalAnnealingSampler()
+    ))
+
+    assert sorted(res['parameter_setting']['num_sweeps'] for _, res in results) == \
+        [5, 5, 10, 10]
+    assert sorted(res['time']['qpu_time_info']['num_sweeps'] for _, res in results) == \
+        [5, 5, 10, 10]
+
+
+def test_single_run_passes_sampler_parameters(instances):
+    res_dict = run_dw_heuristic('LOCAL_SA', instances[0], num_reads=4, num_sweeps=5,
+                                sampler=LocalAnnealingSampler())
+    assert res_dict['parameter_setting']['num_sweeps'] == 5
+    assert res_dict['time']['qpu_time_info']['num_sweeps'] == 5
+
+
+def test_unknown_parameters_are_rejected(instances):
+    with pytest.raises(ValueError):
+        run_dw_heuristic('LOCAL_SA', instances[0], num_reads=4, bogus=3,
+                         sampler=LocalAnnealingSampler())
+
+    with pytest.raises(ValueError):
+        list(run_dw_heuristic_batch('LOCAL_SA', instances, {'num_reads': [4], 'bogus': [1]},
+                                    sampler=LocalAnnealingSampler()))
+
+
+class DelayedSampler(LocalAnnealingSampler):
+    """
+    Local sampler whose results are received after a delay, as the problems
+    submitted to a D-Wave solver
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def _sample(self, bqm, kwargs):
+        time.sleep(self.delay)
+        return super().sample(bqm, **kwargs)
+
+    def sample(self, bqm, **kwargs):
+        future = self.executor.submit(self._sample, bqm, kwargs)
+        return dimod.SampleSet.from_future(future, lambda f: f.result())
+
+
+def test_service_time_excludes_consumer_time(instances):
+    delay = 0.05
+    results = run_dw_heuristic_batch('LOCAL_SA', instances, {'num_reads': [2]},
+                                     max_concurrency=2, sampler=DelayedSampler(delay))
+
+    service_times = []
+    for _, res_dict in results:
+        service_times.append(res_dict['time']['dwave_service_time'] / 10 ** 6)
+        # The results of the other problem are received meanwhile
+        time.sleep(10 * delay)
+
+    assert len(service_times) == 2
+    assert all(delay <= t < 5 * delay for t in service_times)
+
+
+def test_solver_gets_a_single_client(monkeypatch):
+    clients = []
+
+    def connect(**kwargs):
+        time.sleep(0.05)
+        clients.append(kwargs['solver'])
+        return object()
+
+    system = types.ModuleType('dwave.system')
+    system.DWaveSampler = connect
+    monkeypatch.setitem(sys.modules, 'dwave', types.ModuleType('dwave'))
+    monkeypatch.setitem(sys.modules, 'dwave.system', system)
+    monkeypatch.setattr(dw_heuristic, '_DW_SAMPLERS', {})
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        samplers = list(executor.map(dw_heuristic._get_dw_sampler,
+                                     ['Advantage_system6.1'] * 4))
+
+    assert clients == ['Advantage_system6.1']
+    assert all(sampler is samplers[0] for sampler in samplers)
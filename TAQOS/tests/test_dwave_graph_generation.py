@@ -0,0 +1,116 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the hardware graphs of the D-Wave solvers, built offline from
+    the topologies cached in db/topologies
+=========
+"""
+
+# third party import
+import json
+import os
+import sys
+import types
+import pytest
+
+# local import
+import TAQOS.graph_generator.dwave_graph_generation as dwave_graph_generation
+
+pytest.importorskip('dwave_networkx')
+
+# Topologies cached in the repository
+REPO_TOPOLOGY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                  'db', 'topologies')
+
+SOLVER = 'Advantage_system6.1'
+
+
+class UnreachableSampler:
+    """
+    D-Wave sampler failing as soon as the cloud is reached
+    """
+
+    def __init__(self, *args, **kwargs):
+        raise AssertionError('D-Wave cloud reached')
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    """
+    D-Wave cloud client failing when used
+    """
+    dwave = types.ModuleType('dwave')
+    system = types.ModuleType('dwave.system')
+    system.DWaveSampler = UnreachableSampler
+    dwave.system = system
+    monkeypatch.setitem(sys.modules, 'dwave', dwave)
+    monkeypatch.setitem(sys.modules, 'dwave.system', system)
+
+
+@pytest.fixture
+def repo_topologies(monkeypatch):
+    monkeypatch.setattr(dwave_graph_generation, 'TOPOLOGY_PATH', REPO_TOPOLOGY_PATH)
+
+
+def _edge_set(edges):
+    return {tuple(sorted(edge)) for edge in edges}
+
+
+@pytest.mark.parametrize('offline', [True, False])
+def test_cached_topology_matches_graph(repo_topologies, no_network, offline):
+    with open(os.path.join(REPO_TOPOLOGY_PATH, f'{SOLVER}.json'), 'r') as fi:
+        content = json.load(fi)
+
+    graph = dwave_graph_generation.get_dw_sampler_graph(SOLVER, offline)
+
+    assert set(graph.nodes) == set(content['qubits'])
+    assert _edge_set(graph.edges) == _edge_set(content['couplers'])
+    # Qubits and couplers missing from the ideal graph of the topology
+    ideal_graph = dwave_graph_generation.get_ideal_graph(content['topology'])
+    assert set(graph.nodes) < set(ideal_graph.nodes)
+    assert _edge_set(graph.edges) < _edge_set(ideal_graph.edges)
+
+
+def test_uncached_topology_is_fetched_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(dwave_graph_generation, 'TOPOLOGY_PATH', str(tmp_path))
+    ideal_graph = dwave_graph_generation.get_ideal_graph(
+        dwave_graph_generation.SOLVER_TOPOLOGIES[SOLVER]
+    )
+    nodelist = sorted(ideal_graph.nodes)[1:]
+    edgelist = [(u, v) for u, v in ideal_graph.edges
+                if u in nodelist and v in nodelist]
+    samplers = []
+
+    class CloudSampler:
+        def __init__(self, *args, **kwargs):
+            samplers.append(kwargs['solver'])
+            self.properties = {'topology': dwave_graph_generation.SOLVER_TOPOLOGIES[SOLVER]}
+            self.nodelist = nodelist
+            self.edgelist = edgelist
+
+    system = types.ModuleType('dwave.system')
+    system.DWaveSampler = CloudSampler
+    monkeypatch.setitem(sys.modules, 'dwave', types.ModuleType('dwave'))
+    monkeypatch.setitem(sys.modules, 'dwave.system', system)
+
+    for _ in range(2):
+        graph = dwave_graph_generation.get_dw_sampler_graph(SOLVER)
+        assert set(graph.nodes) == set(nodelist)
+        assert _edge_set(graph.edges) == _edge_set(edgelist)
+
+    assert samplers == [SOLVER]
+    assert os.path.exists(tmp_path / f'{SOLVER}.json')
+
+
+def test_offline_fallback_on_ideal_graph(tmp_path, monkeypatch, no_network):
+    monkeypatch.setattr(dwave_graph_generation, 'TOPOLOGY_PATH', str(tmp_path))
+    topology = dwave_graph_generation.SOLVER_TOPOLOGIES[SOLVER]
+
+    graph = dwave_graph_generation.get_dw_sampler_graph(SOLVER, offline=True)
+    assert set(graph.nodes) == set(dwave_graph_generation.get_ideal_graph(topology).nodes)
+
+    with pytest.raises(ValueError):
+        dwave_graph_generation.get_dw_sampler_graph('unknown_solver', offline=True)
@@ -0,0 +1,66 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the generation of the instance groups
+=========
+"""
+
+# third party import
+import os
+import numpy as np
+import pytest
+
+# local import
+import TAQOS.problem.max_cut.db_manager as db_manager
+import TAQOS.problem.max_cut.instance_generation as instance_generation
+
+# Hardware graph standing in for the D-Wave solvers: a cycle of 6 qubits
+TOPOLOGY = (np.arange(0, 12, 2, dtype=np.int64), np.arange(6, dtype=np.int32),
+            np.roll(np.arange(6, dtype=np.int32), -1))
+
+
+@pytest.fixture
+def small_topology(monkeypatch):
+    monkeypatch.setattr(instance_generation, '_get_topology_arrays',
+                        lambda solver_name, offline: TOPOLOGY)
+    # Several shards per group
+    monkeypatch.setattr(instance_generation, 'GENERATION_SHARD_SIZE', 3)
+
+
+def _weights(instance_list):
+    return np.array([instance.weights for instance in instance_list])
+
+
+def test_generation_is_reproducible(small_topology):
+    weights = _weights(instance_generation.generate_dwave_instance_group(
+        'group', 'Advantage_system6.1', [-1, 1], 8, seed=0, processes=1
+    ))
+
+    assert weights.shape == (8, len(TOPOLOGY[1]))
+    assert np.array_equal(weights, _weights(instance_generation.generate_dwave_instance_group(
+        'group', 'Advantage_system6.1', [-1, 1], 8, seed=0, processes=2
+    )))
+    assert not np.array_equal(weights, _weights(instance_generation.generate_dwave_instance_group(
+        'group', 'Advantage_system6.1', [-1, 1], 8, seed=1, processes=1
+    )))
+
+
+def test_written_group_matches_generated_group(small_topology, tmp_path, monkeypatch):
+    monkeypatch.setattr(db_manager, 'MAXCUT_DB_PATH', str(tmp_path))
+    monkeypatch.setattr(instance_generation, 'MAXCUT_DB_PATH', str(tmp_path))
+
+    generated = instance_generation.generate_dwave_instance_group(
+        'group', 'Advantage_system6.1', {-1: 0.5, 1: 0.5}, 7, seed=3
+    )
+    written = instance_generation.write_dwave_instance_group(
+        'group', 'Advantage_system6.1', {-1: 0.5, 1: 0.5}, 7, seed=3, processes=2
+    )
+
+    files = os.listdir(tmp_path / 'group')
+    assert len([f for f in files if f.endswith('.txt')]) == 7
+    assert len([f for f in files if f.endswith('.bin')]) == 7
+    assert written.ids == list(range(7))
+    assert np.array_equal(_weights(written), _weights(generated))
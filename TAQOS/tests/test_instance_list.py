@@ -0,0 +1,94 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the lazy instance lists
+=========
+"""
+
+# third party import
+import gc
+import pytest
+
+# local import
+from TAQOS.instance_metrics.metric_cache import MetricCache
+from TAQOS.problem.max_cut.db_manager import load_maxcut_instance_list
+from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance
+from TAQOS.tests.conftest import TEST_GROUP, TEST_NB_INSTANCE
+
+
+@pytest.fixture
+def lazy_list(instance_group):
+    return load_maxcut_instance_list(TEST_GROUP, lazy=True, cache_size=1)
+
+
+def test_lazy_list_returns_instances(lazy_list):
+    assert all(isinstance(instance, MaxCutInstance) for instance in lazy_list)
+    assert [instance.id for instance in reversed(lazy_list)] == \
+        list(range(TEST_NB_INSTANCE))[::-1]
+    assert [instance.id for instance in lazy_list[1:3]] == [1, 2]
+    assert lazy_list.ids == list(range(TEST_NB_INSTANCE))
+
+
+def test_lazy_list_membership(lazy_list, instance_group):
+    first = lazy_list[0]
+    # The instance is evicted from the cache by the next access
+    lazy_list[1]
+    assert first in lazy_list
+    assert instance_group[2] in lazy_list
+    assert lazy_list.index(first) == 0
+    assert lazy_list.index(instance_group[3]) == 3
+    assert lazy_list.count(first) == 1
+    with pytest.raises(ValueError):
+        lazy_list.index(first, 1)
+
+
+def test_lazy_list_modifications(lazy_list, instance_group):
+    last = lazy_list.pop()
+    assert isinstance(last, MaxCutInstance) and last.id == TEST_NB_INSTANCE - 1
+    assert last not in lazy_list
+
+    lazy_list.remove(instance_group[0])
+    assert lazy_list.ids == list(range(1, TEST_NB_INSTANCE - 1))
+
+    lazy_list.append(last)
+    assert lazy_list[-1] is last
+    assert lazy_list.ids == list(range(1, TEST_NB_INSTANCE))
+
+
+def test_lazy_list_copies(lazy_list):
+    copy = lazy_list.copy()
+    assert isinstance(copy[0], MaxCutInstance)
+    copy.pop()
+    assert len(copy) == len(lazy_list) - 1
+
+    concatenation = lazy_list + copy
+    assert isinstance(concatenation[-1], MaxCutInstance)
+    assert concatenation.ids == lazy_list.ids + copy.ids
+    assert (copy + [lazy_list[0]]).ids == copy.ids + [0]
+
+
+def test_lazy_list_metrics_stream(instance_group):
+    lazy_list = load_maxcut_instance_list(TEST_GROUP, lazy=True, cache_size=1)
+    lazy_list.metric_cache = MetricCache()
+    loader = lazy_list.loader
+    fixture_ids = {id(instance) for instance in instance_group}
+    loads = []
+
+    def tracking_loader(id_, file_path):
+        # Loaded instances still referenced when the next one is loaded
+        gc.collect()
+        loads.append(sum(isinstance(o, MaxCutInstance) and id(o) not in fixture_ids
+                         for o in gc.get_objects()))
+        return loader(id_, file_path)
+
+    lazy_list.loader = tracking_loader
+    values = lazy_list.get_metric_values(processes=2)
+
+    assert all(len(column) == TEST_NB_INSTANCE for column in values.values())
+    # Each instance is loaded once and the LRU is the only holder
+    assert len(loads) == TEST_NB_INSTANCE
+    assert max(loads) <= 1
+    assert len(lazy_list._cache) == 1
@@ -0,0 +1,55 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the instrumentation of the heuristic runs
+=========
+"""
+
+# third party import
+import tracemalloc
+
+# local import
+from TAQOS.heuristic.max_cut_heuristics import run_maxcut_heuristic
+from TAQOS.logger.instrumentation import PhaseTimer, configure_instrumentation
+
+
+def test_disabling_memory_stops_tracemalloc():
+    configure_instrumentation(memory=True)
+    try:
+        timer = PhaseTimer()
+        with timer.phase('outer'):
+            with timer.phase('inner'):
+                data = [0] * 100000
+        assert tracemalloc.is_tracing()
+        assert timer.peak_memory['inner'] >= 8 * len(data)
+    finally:
+        configure_instrumentation(memory=False)
+
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracemalloc_started_by_user_is_kept():
+    tracemalloc.start()
+    try:
+        configure_instrumentation(memory=True)
+        with PhaseTimer().phase('phase'):
+            pass
+        configure_instrumentation(memory=False)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_solver_phase_memory_is_not_measured(stub_mqlib, instance_group):
+    configure_instrumentation(memory=True)
+    try:
+        res_dict = run_maxcut_heuristic('BASELINE', instance_group[0], rtsec=0.01)
+    finally:
+        configure_instrumentation(memory=False)
+
+    assert 'solver' in res_dict['time']['phase_time']
+    assert 'solver' not in res_dict['time']['peak_memory']
+    assert 'conversion' in res_dict['time']['peak_memory']
@@ -0,0 +1,89 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the lazy import of the heuristic backends: MQLib and the
+    D-Wave cloud client are only imported when one of their heuristics is
+    run, checked in a fresh interpreter
+=========
+"""
+
+# third party import
+import json
+import os
+import subprocess
+import sys
+
+# local import
+
+# Repository root, holding the TAQOS package
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stub of MQLib, as the stub_mqlib fixture
+_MQLIB_STUB = """
+import types
+
+def Instance(kind, matrix):
+    return types.SimpleNamespace(matrix=matrix)
+
+def runHeuristic(heuristic, instance, rtsec, seed=-1):
+    return {'objval': 0.0, 'solution': [1] * instance.matrix.shape[0],
+            'bestsolhistory_objvals': [0.0], 'bestsolhistory_runtimes': [rtsec]}
+"""
+
+# Stub of the D-Wave cloud client, sampling locally
+_DWAVE_SYSTEM_STUB = """
+from TAQOS.heuristic.sa_sampler import LocalAnnealingSampler
+
+class DWaveSampler(LocalAnnealingSampler):
+    def __init__(self, **kwargs):
+        pass
+"""
+
+# Script run in a fresh interpreter: the backend modules loaded after the
+# import of TAQOS.maxcut and after running a heuristic of each backend
+_IMPORT_SCRIPT = """
+import json, sys
+import numpy as np
+
+def loaded():
+    return sorted(m for m in ['MQLib', 'dwave.system'] if m in sys.modules)
+
+import TAQOS.maxcut as maxcut
+from TAQOS.problem.max_cut.maxcut_instance import MaxCutInstance
+
+instance = MaxCutInstance.from_arrays(
+    0, np.arange(3, dtype=np.int64), np.array([0, 1, 0], dtype=np.int32),
+    np.array([1, 2, 2], dtype=np.int32), np.ones(3, dtype=np.int32)
+)
+
+steps = {'import': loaded()}
+maxcut.run_maxcut_heuristic('LOCAL_SA', instance, num_reads=2)
+steps['LOCAL_SA'] = loaded()
+maxcut.run_maxcut_heuristic('DW_Adv6.1_wo_embedding', instance, num_reads=2)
+steps['DW_Adv6.1_wo_embedding'] = loaded()
+maxcut.run_maxcut_heuristic('BASELINE', instance, rtsec=0.01)
+steps['BASELINE'] = loaded()
+
+print(json.dumps(steps))
+"""
+
+
+def test_backends_are_imported_on_first_use(tmp_path):
+    (tmp_path / 'MQLib.py').write_text(_MQLIB_STUB)
+    os.makedirs(tmp_path / 'dwave')
+    (tmp_path / 'dwave' / '__init__.py').write_text('')
+    (tmp_path / 'dwave' / 'system.py').write_text(_DWAVE_SYSTEM_STUB)
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), REPO_PATH]))
+    output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT], env=env,
+                            cwd=REPO_PATH, capture_output=True, text=True, check=True)
+
+    assert json.loads(output.stdout.splitlines()[-1]) == {
+        'import': [],
+        'LOCAL_SA': [],
+        'DW_Adv6.1_wo_embedding': ['dwave.system'],
+        'BASELINE': ['MQLib', 'dwave.system']
+    }
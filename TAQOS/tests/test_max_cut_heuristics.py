@@ -0,0 +1,59 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the registry of the heuristics
+=========
+"""
+
+# third party import
+import numpy as np
+
+# local import
+import TAQOS.heuristic.max_cut_heuristics as max_cut_heuristics
+from TAQOS.heuristic.max_cut_heuristics import get_batch_options, register_heuristic, \
+    run_maxcut_heuristic_batch
+from TAQOS.heuristic.sa_sampler import LocalAnnealingSampler
+from TAQOS.tests.conftest import get_random_instance
+
+
+def _run_size_batch(heuristic, jobs):
+    """
+    Batch entry point without options, reporting the number of nodes
+    """
+    for job in jobs:
+        yield job, {'heuristic_name': heuristic, 'parameter_setting': job[1],
+                    'solution': {'best_energy': float(job[0].num_nodes)}}
+
+
+def test_batch_options_are_filtered(monkeypatch):
+    monkeypatch.setitem(max_cut_heuristics._HEURISTIC_REGISTRY, 'SIZE', None)
+    register_heuristic('SIZE', 'test', lambda *args, **kwargs: None,
+                       run_batch=_run_size_batch, thread_safe=True)
+    instances = [get_random_instance(id, 6 + id, np.random.default_rng(id))
+                 for id in range(2)]
+
+    results = list(run_maxcut_heuristic_batch('SIZE', instances, {'size': [1]},
+                                              max_concurrency=2, sampler=None))
+    assert [res_dict['solution']['best_energy'] for _, res_dict in results] == [6., 7.]
+
+
+def test_batch_options_of_entry_points():
+    def run_batch(name, jobs, sampler=None):
+        pass
+
+    def run_batch_kwargs(name, jobs, **kwargs):
+        pass
+
+    assert get_batch_options(run_batch, max_concurrency=2, sampler=1) == {'sampler': 1}
+    assert get_batch_options(run_batch_kwargs, max_concurrency=2) == {'max_concurrency': 2}
+
+
+def test_dwave_batch_keeps_its_options():
+    instances = [get_random_instance(id, 6, np.random.default_rng(id)) for id in range(2)]
+    results = list(run_maxcut_heuristic_batch('LOCAL_SA', instances, {'num_reads': [2]},
+                                              max_concurrency=1,
+                                              sampler=LocalAnnealingSampler()))
+    assert len(results) == 2
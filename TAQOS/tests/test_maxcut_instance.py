@@ -0,0 +1,66 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the evaluation of the solutions of the maxcut instances
+=========
+"""
+
+# third party import
+import numpy as np
+import pytest
+
+# local import
+import TAQOS.problem.max_cut.maxcut_instance as maxcut_instance
+from TAQOS.tests.conftest import get_random_instance
+
+
+def _reference_evaluation(instance, spins):
+    """
+    Energy and cut size of a spin assignment, edge by edge
+    """
+    energy = 0.
+    cut_size = 0.
+    for u, v, w in zip(instance.edge_u.tolist(), instance.edge_v.tolist(),
+                       instance.weights.tolist()):
+        energy += w * spins[u] * spins[v]
+        if spins[u] != spins[v]:
+            cut_size += w
+    return energy, cut_size
+
+
+def test_batch_evaluation_matches_reference():
+    rng = np.random.default_rng(0)
+    instance = get_random_instance(0, 15, rng)
+    samples = rng.choice(np.array([-1, 1], dtype=np.int8), size=(20, instance.num_nodes))
+
+    energies = instance.compute_energies(samples)
+    cut_sizes = instance.get_cut_sizes(samples)
+    for spins, energy, cut_size in zip(samples.tolist(), energies, cut_sizes):
+        assert (energy, cut_size) == pytest.approx(_reference_evaluation(instance, spins))
+
+    solution = dict(zip([str(i) for i in instance.node_ids.tolist()], samples[0].tolist()))
+    assert instance.compute_energy(solution) == pytest.approx(energies[0])
+    assert instance.get_cut_size(solution) == pytest.approx(cut_sizes[0])
+
+
+def test_evaluation_in_chunks(monkeypatch):
+    rng = np.random.default_rng(1)
+    instance = get_random_instance(0, 10, rng)
+    samples = rng.choice(np.array([-1, 1], dtype=np.int8), size=(7, instance.num_nodes))
+    energies = instance.compute_energies(samples)
+
+    # Chunks of two samples
+    monkeypatch.setattr(maxcut_instance, 'EVALUATION_CHUNK_SIZE', 2 * instance.num_nodes)
+    assert instance.compute_energies(samples) == pytest.approx(energies)
+
+
+def test_adjacency_is_built_once():
+    instance = get_random_instance(0, 10, np.random.default_rng(2))
+    adjacency = instance.adjacency
+
+    instance.compute_energies(np.ones((1, instance.num_nodes)))
+    assert instance.adjacency is adjacency
+    assert (adjacency != adjacency.T).nnz == 0
@@ -0,0 +1,275 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the metrics and coverage of the instances
+=========
+"""
+
+# third party import
+import json
+import os
+import networkx as nx
+import numpy as np
+import pytest
+
+# local import
+import TAQOS.instance_metrics.graph_metrics as graph_metrics
+import TAQOS.problem.max_cut.db_manager as db_manager
+import TAQOS.problem.max_cut.maxcut_instance as maxcut_instance
+from TAQOS.instance_metrics.coverage import CoverageTracker, get_coverage_curve, \
+    get_coverage_length
+from TAQOS.instance_metrics.metric_cache import MetricCache
+from TAQOS.problem.max_cut.db_manager import load_maxcut_instance_list
+from TAQOS.tests.conftest import TEST_GROUP
+
+
+def test_instance_metrics_are_serial(instance_group, monkeypatch):
+    # No process pool is created per instance
+    def no_pool(*args, **kwargs):
+        raise AssertionError('process pool created')
+
+    monkeypatch.setattr(graph_metrics, 'ProcessPoolExecutor', no_pool)
+    metrics = instance_group[0].get_metrics()
+    assert 0 < metrics['density'] < 1
+
+
+@pytest.mark.parametrize('mode', ['exact', 'approx'])
+def test_shared_pool_metrics(instance_group, mode):
+    serial = load_maxcut_instance_list(TEST_GROUP, lazy=True, cache_size=1)
+    serial.metric_cache = MetricCache()
+    parallel = load_maxcut_instance_list(TEST_GROUP, lazy=True, cache_size=1)
+    parallel.metric_cache = MetricCache()
+
+    serial_values = serial.get_metric_values(mode)
+    parallel_values = parallel.get_metric_values(mode, processes=2)
+
+    assert serial_values.keys() == parallel_values.keys()
+    for k, values in serial_values.items():
+        assert values.tolist() == pytest.approx(parallel_values[k].tolist())
+    assert parallel.get_coverage(0.05, mode) == serial.get_coverage(0.05, mode)
+
+
+def test_metrics_of_small_graphs():
+    graph = nx.Graph()
+    graph.add_node(0)
+    metrics = graph_metrics.get_metrics(graph)
+    assert all(np.isfinite(value) for value in metrics.values())
+    assert metrics['density'] == nx.density(graph) == 0
+    assert metrics['max_degree'] == 0
+
+    graph.add_edge(0, 1, weight=1)
+    metrics = graph_metrics.get_metrics(graph)
+    assert metrics['density'] == nx.density(graph) == 1
+    assert metrics['max_degree'] == 1
+
+
+def test_graph_metrics_are_serial_by_default(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('process pool created')
+
+    monkeypatch.setattr(graph_metrics, 'ProcessPoolExecutor', no_pool)
+    # Several batches of BFS
+    graph = nx.cycle_graph(2 * graph_metrics.BFS_BATCH_SIZE + 1)
+    metrics = graph_metrics.get_metrics(graph)
+    assert metrics == pytest.approx(graph_metrics.get_metrics_nx(graph))
+
+
+def test_coverage_tracker_matches_coverage_length():
+    rng = np.random.default_rng(0)
+    # Values near the bounds and duplicates
+    values = np.concatenate([rng.random(30), [0.0, 1.0, 0.01, 0.99], rng.random(5).round(1)])
+    values = np.concatenate([values, values[:5]])
+    epsilon = 0.03
+
+    tracker = CoverageTracker(epsilon)
+    for i, value in enumerate(values):
+        tracker.add({'metric': value})
+        assert tracker.get_coverage()['metric'] == \
+            pytest.approx(get_coverage_length(values[:i + 1], epsilon))
+    assert len(tracker) == len(values)
+
+    kept = list(values)
+    for i in rng.permutation(len(values))[:len(values) - 3]:
+        tracker.remove({'metric': values[i]})
+        kept.remove(values[i])
+        assert tracker.get_coverage()['metric'] == \
+            pytest.approx(get_coverage_length(kept, epsilon))
+
+    with pytest.raises(ValueError):
+        tracker.remove({'metric': 2.0})
+
+
+def _brute_force_greedy(metric_values, k, epsilon):
+    """
+    Greedy selection recomputing the coverage of every candidate subset
+    """
+    selected = []
+    for _ in range(k):
+        candidates = [i for i in range(len(next(iter(metric_values.values()))))
+                      if i not in selected]
+        coverage = [sum(get_coverage_length(values[selected + [i]], epsilon)
+                        for values in metric_values.values())
+                    for i in candidates]
+        selected.append(candidates[int(np.argmax(coverage))])
+    return selected
+
+
+def test_coverage_subset_matches_greedy(instance_group):
+    instance_list = load_maxcut_instance_list(TEST_GROUP)
+    metric_values = instance_list.get_metric_values()
+    epsilon = 0.05
+
+    for k in range(1, len(instance_list) + 1):
+        subset = instance_list.select_coverage_subset(k, epsilon, 'subset')
+        expected = _brute_force_greedy(metric_values, k, epsilon)
+
+        assert subset.group_name == 'subset'
+        assert [instance.id for instance in subset] == \
+            [instance_list[i].id for i in expected]
+        assert sum(subset.get_coverage(epsilon).values()) == pytest.approx(sum(
+            get_coverage_length(values[expected], epsilon)
+            for values in metric_values.values()
+        ))
+
+
+def _count_metric_computations(monkeypatch):
+    """
+    Record the instances whose metrics are computed
+    """
+    computed = []
+
+    def counted(indptr, indices, num_edges, *args, **kwargs):
+        computed.append(num_edges)
+        return get_csr_metrics(indptr, indices, num_edges, *args, **kwargs)
+
+    get_csr_metrics = maxcut_instance.get_csr_metrics
+    monkeypatch.setattr(maxcut_instance, 'get_csr_metrics', counted)
+    return computed
+
+
+def test_metric_cache_is_persisted(instance_group, monkeypatch):
+    computed = _count_metric_computations(monkeypatch)
+    instance_list = load_maxcut_instance_list(TEST_GROUP)
+    values = instance_list.get_metric_values()
+    assert len(computed) == len(instance_group)
+
+    # The cache is written next to the instances, keyed by content hash
+    file_path = os.path.join(db_manager.MAXCUT_DB_PATH, TEST_GROUP,
+                             db_manager.METRIC_CACHE_FILE)
+    with open(file_path, 'r') as fi:
+        assert set(json.load(fi)) == {instance.content_hash()
+                                      for instance in instance_list}
+
+    reloaded = load_maxcut_instance_list(TEST_GROUP).get_metric_values()
+    assert len(computed) == len(instance_group)
+    assert reloaded.keys() == values.keys()
+    for k, metric_values in values.items():
+        assert reloaded[k].tolist() == metric_values.tolist()
+
+
+def test_metric_cache_misses_modified_instances(instance_group, monkeypatch):
+    instance_list = load_maxcut_instance_list(TEST_GROUP)
+    instance_list.get_metric_values()
+    instance = instance_list[0]
+
+    node_ids, edge_u, edge_v, weights = instance.to_arrays()
+    weights = weights.copy()
+    weights[0] = -weights[0]
+    db_manager.write_maxcut_instance_text(
+        os.path.join(db_manager.MAXCUT_DB_PATH, TEST_GROUP,
+                     f'{instance.id}_MaxcutInstance.txt'),
+        node_ids, edge_u, edge_v, weights
+    )
+
+    computed = _count_metric_computations(monkeypatch)
+    instance_list = load_maxcut_instance_list(TEST_GROUP)
+    instance_list.get_metric_values()
+    assert len(computed) == 1
+    assert instance_list[0].id == instance.id
+    assert instance_list[0].content_hash() != instance.content_hash()
+
+
+ECCENTRICITY_GRAPHS = {
+    'path': nx.path_graph(40),
+    'even_cycle': nx.cycle_graph(40),
+    'odd_cycle': nx.cycle_graph(41),
+    'lollipop': nx.lollipop_graph(10, 30),
+    'random': nx.connected_watts_strogatz_graph(200, 4, 0.1, seed=0),
+}
+
+
+def _graph_csr(graph):
+    adjacency = nx.to_scipy_sparse_array(graph, format='csr')
+    return adjacency.indptr, adjacency.indices
+
+
+@pytest.mark.parametrize('budget', [1, 2, 5, graph_metrics.APPROX_BUDGET])
+@pytest.mark.parametrize('name', sorted(ECCENTRICITY_GRAPHS))
+def test_eccentricity_bounds(name, budget):
+    graph = ECCENTRICITY_GRAPHS[name]
+    indptr, indices = _graph_csr(graph)
+    exact = graph_metrics.get_eccentricity(indptr, indices, processes=1)
+    lower, upper = graph_metrics.get_eccentricity_bounds(indptr, indices, budget)
+
+    assert np.all(lower <= exact)
+    assert np.all(exact <= upper)
+
+
+@pytest.mark.parametrize('budget', [0, 1, 3, 10])
+def test_eccentricity_bounds_budget(budget, monkeypatch):
+    calls = []
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs['indices'])
+        return shortest_path(*args, **kwargs)
+
+    shortest_path = graph_metrics.shortest_path
+    monkeypatch.setattr(graph_metrics, 'shortest_path', counted)
+    graph_metrics.get_eccentricity_bounds(
+        *_graph_csr(ECCENTRICITY_GRAPHS['random']), budget
+    )
+    assert len(calls) == max(budget, 1)
+    assert len(set(calls)) == len(calls)
+
+
+def test_eccentricity_of_disconnected_graphs():
+    graph = nx.disjoint_union(nx.path_graph(5), nx.cycle_graph(6))
+    indptr, indices = _graph_csr(graph)
+
+    with pytest.raises(nx.NetworkXError):
+        graph_metrics.get_eccentricity(indptr, indices, processes=1)
+    with pytest.raises(nx.NetworkXError):
+        graph_metrics.get_eccentricity_bounds(indptr, indices)
+    for mode in graph_metrics.METRIC_MODES:
+        with pytest.raises(nx.NetworkXError):
+            graph_metrics.get_metrics(graph, mode=mode)
+
+
+COVERAGE_EPSILONS = [0, 1e-3, 0.05, 0.2, 0.5, 10]
+
+
+def test_coverage_curve_matches_coverage_length():
+    rng = np.random.default_rng(0)
+    # Duplicates and values on the bounds of [0, 1]
+    values = np.concatenate([rng.random(50), [0, 0, 1, 0.5, 0.5]])
+
+    curve = get_coverage_curve(values, COVERAGE_EPSILONS)
+    assert curve.tolist() == pytest.approx(
+        [get_coverage_length(values, epsilon) for epsilon in COVERAGE_EPSILONS]
+    )
+    assert curve[0] == 0
+    assert curve[-1] == pytest.approx(1)
+
+
+def test_coverage_curve_of_instance_list(instance_group):
+    instance_list = load_maxcut_instance_list(TEST_GROUP)
+    metric_names, curve = instance_list.get_coverage_curve(COVERAGE_EPSILONS)
+
+    assert curve.shape == (len(metric_names), len(COVERAGE_EPSILONS))
+    for j, epsilon in enumerate(COVERAGE_EPSILONS):
+        coverage = instance_list.get_coverage(epsilon)
+        assert list(coverage) == metric_names
+        assert curve[:, j].tolist() == pytest.approx(list(coverage.values()))
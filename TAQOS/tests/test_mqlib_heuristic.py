@@ -0,0 +1,77 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the runs of the MQLib heuristics
+=========
+"""
+
+# third party import
+import pytest
+
+# local import
+from TAQOS.heuristic.max_cut_heuristics import run_maxcut_heuristic, \
+    run_maxcut_heuristic_seeds
+
+
+def test_seed_statistics_per_time_limit(stub_mqlib, instance_group):
+    res_list = run_maxcut_heuristic_seeds('BASELINE', instance_group[0], 3,
+                                          rtsec=[0.01, 0.02], seed=0, processes=1)
+
+    assert [res_dict['parameter_setting']['max_runtime'] for res_dict in res_list] == \
+        [0.01, 0.02]
+    for res_dict in res_list:
+        assert res_dict['parameter_setting']['nb_seeds'] == 3
+        assert len(res_dict['extra']['seed_results']) == 3
+        assert res_dict['solution']['best_energy'] <= res_dict['solution']['worst_energy']
+
+
+def test_seed_statistics_single_time_limit(stub_mqlib, instance_group):
+    res_dict = run_maxcut_heuristic_seeds('BASELINE', instance_group[0], 2, rtsec=0.01,
+                                          seed=0, processes=1)
+
+    assert res_dict['parameter_setting']['max_runtime'] == 0.01
+    assert len(res_dict['extra']['seed_results']) == 2
+
+
+def test_anytime_results_are_marked(stub_mqlib, instance_group):
+    res_list = run_maxcut_heuristic('BASELINE', instance_group[0], rtsec=[0.001, 0.004],
+                                    seed=0)
+    derived, final = res_list
+
+    assert derived['extra']['anytime_derived'] and not final['extra']['anytime_derived']
+    # The history of the stub reports a worse cut than the final one
+    assert derived['solution']['best_partition'] is None
+    assert derived['solution']['best_cut_size'] == final['solution']['best_cut_size'] - 1
+    assert derived['time'] == {'wall_clock_time': 0.001}
+    assert 'solver' in final['time']['phase_time']
+    assert final['solution']['best_partition'] is not None
+
+
+def test_wall_clock_time_is_measured(stub_mqlib, instance_group):
+    res_dict = run_maxcut_heuristic('BASELINE', instance_group[0], rtsec=10, seed=0)
+    assert res_dict['parameter_setting']['max_runtime'] == 10
+    assert res_dict['time']['wall_clock_time'] == res_dict['time']['phase_time']['solver']
+    assert res_dict['time']['wall_clock_time'] < 10
+
+    res_dict = run_maxcut_heuristic_seeds('BASELINE', instance_group[0], 2, rtsec=10,
+                                          seed=0, processes=1)
+    assert res_dict['time']['total_runtime'] == pytest.approx(sum(
+        run['time']['wall_clock_time'] for run in res_dict['extra']['seed_results']))
+    assert res_dict['time']['wall_clock_time'] < 10
+
+
+def test_wall_clock_time_without_timer(stub_mqlib, instance_group):
+    # The backend is imported once MQLib is stubbed
+    from TAQOS.heuristic.mqlib_heuristic import format_mqlib_results, get_seed_statistics
+
+    instance = instance_group[0]
+    result = {'solution': [1] * instance.num_nodes, 'bestsolhistory_objvals': [0.],
+              'bestsolhistory_runtimes': [0.]}
+    res_dict = format_mqlib_results('BASELINE', instance, result, 2)
+    assert res_dict['time']['wall_clock_time'] == 2
+
+    res_dict['parameter_setting']['seed'] = 0
+    assert get_seed_statistics('BASELINE', [res_dict], 2)['time']['total_runtime'] == 2
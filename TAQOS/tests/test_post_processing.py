@@ -0,0 +1,46 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the post-processing of the annealer samples
+=========
+"""
+
+# third party import
+import numpy as np
+import pytest
+
+# local import
+from TAQOS.heuristic.post_processing import steepest_descent
+from TAQOS.tests.conftest import get_random_instance
+
+
+def test_steepest_descent_reaches_local_minima():
+    rng = np.random.default_rng(0)
+    instance = get_random_instance(0, 20, rng, edge_probability=0.4)
+    samples = rng.choice(np.array([-1, 1], dtype=np.int8), size=(16, instance.num_nodes))
+
+    spins, energies, nb_flips = steepest_descent(*instance.csr, samples)
+
+    assert energies == pytest.approx(instance.compute_energies(spins))
+    assert np.all(energies <= instance.compute_energies(samples) + 1e-9)
+    assert np.all((spins != samples).sum(axis=1) <= nb_flips)
+
+    # No single flip decreases the energy of a local minimum
+    for minimum, energy in zip(spins, energies):
+        flipped = np.tile(minimum, (instance.num_nodes, 1))
+        np.fill_diagonal(flipped, -minimum)
+        assert np.all(instance.compute_energies(flipped) >= energy - 1e-9)
+
+
+def test_steepest_descent_iteration_limit():
+    rng = np.random.default_rng(1)
+    instance = get_random_instance(0, 20, rng, edge_probability=0.4)
+    samples = rng.choice(np.array([-1, 1], dtype=np.int8), size=(8, instance.num_nodes))
+
+    spins, energies, nb_flips = steepest_descent(*instance.csr, samples, max_iterations=1)
+
+    assert np.all(nb_flips <= 1)
+    assert energies == pytest.approx(instance.compute_energies(spins))
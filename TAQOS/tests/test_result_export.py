@@ -0,0 +1,84 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the export of the results of the heuristics to JSON
+=========
+"""
+
+# third party import
+import json
+import dimod
+import numpy as np
+
+# local import
+from TAQOS.heuristic.dw_heuristic import format_dwave_results
+from TAQOS.heuristic.result_export import pack_samples, result_from_json, \
+    result_to_json, unpack_samples
+from TAQOS.tests.conftest import get_random_instance
+
+
+def _get_dwave_result(vartype, rng):
+    """
+    Samples and result of format_dwave_results for random samples of an
+    instance
+    """
+    instance = get_random_instance(0, 10, rng)
+    values = [0, 1] if vartype is dimod.BINARY else [-1, 1]
+    sample_set = dimod.SampleSet.from_samples(
+        (rng.choice(values, size=(5, instance.num_nodes)), instance.node_ids.tolist()),
+        vartype, energy=rng.normal(size=5)
+    ).aggregate()
+    sample_set.info['timing'] = {'qpu_access_time': 0.0}
+    return sample_set.record.sample, format_dwave_results(
+        'DW_Adv2_wo_embedding', instance, sample_set, 20, 5, 0.1, None, 0
+    )
+
+
+def test_dwave_samples_are_bit_packed():
+    samples, res_dict = _get_dwave_result(dimod.SPIN, np.random.default_rng(0))
+    extra = res_dict['extra']
+
+    assert extra['samples'].dtype == np.uint8
+    assert extra['samples'].shape == (len(samples), 2)
+    assert extra['vartype'] == 'SPIN'
+    assert np.array_equal(unpack_samples(extra), samples)
+
+
+def test_stored_samples_keep_their_vartype():
+    rng = np.random.default_rng(1)
+    for vartype in (dimod.SPIN, dimod.BINARY):
+        samples, res_dict = _get_dwave_result(vartype, rng)
+        json_dict = json.loads(json.dumps(result_to_json(res_dict)))
+        assert isinstance(json_dict['extra']['samples'], str)
+
+        loaded = result_from_json(json_dict)
+        assert np.array_equal(loaded['extra']['samples'], res_dict['extra']['samples'])
+        assert np.array_equal(unpack_samples(loaded['extra']), samples)
+        assert {k: v for k, v in loaded['extra'].items() if k != 'samples'} == \
+            {k: v for k, v in res_dict['extra'].items() if k != 'samples'}
+
+
+def test_expanded_samples():
+    samples, res_dict = _get_dwave_result(dimod.SPIN, np.random.default_rng(2))
+    sample_list = result_to_json(res_dict, expand_samples=True)['extra']['sample_list']
+
+    assert [list(s['sample'].values()) for s in sample_list] == samples.tolist()
+    assert [s['energy'] for s in sample_list] == res_dict['extra']['energies']
+
+
+def test_empty_samples_round_trip():
+    extra = {
+        'variables': [str(i) for i in range(10)],
+        'vartype': 'SPIN',
+        'samples': pack_samples(np.zeros((0, 10), dtype=np.int8)),
+        'num_occurrences': [],
+        'energies': []
+    }
+    res_dict = {'heuristic_name': 'DW_Adv2_wo_embedding', 'extra': extra}
+
+    loaded = result_from_json(json.loads(json.dumps(result_to_json(res_dict))))
+    assert loaded['extra']['samples'].shape == (0, 2)
+    assert unpack_samples(loaded['extra']).shape == (0, 10)
@@ -0,0 +1,121 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the import and of the queries of the result store
+=========
+"""
+
+# third party import
+import logging
+import os
+import shutil
+import numpy as np
+import pytest
+
+# local import
+from TAQOS.heuristic.result_export import save_results_json
+from TAQOS.problem.max_cut.result_store import ResultStore
+
+# Result file of the repository, in the layout of maxcut_results
+REPO_RESULT_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'db',
+                                'maxcut_results', 'Advantage2_prototype1.1',
+                                '0_MaxcutResult.json')
+
+GROUP = 'Advantage2_prototype1.1'
+
+
+@pytest.fixture
+def result_path(tmp_path):
+    """
+    Results directory holding the result file of the repository
+    """
+    path = tmp_path / 'maxcut_results'
+    os.makedirs(path / GROUP)
+    shutil.copy(REPO_RESULT_FILE, path / GROUP)
+    return str(path)
+
+
+def _result(heuristic, max_runtime, best_energy, best_cut_size):
+    return {'heuristic_name': heuristic,
+            'time': {'wall_clock_time': max_runtime},
+            'parameter_setting': {'max_runtime': max_runtime},
+            'solution': {'best_partition': {}, 'best_cut_size': best_cut_size,
+                         'best_energy': best_energy},
+            'extra': {}}
+
+
+def test_import_repository_results(result_path, tmp_path, caplog):
+    with ResultStore(str(tmp_path / 'results.sqlite')) as store:
+        with caplog.at_level(logging.WARNING):
+            assert store.import_json_results(GROUP, result_path) == 11
+
+        rows = store.query(GROUP)
+        assert len(rows) == 11
+        assert {row['instance_id'] for row in rows} == {0}
+
+        rows = store.query(GROUP, heuristic='DUARTE2005')
+        assert [row['parameters'] for row in rows] == \
+            [{'max_runtime': 1}, {'max_runtime': 10}]
+        assert [row['best_energy'] for row in rows] == [-1656, -1676]
+
+        rows = store.query(GROUP, heuristic=['BASELINE', 'DUARTE2005'],
+                           parameters={'max_runtime': 10})
+        assert [(row['heuristic'], row['best_energy'], row['wall_clock_time'])
+                for row in rows] == [('BASELINE', -1416, 10), ('DUARTE2005', -1676, 10)]
+
+        # The embedding is left out of the parameters
+        rows = store.query(GROUP, heuristic='DW_Adv2_wo_embedding',
+                           parameters={'annealing_time': 100}, with_result=True)
+        assert len(rows) == 1
+        assert rows[0]['parameters'] == {'annealing_time': 100, 'num_reads': 256}
+        assert rows[0]['best_energy'] == -1678
+        assert rows[0]['best_cut_size'] == 0
+        assert 'embedding' in rows[0]['result']['parameter_setting']
+
+        # Empty best_cut_size of the MQLib results
+        assert all(row['best_cut_size'] is None
+                   for row in store.query(GROUP, heuristic='BASELINE'))
+        assert '10 results of group Advantage2_prototype1.1 have no best_cut_size' \
+            in caplog.text
+        assert 'best_energy' not in caplog.text
+
+        instance_ids, heuristics, table = store.energy_table(
+            GROUP, ['BASELINE', 'DUARTE2005'], aggregate='min'
+        )
+        assert instance_ids.tolist() == [0]
+        assert table.tolist() == [[-1424, -1676]]
+
+
+def test_import_again_replaces_results(result_path, tmp_path):
+    save_results_json(os.path.join(result_path, GROUP, '1_MaxcutResult.json'),
+                      {'BASELINE': [_result('BASELINE', 1, -10, 12.),
+                                    _result('BASELINE', 10, -12, 13.)]})
+
+    with ResultStore(str(tmp_path / 'results.sqlite')) as store:
+        assert store.import_json_results(path=result_path) == 13
+        assert store.import_json_results(path=result_path) == 13
+
+        assert len(store.query(GROUP)) == 13
+        rows = store.query(GROUP, instance_id=1)
+        assert [row['best_cut_size'] for row in rows] == [12, 13]
+
+        _, _, table = store.energy_table(GROUP, 'BASELINE', column='best_cut_size',
+                                         aggregate='max')
+        assert np.isnan(table[0, 0])
+        assert table[1, 0] == 13
+
+
+def test_import_numeric_results_without_warning(tmp_path, caplog):
+    path = tmp_path / 'maxcut_results'
+    os.makedirs(path / GROUP)
+    save_results_json(str(path / GROUP / '0_MaxcutResult.json'),
+                      {'BASELINE': [_result('BASELINE', 1, -10, 12)]})
+
+    with ResultStore(str(tmp_path / 'results.sqlite')) as store:
+        with caplog.at_level(logging.WARNING):
+            assert store.import_json_results(GROUP, str(path)) == 1
+
+    assert caplog.text == ''
@@ -0,0 +1,93 @@
+#!/usr/bin python3.8.10
+# -*- coding: utf-8 -*-
+"""
+@authors Valentin Gilbert <valentin.gilbert@cea.fr>
+
+Description:
+    Tests of the local simulated annealing sampler
+=========
+"""
+
+# third party import
+import itertools
+import dimod
+import numpy as np
+import pytest
+
+# local import
+from TAQOS.heuristic.sa_sampler import LocalAnnealingSampler
+
+
+def get_frustrated_bqm(num_variables=10, seed=0):
+    """
+    Ising model on a complete graph with random +1/-1 couplings and small
+    fields, the variables being labelled by strings
+    """
+    rng = np.random.default_rng(seed)
+    labels = [f'q{i}' for i in range(num_variables)]
+    quadratic = {(u, v): float(rng.choice([-1, 1]))
+                 for u, v in itertools.combinations(labels, 2)}
+    linear = {v: float(rng.choice([-0.5, 0, 0.5])) for v in labels}
+    return dimod.BinaryQuadraticModel(linear, quadratic, 0.0, dimod.SPIN)
+
+
+def get_ground_energy(bqm):
+    """
+    Lowest energy of a model, by enumerating every state
+    """
+    states = np.array(list(itertools.product([-1, 1], repeat=len(bqm.variables))))
+    if bqm.vartype is dimod.BINARY:
+        states = (states + 1) // 2
+    return float(bqm.energies((states, list(bqm.variables))).min())
+
+
+def test_frustrated_triangle_is_frustrated():
+    # An antiferromagnetic triangle cannot satisfy its three couplings
+    bqm = dimod.BinaryQuadraticModel({}, {'ab': 1, 'bc': 1, 'ac': 1}, 0, dimod.SPIN)
+    assert get_ground_energy(bqm) == -1
+    sample_set = LocalAnnealingSampler().sample(bqm, num_reads=10, seed=0)
+    assert sample_set.first.energy == -1
+
+
+@pytest.mark.parametrize('vartype', [dimod.SPIN, dimod.BINARY])
+def test_sampler_reaches_ground_state(vartype):
+    bqm = get_frustrated_bqm().change_vartype(vartype, inplace=False)
+    sample_set = LocalAnnealingSampler().sample(bqm, num_reads=20, seed=0)
+
+    assert sample_set.first.energy == pytest.approx(get_ground_energy(bqm))
+
+
+@pytest.mark.parametrize('vartype', [dimod.SPIN, dimod.BINARY])
+def test_sample_set_matches_bqm(vartype):
+    bqm = get_frustrated_bqm().change_vartype(vartype, inplace=False)
+    sample_set = LocalAnnealingSampler().sample(bqm, num_reads=7, num_sweeps=50, seed=1)
+
+    assert sample_set.vartype is bqm.vartype
+    assert set(sample_set.variables) == set(bqm.variables)
+    assert len(sample_set) == 7
+    assert set(np.unique(sample_set.record.sample)) <= set(vartype.value)
+    assert sample_set.record.energy.tolist() == pytest.approx(
+        bqm.energies(sample_set).tolist()
+    )
+    assert sample_set.info['timing']['num_sweeps'] == 50
+
+
+@pytest.mark.parametrize('num_reads', [1, 3, 64])
+def test_num_reads(num_reads):
+    sample_set = LocalAnnealingSampler().sample(get_frustrated_bqm(), num_reads=num_reads,
+                                                num_sweeps=10)
+    assert len(sample_set) == num_reads
+    assert sample_set.record.num_occurrences.tolist() == [1] * num_reads
+
+
+def test_seed_is_honoured():
+    bqm = get_frustrated_bqm(20)
+    sampler = LocalAnnealingSampler()
+
+    def samples(seed):
+        sample_set = sampler.sample(bqm, num_reads=16, num_sweeps=5, seed=seed)
+        return sample_set.record.sample[:, [sample_set.variables.index(v)
+                                            for v in bqm.variables]]
+
+    assert np.array_equal(samples(0), samples(0))
+    assert not np.array_equal(samples(0), samples(1))